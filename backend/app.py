@@ -1,9 +1,9 @@
 """
 Main Flask application with WebSocket support for real-time options flow
 """
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import threading
 import time
 import os
@@ -11,11 +11,14 @@ from datetime import datetime
 
 from config import Config
 from options_monitor import options_monitor
-from strategy_backtester import strategy_backtester
+from backtest_jobs import backtest_jobs
+from strategy_optimizer import OPTIMIZER_SETTINGS, WALK_FORWARD_SETTINGS
+from trade_log import trade_log_store, EXPORT_FORMATS
 from data_fetcher import data_fetcher
 from auth import register_user, login_user, token_required
 from historical_data_loader import historical_loader
 from historical_replay import get_replay_loader
+from replay_sessions import replay_sessions
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
@@ -36,6 +39,8 @@ socketio = SocketIO(app, cors_allowed_origins=allowed_origins, async_mode=async_
 active_connections = set()
 active_subscriptions = {}  # {sid: {symbol: timeframe}}
 streaming_active = False
+job_events_active = False
+replay_events_active = False
 
 
 @app.route('/api/health', methods=['GET'])
@@ -228,32 +233,226 @@ def get_ratio_only(symbol):
     })
 
 
+def _submit_job(kind, params, options, sid=None):
+    """Queue a backtest job, making sure its progress events get forwarded"""
+    global job_events_active
+    if not job_events_active:
+        job_events_active = True
+        socketio.start_background_task(backtest_job_events)
+    return backtest_jobs.submit(kind, params, options, sid=sid)
+
+
+def _wait_for_job(job):
+    """Yield to other green threads until a backtest job finishes"""
+    while job['status'] in ('queued', 'running'):
+        socketio.sleep(0.05)
+        job = backtest_jobs.get_status(job['job_id'])
+    return job
+
+
+def _job_response(job):
+    """Translate a finished job into the synchronous endpoint response"""
+    if job['status'] == 'completed':
+        return jsonify(job['result'])
+    if job['error_type'] == 'ValueError':
+        return jsonify({'error': job['error']}), 400
+    return jsonify({'error': job['error'] or f"Backtest {job['status']}"}), 500
+
+
 @app.route('/api/backtest/run', methods=['POST'])
 def run_backtest():
     """Run strategy backtest with specified parameters"""
-    params = request.json
-    date = params.pop('date', None) if params else None
+    params = request.json or {}
+    options = {'date': params.pop('date', None)}
     
     try:
-        result = strategy_backtester.run_backtest(params, date=date)
-        return jsonify(result)
+        job = _submit_job('run', params, options, sid=params.pop('sid', None))
+        return _job_response(_wait_for_job(job))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/backtest/range', methods=['POST'])
+def run_backtest_range():
+    """Run a multi-day backtest; per-day progress is pushed to the caller's socket"""
+    params = request.json or {}
+    options = {
+        'start_date': params.pop('start_date', None),
+        'end_date': params.pop('end_date', None),
+        'symbol': params.pop('symbol', 'SPY')
+    }
+
+    if options['symbol'] not in Config.SYMBOLS:
+        return jsonify({'error': 'Invalid symbol'}), 400
+
+    try:
+        job = _submit_job('range', params, options, sid=params.pop('sid', None))
+        return _job_response(_wait_for_job(job))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/backtest/compare', methods=['POST'])
 def compare_strategies():
-    """Run and compare multiple strategies"""
-    params = request.json
-    date = params.pop('date', None) if params else None
+    """Run and compare multiple strategies, plus any user-defined variants"""
+    params = request.json or {}
+    options = {'date': params.pop('date', None), 'variants': params.pop('variants', None)}
+    
+    try:
+        job = _submit_job('compare', params, options, sid=params.pop('sid', None))
+        return _job_response(_wait_for_job(job))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/backtest/portfolio', methods=['POST'])
+def run_portfolio_backtest():
+    """Backtest several symbols against one shared capital pool"""
+    params = request.json or {}
+    options = {'date': params.pop('date', None), 'symbols': params.pop('symbols', None)}
+    
+    if options['symbols'] is not None and not set(options['symbols']) <= set(Config.SYMBOLS):
+        return jsonify({'error': 'Invalid symbol'}), 400
+    
+    try:
+        job = _submit_job('portfolio', params, options, sid=params.pop('sid', None))
+        return _job_response(_wait_for_job(job))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/backtest/optimize', methods=['POST'])
+def optimize_strategy():
+    """
+    Queue a successive-halving parameter search; poll /api/backtest/jobs/<job_id>
+    for the result. Search settings (num_configs, eta, min_days, max_days,
+    objective, search_space, seed, direction) are optional.
+    """
+    params = request.json or {}
+    options = {
+        'end_date': params.pop('end_date', None),
+        'symbol': params.pop('symbol', 'SPY'),
+        'search': {key: params.pop(key) for key in OPTIMIZER_SETTINGS if key in params}
+    }
+    
+    if options['symbol'] not in Config.SYMBOLS:
+        return jsonify({'error': 'Invalid symbol'}), 400
+    
+    try:
+        job = _submit_job('optimize', params, options, sid=params.pop('sid', None))
+        return jsonify(job), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/backtest/walk-forward', methods=['POST'])
+def walk_forward_validation():
+    """
+    Queue a walk-forward validation over start_date..end_date; poll
+    /api/backtest/jobs/<job_id> for the result. Window and search settings
+    (train_days, test_days, step_days, num_configs, objective, search_space,
+    seed, direction) are optional.
+    """
+    params = request.json or {}
+    options = {
+        'start_date': params.pop('start_date', None),
+        'end_date': params.pop('end_date', None),
+        'symbol': params.pop('symbol', 'SPY'),
+        'search': {key: params.pop(key) for key in WALK_FORWARD_SETTINGS if key in params}
+    }
+    
+    if options['symbol'] not in Config.SYMBOLS:
+        return jsonify({'error': 'Invalid symbol'}), 400
     
     try:
-        result = strategy_backtester.compare_strategies(params, date=date)
-        return jsonify(result)
+        job = _submit_job('walk_forward', params, options, sid=params.pop('sid', None))
+        return jsonify(job), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/backtest/jobs', methods=['POST'])
+def submit_backtest_job():
+    """Queue a backtest job and return its id immediately"""
+    params = request.json or {}
+    kind = params.pop('kind', 'run')
+    sid = params.pop('sid', None)
+    options = {key: params.pop(key) for key in ('date', 'start_date', 'end_date', 'symbol', 'symbols', 'variants',
+                                                'search')
+               if key in params}
+
+    if options.get('symbol', 'SPY') not in Config.SYMBOLS:
+        return jsonify({'error': 'Invalid symbol'}), 400
+    if not set(options.get('symbols') or []) <= set(Config.SYMBOLS):
+        return jsonify({'error': 'Invalid symbol'}), 400
+
+    try:
+        job = _submit_job(kind, params, options, sid=sid)
+        return jsonify(job), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/backtest/jobs', methods=['GET'])
+def list_backtest_jobs():
+    """List retained backtest jobs"""
+    return jsonify({'jobs': backtest_jobs.list_jobs()})
+
+
+@app.route('/api/backtest/jobs/<job_id>', methods=['GET'])
+def get_backtest_job(job_id):
+    """Get status (and result once completed) of a backtest job"""
+    job = backtest_jobs.get_status(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/backtest/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_backtest_job(job_id):
+    """Cancel a queued or running backtest job"""
+    job = backtest_jobs.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/backtest/trades/<run_id>', methods=['GET'])
+def get_backtest_trades(run_id):
+    """Get a page of the full trade log for a backtest run"""
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+
+    page = trade_log_store.page(run_id, offset, limit)
+    if not page:
+        return jsonify({'error': 'Run not found'}), 404
+    return jsonify(page)
+
+
+@app.route('/api/backtest/trades/<run_id>/export', methods=['GET'])
+def export_backtest_trades(run_id):
+    """Stream the full trade log for a backtest run as NDJSON, CSV or Parquet"""
+    fmt = request.args.get('format', 'ndjson')
+
+    try:
+        chunks = trade_log_store.export(run_id, fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if chunks is None:
+        return jsonify({'error': 'Run not found'}), 404
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=trades_{run_id}.{fmt}'}
+    )
+
+
 # Historical Data Replay endpoints
 @app.route('/api/historical/dates', methods=['GET'])
 @token_required
@@ -328,11 +527,22 @@ def get_historical_flow_score(date, ticker):
 @app.route('/api/historical/replay/snapshots/<date>', methods=['GET'])
 @token_required
 def get_replay_snapshots(date):
-    """Get 4 time-based snapshots for a specific historical date"""
+    """
+    Get time-based snapshots (4 by default, up to one per minute) for a specific historical date.
+    With a `sid`, snapshots of the rows parsed so far are pushed to that socket as
+    'replay_snapshots_partial' while the day downloads.
+    """
     try:
         symbol = request.args.get('symbol', 'SPY')
+        num_snapshots = int(request.args.get('num_snapshots', 4))
+        sid = request.args.get('sid')
         replay_loader = get_replay_loader()
-        snapshots = replay_loader.create_snapshots(date, symbol)
+        
+        def push_partial(update):
+            socketio.emit('replay_snapshots_partial', {'date': date, 'symbol': symbol, **update}, to=sid)
+        
+        snapshots = replay_loader.create_snapshots(date, symbol, num_snapshots=num_snapshots,
+                                                   partial_callback=push_partial if sid else None)
         
         return jsonify({
             'date': date,
@@ -340,9 +550,106 @@ def get_replay_snapshots(date):
             'snapshots': snapshots,
             'count': len(snapshots)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/historical/replay/prefetch/<date>', methods=['POST'])
+@token_required
+def prefetch_replay_day(date):
+    """Extract several underlyings (all monitored symbols by default) from one pass over a day's flat file"""
+    symbols = (request.json or {}).get('symbols') or Config.SYMBOLS
+    if not set(symbols) <= set(Config.SYMBOLS):
+        return jsonify({'error': 'Invalid symbol'}), 400
+    try:
+        days = get_replay_loader().download_underlyings(date, symbols)
+        return jsonify({
+            'date': date,
+            'rows': {symbol: len(columns['window_start']) if columns is not None else 0
+                     for symbol, columns in days.items()}
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/historical/replay/load-metrics', methods=['GET'])
+@token_required
+def get_replay_load_metrics():
+    """Recent flat-file loads: rows parsed, whether rows were kept under the RSS ceiling, time and peak RSS"""
+    return jsonify({'loads': list(get_replay_loader().load_metrics)})
+
+
+@app.route('/api/historical/replay/sessions', methods=['POST'])
+@token_required
+def create_replay_session():
+    """Start streaming a historical day; join its room with the 'replay_join' socket event"""
+    global replay_events_active
+    params = request.json or {}
+    date = params.get('date')
+    symbol = params.get('symbol', 'SPY')
+    if not date:
+        return jsonify({'error': 'date is required'}), 400
+    if symbol not in Config.SYMBOLS:
+        return jsonify({'error': 'Invalid symbol'}), 400
+
+    try:
+        session = replay_sessions.create(date, symbol, rate=params.get('rate', 1), minute=params.get('minute', 0),
+                                         autoplay=params.get('autoplay', True))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    if not replay_events_active:
+        replay_events_active = True
+        socketio.start_background_task(replay_session_events)
+    return jsonify(session), 201
+
+
+@app.route('/api/historical/replay/sessions', methods=['GET'])
+@token_required
+def list_replay_sessions():
+    """List active replay sessions"""
+    return jsonify({'sessions': replay_sessions.list_sessions()})
+
+
+@app.route('/api/historical/replay/sessions/<session_id>', methods=['GET'])
+@token_required
+def get_replay_session(session_id):
+    """Get a replay session's playback state"""
+    session = replay_sessions.get_status(session_id)
+    if not session:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(session)
+
+
+@app.route('/api/historical/replay/sessions/<session_id>/control', methods=['POST'])
+@token_required
+def control_replay_session(session_id):
+    """Play, pause, seek ({minute} or {time: 'HH:MM'} ET) or change rate ({rate}: 1-500)"""
+    params = request.json or {}
+    try:
+        session = replay_sessions.control(session_id, params.get('action'), minute=params.get('minute'),
+                                          time=params.get('time'), rate=params.get('rate'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if not session:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(session)
+
+
+@app.route('/api/historical/replay/sessions/<session_id>', methods=['DELETE'])
+@token_required
+def close_replay_session(session_id):
+    """End a replay session"""
+    if not replay_sessions.close(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'session_id': session_id, 'closed': True})
+
 
 @app.route('/api/historical/replay/available-dates', methods=['GET'])
 @token_required
@@ -381,6 +688,7 @@ def handle_disconnect():
     # Clean up subscriptions
     if request.sid in active_subscriptions:
         del active_subscriptions[request.sid]
+    replay_sessions.disconnect(request.sid)
 
 
 @socketio.on('subscribe')
@@ -416,6 +724,26 @@ def handle_request_update(data):
     emit('monitor_update', monitor_data)
 
 
+@socketio.on('replay_join')
+def handle_replay_join(data):
+    """Join a replay session's room and receive its current minute straight away"""
+    session_id = (data or {}).get('session_id')
+    session = replay_sessions.join(session_id, request.sid)
+    if not session:
+        emit('replay_error', {'session_id': session_id, 'error': 'Session not found'})
+        return
+    join_room(session['room'])
+    emit('replay_update', replay_sessions.current_update(session_id))
+
+
+@socketio.on('replay_leave')
+def handle_replay_leave(data):
+    """Stop receiving a replay session's updates"""
+    session = replay_sessions.leave((data or {}).get('session_id'), request.sid)
+    if session:
+        leave_room(session['room'])
+
+
 def background_streaming():
     """Background thread for streaming real-time data"""
     global streaming_active
@@ -444,6 +772,24 @@ def background_streaming():
         time.sleep(Config.REFRESH_RATE)
 
 
+def backtest_job_events():
+    """Background task forwarding backtest job progress to the requesting sockets"""
+    while True:
+        for event, payload, sid in backtest_jobs.drain_events():
+            if sid:
+                socketio.emit(event, payload, to=sid)
+        socketio.sleep(0.25)
+
+
+def replay_session_events():
+    """Background task advancing replay sessions and emitting their updates to each session's room"""
+    while True:
+        replay_sessions.tick()
+        for event, payload, room in replay_sessions.drain_events():
+            socketio.emit(event, payload, to=room)
+        socketio.sleep(Config.REPLAY_TICK_SECONDS)
+
+
 def start_background_streaming():
     """Start the background streaming thread"""
     global streaming_active
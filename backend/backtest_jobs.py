@@ -0,0 +1,266 @@
+"""
+Background Backtest Job Queue
+Runs CPU-bound backtests in a separate process pool so the eventlet worker
+(and Socket.IO streaming) never blocks on NumPy work.
+"""
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from queue import Empty
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from trade_log import trade_log_store
+
+
+JOB_KINDS = ('run', 'compare', 'range', 'portfolio', 'optimize', 'walk_forward')
+
+
+class BacktestCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+
+
+def _result_run_ids(result: Dict) -> List[str]:
+    """Run ids of every backtest result nested in a job result"""
+    run_ids = [result['run_id']] if 'run_id' in result else []
+    for value in result.values():
+        if isinstance(value, dict):
+            run_ids.extend(_result_run_ids(value))
+    return run_ids
+
+
+def _run_job(job_id: str, kind: str, params: Dict, options: Dict, events, cancelled):
+    """
+    Process pool entry point: execute one backtest job and report progress.
+    Trade logs stored in this worker are detached and shipped back with the
+    result so the parent process can serve them.
+    """
+    result = _execute_job(job_id, kind, params, options, events, cancelled)
+    return {
+        'result': result,
+        'trade_logs': {run_id: trade_log_store.pop(run_id) for run_id in _result_run_ids(result)}
+    }
+
+
+def _execute_job(job_id: str, kind: str, params: Dict, options: Dict, events, cancelled):
+    """Run the backtest behind a job, checking for cancellation at each progress report"""
+    from strategy_backtester import strategy_backtester
+
+    def report(progress):
+        # Progress reports double as cancellation checkpoints
+        if cancelled.get(job_id):
+            raise BacktestCancelled(f"Job {job_id} cancelled")
+        events.put((job_id, 'progress', progress))
+
+    events.put((job_id, 'started', {}))
+
+    if kind == 'run':
+        return strategy_backtester.run_backtest(
+            params, date=options.get('date'), symbol=options.get('symbol', 'SPY'),
+            progress_callback=report
+        )
+    if kind == 'compare':
+        return strategy_backtester.compare_strategies(
+            params, date=options.get('date'), symbol=options.get('symbol', 'SPY'),
+            progress_callback=report, variants=options.get('variants')
+        )
+    if kind == 'range':
+        return strategy_backtester.run_backtest_range(
+            params, start_date=options.get('start_date'), end_date=options.get('end_date'),
+            symbol=options.get('symbol', 'SPY'), progress_callback=report
+        )
+    if kind == 'portfolio':
+        return strategy_backtester.run_portfolio_backtest(
+            params, date=options.get('date'), symbols=options.get('symbols'),
+            progress_callback=report
+        )
+    if kind == 'optimize':
+        from strategy_optimizer import strategy_optimizer
+        return strategy_optimizer.optimize(
+            params, end_date=options.get('end_date'), symbol=options.get('symbol', 'SPY'),
+            progress_callback=report, **options.get('search', {})
+        )
+    if kind == 'walk_forward':
+        from strategy_optimizer import strategy_optimizer
+        return strategy_optimizer.walk_forward(
+            params, start_date=options.get('start_date'), end_date=options.get('end_date'),
+            symbol=options.get('symbol', 'SPY'), progress_callback=report, **options.get('search', {})
+        )
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+class BacktestJobManager:
+    """Submit, track and cancel backtests running in a process pool"""
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or Config.BACKTEST_MAX_CONCURRENT_JOBS
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._futures = {}
+        self._notifications = deque(maxlen=1000)
+        self._lock = threading.RLock()
+        self._executor = None
+        self._manager = None
+        self._events = None
+        self._cancelled = None
+
+    def _ensure_pool(self):
+        """Start the worker pool and shared progress queue on first use"""
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._events = self._manager.Queue()
+            self._cancelled = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            print(f"⚙️  Backtest job pool started ({self.max_workers} workers)")
+
+    def submit(self, kind: str, params: Dict = None, options: Dict = None, sid: str = None) -> Dict:
+        """Queue a backtest job and return its status immediately"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Invalid job kind '{kind}'. Expected one of: {', '.join(JOB_KINDS)}")
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._ensure_pool()
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'kind': kind,
+                'status': 'queued',
+                'progress': None,
+                'sid': sid,
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+                'error_type': None
+            }
+            future = self._executor.submit(
+                _run_job, job_id, kind, params or {}, options or {}, self._events, self._cancelled
+            )
+            self._futures[job_id] = future
+            self._prune_history()
+
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        return self.get_status(job_id)
+
+    def _on_done(self, job_id: str, future):
+        """Record the outcome of a finished job"""
+        with self._lock:
+            # Flush progress the worker reported before finishing, so events stay ordered
+            self._pull_events()
+            job = self.jobs.get(job_id)
+            self._futures.pop(job_id, None)
+            if self._cancelled is not None:
+                self._cancelled.pop(job_id, None)
+            if job is None:
+                return
+
+            job['finished_at'] = datetime.now().isoformat()
+            if future.cancelled():
+                job['status'] = 'cancelled'
+            else:
+                error = future.exception()
+                if error is None:
+                    payload = future.result()
+                    for run_id, run in payload['trade_logs'].items():
+                        if run is not None:
+                            trade_log_store.put(run.pop('log'), run.pop('direction'), run_id=run_id, **run)
+                    job['status'] = 'completed'
+                    job['result'] = payload['result']
+                elif isinstance(error, BacktestCancelled):
+                    job['status'] = 'cancelled'
+                else:
+                    job['status'] = 'failed'
+                    job['error'] = str(error)
+                    job['error_type'] = type(error).__name__
+
+            self._notifications.append(('backtest_job_' + job['status'], self._public(job), job['sid']))
+
+    def _prune_history(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job['status'] in ('completed', 'failed', 'cancelled')]
+        for job_id in finished[:max(0, len(finished) - Config.BACKTEST_JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    def _public(self, job: Dict, include_result: bool = True) -> Dict:
+        """Job status without internal fields"""
+        status = {k: v for k, v in job.items() if k != 'sid'}
+        if not include_result:
+            status.pop('result', None)
+        return status
+
+    def get_status(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        """Current status of a job, or None if unknown"""
+        self._pull_events()
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return self._public(job, include_result) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Status of all retained jobs (without results)"""
+        self._pull_events()
+        with self._lock:
+            return [self._public(job, include_result=False) for job in self.jobs.values()]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued job, or signal a running job to stop at its next checkpoint"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            future = self._futures.get(job_id)
+            if future is not None and not future.cancel():
+                self._cancelled[job_id] = True
+        return self.get_status(job_id, include_result=False)
+
+    def _pull_events(self):
+        """Apply progress reported by workers to job state (never blocks)"""
+        if self._events is None:
+            return
+
+        while True:
+            try:
+                job_id, event, payload = self._events.get_nowait()
+            except Empty:
+                break
+
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job['status'] not in ('queued', 'running'):
+                    continue
+                if event == 'started':
+                    job['status'] = 'running'
+                    job['started_at'] = datetime.now().isoformat()
+                    continue
+                job['progress'] = payload
+                self._notifications.append(('backtest_job_progress',
+                                            {'job_id': job_id, 'kind': job['kind'], **payload},
+                                            job['sid']))
+
+    def drain_events(self) -> List[Tuple[str, Dict, Optional[str]]]:
+        """
+        Collect pending (event, payload, sid) notifications: progress reported by
+        workers plus completion of finished jobs
+        """
+        self._pull_events()
+        with self._lock:
+            notifications = list(self._notifications)
+            self._notifications.clear()
+        return notifications
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._lock:
+            if self._executor is None:
+                return
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            manager = self._manager
+            self._executor = self._manager = self._events = self._cancelled = None
+        manager.shutdown()
+
+
+# Global instance
+backtest_jobs = BacktestJobManager()
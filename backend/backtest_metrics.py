@@ -0,0 +1,125 @@
+"""
+Streaming Backtest Metrics
+Accumulates win rate, average win/loss, profit factor, Sharpe (Welford
+variance), drawdown and win/loss streaks batch by batch in constant memory,
+so metrics can be read at any point of a run.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+# Sharpe is annualized assuming 252 trading days
+ANNUALIZATION = np.sqrt(252)
+
+
+class MetricsAccumulator:
+    """
+    Running backtest metrics for trades fed in realization order.
+    `update_batch` folds an array of trades into a fixed set of counters;
+    splitting a run into batches of any size gives the same metrics.
+    """
+
+    def __init__(self, initial_capital: float):
+        self.initial_capital = initial_capital
+        self.capital = float(initial_capital)
+        # The peak never drops below initial capital, so drawdown % is always defined
+        self.peak_capital = float(initial_capital)
+        self.max_drawdown = 0.0
+
+        self.trades = 0
+        self.wins = 0
+        self.gross_win = 0.0
+        self.gross_loss = 0.0
+
+        # Welford mean / sum of squared deviations of percent returns (in %)
+        self.mean_return = 0.0
+        self.m2_return = 0.0
+
+        self.streak = 0  # current run length: > 0 wins, < 0 losses
+        self.max_consecutive_wins = 0
+        self.max_consecutive_losses = 0
+
+    def update_batch(self, profit: np.ndarray, percent_return: np.ndarray,
+                     is_win: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Add an array of trades; returns their capital and drawdown % paths"""
+        profit = np.asarray(profit, dtype=float)
+        is_win = np.asarray(is_win, dtype=bool)
+        count = len(profit)
+        if count == 0:
+            return np.empty(0), np.empty(0)
+
+        # Drawdown, carrying the running peak in from earlier trades
+        capital = self.capital + np.cumsum(profit)
+        peak_capital = np.maximum(np.maximum.accumulate(capital), self.peak_capital)
+        drawdown = (peak_capital - capital) / peak_capital * 100
+        self.capital = float(capital[-1])
+        self.peak_capital = float(peak_capital[-1])
+        self.max_drawdown = max(self.max_drawdown, float(drawdown.max()))
+
+        wins = int(is_win.sum())
+        self.gross_win += float(profit[is_win].sum())
+        self.gross_loss += float(profit[~is_win].sum())
+
+        # Combine batch mean / M2 with the running ones (Chan et al. parallel Welford)
+        values = np.asarray(percent_return, dtype=float) * 100
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.trades + count
+        delta = batch_mean - self.mean_return
+        self.m2_return += batch_m2 + delta * delta * self.trades * count / total
+        self.mean_return += delta * count / total
+        self.trades = total
+        self.wins += wins
+
+        self._update_streaks(is_win)
+        return capital, drawdown
+
+    def _update_streaks(self, is_win: np.ndarray):
+        """Run-length encode the batch, extending the run carried over from earlier trades"""
+        boundaries = np.flatnonzero(np.diff(is_win.astype(np.int8))) + 1
+        starts = np.concatenate(([0], boundaries))
+        lengths = np.diff(np.concatenate((starts, [len(is_win)])))
+        run_is_win = is_win[starts]
+
+        # The first run continues the current streak when it has the same outcome
+        if (self.streak > 0) == bool(run_is_win[0]) and self.streak != 0:
+            lengths[0] += abs(self.streak)
+
+        if run_is_win.any():
+            self.max_consecutive_wins = max(self.max_consecutive_wins, int(lengths[run_is_win].max()))
+        if (~run_is_win).any():
+            self.max_consecutive_losses = max(self.max_consecutive_losses, int(lengths[~run_is_win].max()))
+        self.streak = int(lengths[-1]) if run_is_win[-1] else -int(lengths[-1])
+
+    def metrics(self) -> Dict:
+        """Summary metrics for the trades seen so far, rounded as the API reports them"""
+        total_trades = self.trades
+        wins = self.wins
+        losses = total_trades - wins
+        total_profit = self.capital - self.initial_capital
+
+        avg_win = self.gross_win / wins if wins else 0
+        avg_loss = self.gross_loss / losses if losses else 0
+        profit_factor = abs(self.gross_win / self.gross_loss) if self.gross_loss != 0 else 0
+
+        # Population standard deviation, as np.std
+        std_dev = np.sqrt(self.m2_return / total_trades) if total_trades else 0
+        sharpe_ratio = float(self.mean_return / std_dev * ANNUALIZATION) if std_dev > 0 else 0
+
+        return {
+            'wins': wins,
+            'losses': losses,
+            'win_rate': round(wins / total_trades * 100, 2) if total_trades else 0,
+            'total_profit': round(total_profit, 2),
+            'final_capital': round(self.capital, 2),
+            'return_percent': round(total_profit / self.initial_capital * 100, 2),
+            'avg_win': round(avg_win, 2),
+            'avg_loss': round(avg_loss, 2),
+            'profit_factor': round(profit_factor, 2),
+            'max_drawdown': round(self.max_drawdown, 2),
+            'sharpe_ratio': round(sharpe_ratio, 2),
+            'max_consecutive_wins': self.max_consecutive_wins,
+            'max_consecutive_losses': self.max_consecutive_losses,
+            'expectancy': round(total_profit / total_trades, 2) if total_trades else 0
+        }
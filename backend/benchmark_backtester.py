@@ -0,0 +1,145 @@
+"""
+Backtester Benchmarks
+Times run_backtest and compare_strategies at several trade counts, plus once
+on a scenario date (a dated day has one signal per session minute, so larger
+trade counts would replay the same day), and records ops/sec plus peak
+traced memory as JSON.
+Only the offline scenario generator is used, so results are reproducible.
+
+Usage:
+    python benchmark_backtester.py --output bench.json
+    python benchmark_backtester.py --baseline bench.json --threshold 0.25
+Exits with status 1 when any case is slower than the baseline by more than
+the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from historical_scenario_generator import MINUTES_PER_SESSION
+from strategy_backtester import StrategyBacktester
+
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+BENCHMARK_DATE = '2025-12-18'
+DEFAULT_THRESHOLD = 0.25
+
+
+def _cases(backtester, sizes):
+    """(name, num_trades, date, callable) for every benchmarked call"""
+    # Trade counts only scale undated runs; a dated day caps trades at its session minutes
+    runs = [(num_trades, None) for num_trades in sizes] + [(MINUTES_PER_SESSION, BENCHMARK_DATE)]
+    for num_trades, date in runs:
+        params = {'num_trades': num_trades, 'data_source': 'scenario'}
+        yield ('run_backtest', num_trades, date,
+               lambda params=params, date=date: backtester.run_backtest(params, date=date))
+        yield ('compare_strategies', num_trades, date,
+               lambda params=params, date=date: backtester.compare_strategies(params, date=date))
+
+
+def _measure(func, repeat):
+    """Best/mean wall time over `repeat` calls, then peak traced memory of one more call"""
+    func()  # warm-up: imports, scenario generation caches
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Traced separately: tracemalloc slows allocation-heavy code
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'repeat': repeat,
+        'min_seconds': round(min(timings), 6),
+        'mean_seconds': round(sum(timings) / len(timings), 6),
+        'ops_per_sec': round(1 / min(timings), 3),
+        'peak_memory_mb': round(peak / 1024 / 1024, 3)
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=5):
+    """Run every case and return the JSON-serializable report"""
+    backtester = StrategyBacktester()
+    results = []
+    for name, num_trades, date, func in _cases(backtester, sizes):
+        result = {'name': name, 'num_trades': num_trades, 'date': date, **_measure(func, repeat)}
+        results.append(result)
+        print(f"{name:<20} {num_trades:>7} trades  date={date or '-':<10}  "
+              f"{result['ops_per_sec']:>9.2f} ops/s  {result['min_seconds'] * 1000:>9.2f} ms  "
+              f"peak {result['peak_memory_mb']:>8.2f} MB")
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+
+
+def compare_to_baseline(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Cases whose ops/sec dropped by more than `threshold` (a fraction) vs. the baseline"""
+    previous = {(r['name'], r['num_trades'], r['date']): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        base = previous.get((result['name'], result['num_trades'], result['date']))
+        if base is None:
+            continue
+        change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        result['baseline_ops_per_sec'] = base['ops_per_sec']
+        result['change'] = round(change, 4)
+        if change < -threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark StrategyBacktester on offline scenario data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='num_trades values to benchmark (undated runs)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per case')
+    parser.add_argument('--output', help='write the JSON report to this path')
+    parser.add_argument('--baseline', help='JSON report from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed ops/sec drop vs. baseline, as a fraction (default 0.25)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.repeat)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.threshold)
+        report['baseline'] = args.baseline
+        report['threshold'] = args.threshold
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.output}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"   {r['name']} {r['num_trades']} trades date={r['date'] or '-'}: "
+                  f"{r['baseline_ops_per_sec']} -> {r['ops_per_sec']} ops/s ({r['change']:+.1%})")
+        return 1
+    if args.baseline:
+        print(f"\n✓ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -36,3 +36,51 @@ class Config:
     DEFAULT_STOP_LOSS = -0.50
     DEFAULT_VOLUME_SPIKE_THRESHOLD = 1.5
     DEFAULT_IV_THRESHOLD = 30
+    DEFAULT_MAX_HOLD_MINUTES = 60
+    
+    # Generated scenario days: in-memory LRU, optionally persisted per generator version
+    SCENARIO_CACHE_SIZE = int(os.getenv('SCENARIO_CACHE_SIZE', 512))
+    SCENARIO_CACHE_DIR = os.getenv('SCENARIO_CACHE_DIR', '')  # Empty: memory only
+    SCENARIO_CACHE_FORMAT = os.getenv('SCENARIO_CACHE_FORMAT', 'npz')  # 'npz' or memory-mapped 'npy'
+    
+    # Massive flat files (S3-compatible) for historical replay
+    MASSIVE_S3_ENDPOINT = os.getenv('MASSIVE_S3_ENDPOINT', 'https://files.massive.com')
+    MASSIVE_S3_BUCKET = os.getenv('MASSIVE_S3_BUCKET', 'flatfiles')
+    FLAT_FILE_DIR = os.getenv('FLAT_FILE_DIR', '/tmp/flat_files')
+    FLAT_FILE_MAX_BYTES = int(os.getenv('FLAT_FILE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    FLAT_FILE_DOWNLOAD_WORKERS = int(os.getenv('FLAT_FILE_DOWNLOAD_WORKERS', 8))  # Parallel ranged GETs
+    FLAT_FILE_PART_SIZE = int(os.getenv('FLAT_FILE_PART_SIZE', 8 * 1024 * 1024))
+    FLAT_FILE_MAX_BUFFER_BYTES = int(os.getenv('FLAT_FILE_MAX_BUFFER_BYTES', 64 * 1024 * 1024))  # Parts held in memory
+    
+    # Converted OPRA flat-file days for historical replay (memory-mapped columns)
+    FLAT_FILE_CACHE_DIR = os.getenv('FLAT_FILE_CACHE_DIR', '/tmp/flat_file_cache')  # Empty: no cache
+    # Once a load grows resident memory by this much it keeps only per-minute strike aggregates, not rows (0: no ceiling)
+    REPLAY_MAX_RSS_MB = int(os.getenv('REPLAY_MAX_RSS_MB', 384))
+    
+    # Live replay sessions (time-scaled streaming of a historical day)
+    REPLAY_MAX_SESSIONS = int(os.getenv('REPLAY_MAX_SESSIONS', 50))
+    REPLAY_DAY_CACHE_SIZE = 4  # Loaded days kept once no session uses them
+    # Sessions with no joined client and no API activity for this long are closed
+    REPLAY_IDLE_SECONDS = int(os.getenv('REPLAY_IDLE_SECONDS', 300))
+    REPLAY_TICK_SECONDS = 0.05
+    
+    # Multi-day backtests
+    BACKTEST_MAX_WORKERS = int(os.getenv('BACKTEST_MAX_WORKERS', os.cpu_count() or 1))
+    BACKTEST_MAX_RANGE_DAYS = 260
+    BACKTEST_MAX_VARIANTS = 20
+    
+    # Background backtest jobs
+    BACKTEST_MAX_CONCURRENT_JOBS = int(os.getenv('BACKTEST_MAX_CONCURRENT_JOBS', 2))
+    BACKTEST_JOB_HISTORY = 100
+    
+    # Stored trade logs (per backtest run)
+    TRADE_LOG_MAX_RUNS = 50
+    TRADE_LOG_MAX_BYTES = 256 * 1024 * 1024
+    TRADE_LOG_MAX_PAGE_SIZE = 1000
+    
+    # Portfolio (multi-symbol) backtests
+    PORTFOLIO_MAX_SYMBOLS = 20
+    PORTFOLIO_EQUITY_POINTS = 500
+    
+    # Parameter optimizer (successive halving)
+    OPTIMIZER_MAX_CONFIGS = 200
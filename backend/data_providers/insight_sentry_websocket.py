@@ -148,39 +148,50 @@ class InsightSentryWebSocket:
     async def _handle_messages(self):
         """Handle incoming WebSocket messages"""
         async for message in self.websocket:
-            try:
-                # Skip pong responses
-                if message == 'pong':
-                    logger.debug("Received pong")
-                    continue
-                
-                # Parse JSON message
-                data = json.loads(message)
-                
-                # Check for server heartbeat
-                if 'server_time' in data:
-                    logger.debug(f"Server heartbeat: {data['server_time']}")
-                    continue
-                
-                # Check for error messages
-                if 'message' in data and 'code' not in data:
-                    logger.warning(f"Server message: {data['message']}")
-                    continue
-                
-                # Check for quote data
-                if 'data' in data and isinstance(data['data'], list):
-                    for quote in data['data']:
-                        if 'code' in quote:
-                            await self._process_quote(quote)
-                
-                # Check for series data
-                elif 'code' in data and 'series' in data:
-                    await self._process_series(data)
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to decode JSON: {e}, message: {message}")
-            except Exception as e:
-                logger.error(f"Error processing message: {e}", exc_info=True)
+            await self.handle_message(message)
+    
+    async def handle_message(self, message: str):
+        """
+        Ingest one raw feed message. This is the entry point for every message
+        read from the socket, and can be driven directly by other sources
+        (e.g. a synthetic tick stream) to exercise the same pipeline.
+        
+        Args:
+            message: Raw text frame from the feed
+        """
+        try:
+            # Skip pong responses
+            if message == 'pong':
+                logger.debug("Received pong")
+                return
+            
+            # Parse JSON message
+            data = json.loads(message)
+            
+            # Check for server heartbeat
+            if 'server_time' in data:
+                logger.debug(f"Server heartbeat: {data['server_time']}")
+                return
+            
+            # Check for error messages
+            if 'message' in data and 'code' not in data:
+                logger.warning(f"Server message: {data['message']}")
+                return
+            
+            # Check for quote data
+            if 'data' in data and isinstance(data['data'], list):
+                for quote in data['data']:
+                    if 'code' in quote:
+                        await self._process_quote(quote)
+            
+            # Check for series data
+            elif 'code' in data and 'series' in data:
+                await self._process_series(data)
+            
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to decode JSON: {e}, message: {message}")
+        except Exception as e:
+            logger.error(f"Error processing message: {e}", exc_info=True)
     
     async def _process_quote(self, quote: Dict):
         """
@@ -0,0 +1,291 @@
+"""
+Synthetic Tick Stream
+Emits per-contract trade and quote events as Insight Sentry wire messages at
+a configurable rate, so the live ingestion path can be load-tested without a
+paid feed. Contract prices start from SimulatedDataProvider's underlyings,
+and the put/call mix and per-symbol activity follow HistoricalScenarioGenerator's
+minute flow for the chosen date.
+
+Usage (from backend/):
+    python -m data_providers.synthetic_tick_stream --rate 50000 --contracts 500 --duration 10
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+from config import Config
+from historical_scenario_generator import MINUTES_PER_SESSION, historical_generator
+from .simulated_provider import SimulatedDataProvider
+
+
+# Events generated per vectorized block; messages are sliced from the current block
+BLOCK_SIZE = 8192
+
+# Same shape as the feed's quote updates; last_update (ms, fractional) is stamped at send time
+QUOTE_TEMPLATE = ('{{"code":"{}","last_price":{:.2f},"volume":{},"bid":{:.2f},"ask":{:.2f},'
+                  '"bid_size":{},"ask_size":{},"change_percent":{:.2f},"lp_time":{},"last_update":{:.3f}}}')
+
+
+class SyntheticTickStream:
+    """Paced generator of option trade/quote messages in the Insight Sentry feed format"""
+
+    def __init__(self, symbols: List[str] = None, contracts: int = 500, rate: float = 50000,
+                 quotes_per_message: int = 50, trade_fraction: float = 0.3, date: str = None,
+                 minutes_per_second: float = 1.0, seed: int = None):
+        """
+        Args:
+            symbols: Underlyings to quote options on (default: Config.SYMBOLS)
+            contracts: Total option contracts, split evenly across symbols, calls and puts
+            rate: Target events per second
+            quotes_per_message: Events batched into each wire message
+            trade_fraction: Share of events that are trades (the rest are quote updates)
+            date: Scenario date driving the intraday put/call mix (default: today)
+            minutes_per_second: Simulated session minutes per wall-clock second
+            seed: RNG seed for reproducible streams
+        """
+        self.symbols = list(symbols or Config.SYMBOLS)
+        self.rate = rate
+        self.quotes_per_message = quotes_per_message
+        self.trade_fraction = trade_fraction
+        self.minutes_per_second = minutes_per_second
+        self.date = date or datetime.now().strftime('%Y-%m-%d')
+        self.rng = np.random.default_rng(seed)
+
+        self.strikes_per_side = max(1, contracts // (2 * len(self.symbols)))
+        self._build_contracts()
+        self._load_flow()
+
+        self.events_sent = 0
+        self.messages_sent = 0
+        self._block = None
+        self._block_offset = 0
+        self._block_minute = None
+
+    def _build_contracts(self):
+        """Strike grid per symbol (calls then puts), +/-20% around the underlying"""
+        provider = SimulatedDataProvider()
+        session = datetime.strptime(self.date, '%Y-%m-%d')
+        expiry = (session + timedelta(days=(4 - session.weekday()) % 7)).strftime('%y%m%d')  # Next Friday
+
+        k = self.strikes_per_side
+        codes, strikes, underlying, is_put = [], [], [], []
+        for symbol in self.symbols:
+            price = provider.base_prices.get(symbol, 100.0)
+            step = max(1, round(price * 0.4 / k))
+            grid = int(price / step) * step + (np.arange(k) - k // 2) * step
+            for side in ('C', 'P'):
+                codes.extend(f"OPRA:{symbol}{expiry}{side}{float(strike)}" for strike in grid)
+                strikes.extend(grid)
+                underlying.extend([price] * k)
+                is_put.extend([side == 'P'] * k)
+
+        self.codes = np.array(codes, dtype=object)
+        strikes = np.array(strikes, dtype=float)
+        underlying = np.array(underlying)
+        is_put = np.array(is_put)
+
+        # Intrinsic value plus time value peaking at the money
+        moneyness = (strikes - underlying) / (underlying * 0.05)
+        intrinsic = np.where(is_put, strikes - underlying, underlying - strikes).clip(min=0)
+        self.open_price = np.round(intrinsic + underlying * 0.01 * np.exp(-0.5 * moneyness ** 2) + 0.05, 2)
+        self.mid = self.open_price.copy()
+        self.last_price = self.open_price.copy()
+        self.volume = np.zeros(len(codes), dtype=np.int64)
+
+        # Activity concentrates at the money (same shape for every symbol/side)
+        position = np.arange(k) - k // 2
+        weights = np.exp(-0.5 * (position / max(k / 8, 1)) ** 2) + 0.02
+        self.strike_weights = weights / weights.sum()
+
+    def _load_flow(self):
+        """Per-minute symbol activity and put share from the scenario flow"""
+        frames = [historical_generator.generate_intraday_frame(self.date, symbol) for symbol in self.symbols]
+        total_volume = np.stack([f['total_volume'] for f in frames]).astype(float)  # (symbols, minutes)
+        ratio = np.stack([f['put_call_ratio'] for f in frames])
+        self.symbol_weights = total_volume / total_volume.sum(axis=0)
+        self.put_share = ratio / (1 + ratio)
+
+    def _generate_block(self, minute: int):
+        """Draw BLOCK_SIZE events for a simulated minute"""
+        rng = self.rng
+        k = self.strikes_per_side
+        symbol = rng.choice(len(self.symbols), BLOCK_SIZE, p=self.symbol_weights[:, minute])
+        is_put = rng.random(BLOCK_SIZE) < self.put_share[symbol, minute]
+        contract = (symbol * 2 + is_put) * k + rng.choice(k, BLOCK_SIZE, p=self.strike_weights)
+        is_trade = rng.random(BLOCK_SIZE) < self.trade_fraction
+
+        # Random-walk mids; spreads of ~2% with a 1 cent floor
+        np.multiply.at(self.mid, contract, np.exp(rng.normal(0, 0.002, BLOCK_SIZE)))
+        mid = self.mid[contract]
+        half_spread = np.maximum(0.005, mid * 0.01)
+        bid = np.maximum(0.01, mid - half_spread)
+        ask = mid + half_spread
+
+        trade_price = bid + rng.random(BLOCK_SIZE) * (ask - bid)
+        trade_size = np.where(is_trade, rng.integers(1, 50, BLOCK_SIZE), 0)
+        volume = self.volume[contract] + self._running_volume(contract, trade_size)
+        np.add.at(self.volume, contract, trade_size)
+        self.last_price[contract[is_trade]] = trade_price[is_trade]
+        last_price = np.where(is_trade, trade_price, self.last_price[contract])
+
+        self._block = list(zip(
+            self.codes[contract].tolist(),
+            last_price.tolist(),
+            volume.tolist(),
+            bid.tolist(),
+            ask.tolist(),
+            rng.integers(1, 500, BLOCK_SIZE).tolist(),
+            rng.integers(1, 500, BLOCK_SIZE).tolist(),
+            ((last_price / self.open_price[contract] - 1) * 100).tolist(),
+        ))
+        self._block_offset = 0
+        self._block_minute = minute
+
+    @staticmethod
+    def _running_volume(contract: np.ndarray, trade_size: np.ndarray) -> np.ndarray:
+        """Each event's cumulative trade size within the block, counting only its own contract's trades"""
+        order = np.argsort(contract, kind='stable')  # Groups contracts, keeping event order within each
+        grouped = contract[order]
+        size = trade_size[order]
+        running = np.cumsum(size)
+        starts = np.r_[True, grouped[1:] != grouped[:-1]]
+        # Subtract the running total reached before each contract's first event
+        volume = np.empty_like(running)
+        volume[order] = running - (running - size)[starts][np.cumsum(starts) - 1]
+        return volume
+
+    def next_message(self, minute: int = 0) -> str:
+        """The next wire message (quotes_per_message events), stamped with the current time"""
+        if self._block is None or self._block_minute != minute or \
+                self._block_offset + self.quotes_per_message > BLOCK_SIZE:
+            self._generate_block(minute)
+
+        events = self._block[self._block_offset:self._block_offset + self.quotes_per_message]
+        self._block_offset += self.quotes_per_message
+        now = time.time()
+        lp_time = int(now)
+        now_ms = now * 1000
+        quotes = ','.join(QUOTE_TEMPLATE.format(*event, lp_time, now_ms) for event in events)
+        return '{"data":[' + quotes + ']}'
+
+    async def run(self, sink: Callable[[str], Awaitable], duration: float = None, max_events: int = None) -> Dict:
+        """
+        Feed messages to `sink` (e.g. InsightSentryWebSocket.handle_message)
+        at the target rate until `duration` seconds or `max_events` events.
+        When the sink can't keep up the stream falls behind schedule rather
+        than dropping events; the returned stats report how far.
+        """
+        if duration is None and max_events is None:
+            raise ValueError("run() needs a duration or max_events")
+
+        start = time.perf_counter()
+        batch = self.quotes_per_message
+        sent = 0
+        while True:
+            elapsed = time.perf_counter() - start
+            if (duration is not None and elapsed >= duration) or (max_events is not None and sent >= max_events):
+                break
+
+            due = elapsed * self.rate
+            if sent + batch > due:
+                await asyncio.sleep((sent + batch - due) / self.rate)
+                continue
+
+            minute = int(elapsed * self.minutes_per_second) % MINUTES_PER_SESSION
+            await sink(self.next_message(minute))
+            sent += batch
+            self.messages_sent += 1
+
+        elapsed = time.perf_counter() - start
+        self.events_sent += sent
+        return {
+            'events': sent,
+            'messages': sent // batch,
+            'seconds': round(elapsed, 3),
+            'target_rate': self.rate,
+            'achieved_rate': round(sent / elapsed, 1) if elapsed > 0 else 0,
+            'behind_schedule_events': max(0, int(elapsed * self.rate) - sent)
+        }
+
+
+class LatencyRecorder:
+    """
+    Feed callback that measures end-to-end ingestion latency: the time from a
+    message being stamped at send (last_update) to its update reaching the callback.
+    """
+
+    def __init__(self, capacity: int = 200000):
+        self.samples = np.empty(capacity)
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+
+    async def __call__(self, code: str, data: Dict):
+        now = time.time()
+        self.samples[self.count % len(self.samples)] = now * 1000 - data['last_update']
+        self.count += 1
+        if self.first_seen is None:
+            self.first_seen = now
+        self.last_seen = now
+
+    def summary(self) -> Dict:
+        """Throughput and latency percentiles (ms) over the recorded updates"""
+        if not self.count:
+            return {'updates': 0}
+        samples = self.samples[:min(self.count, len(self.samples))]
+        elapsed = (self.last_seen - self.first_seen) or 1e-9
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            'updates': self.count,
+            'updates_per_sec': round(self.count / elapsed, 1),
+            'latency_ms_p50': round(float(p50), 3),
+            'latency_ms_p95': round(float(p95), 3),
+            'latency_ms_p99': round(float(p99), 3),
+            'latency_ms_max': round(float(samples.max()), 3)
+        }
+
+
+async def _load_test(args):
+    """Drive the Insight Sentry ingestion path with a synthetic stream"""
+    from .insight_sentry_websocket import InsightSentryWebSocket
+
+    recorder = LatencyRecorder()
+    client = InsightSentryWebSocket(rest_api_key='synthetic', callback=recorder)
+    stream = SyntheticTickStream(symbols=args.symbols, contracts=args.contracts, rate=args.rate,
+                                 quotes_per_message=args.quotes_per_message,
+                                 trade_fraction=args.trade_fraction, date=args.date, seed=args.seed)
+    stats = await stream.run(client.handle_message, duration=args.duration)
+    return stats, recorder.summary(), len(client.get_all_cached_data())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test feed ingestion with a synthetic tick stream')
+    parser.add_argument('--rate', type=float, default=50000, help='target events per second')
+    parser.add_argument('--contracts', type=int, default=500, help='option contracts across all symbols')
+    parser.add_argument('--symbols', nargs='+', help='underlyings (default: Config.SYMBOLS)')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run')
+    parser.add_argument('--quotes-per-message', type=int, default=50, help='events per wire message')
+    parser.add_argument('--trade-fraction', type=float, default=0.3, help='share of events that are trades')
+    parser.add_argument('--date', help='scenario date for the intraday flow (YYYY-MM-DD)')
+    parser.add_argument('--seed', type=int, help='RNG seed')
+    args = parser.parse_args(argv)
+
+    stats, latency, cached = asyncio.run(_load_test(args))
+    print(f"Stream:  {stats['events']:,} events in {stats['messages']:,} messages over {stats['seconds']}s "
+          f"-> {stats['achieved_rate']:,.0f}/s (target {stats['target_rate']:,.0f}/s, "
+          f"{stats['behind_schedule_events']:,} behind)")
+    print(f"Ingest:  {latency.get('updates', 0):,} updates, {latency.get('updates_per_sec', 0):,.0f}/s, "
+          f"{cached} contracts cached")
+    if latency.get('updates'):
+        print(f"Latency: p50 {latency['latency_ms_p50']} ms, p95 {latency['latency_ms_p95']} ms, "
+              f"p99 {latency['latency_ms_p99']} ms, max {latency['latency_ms_max']} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Bar-Path Exit Engine
+Resolves profit target / stop loss exits by scanning the option price bars
+after each entry. All entries are evaluated together with cumulative max/min
+over an (entries x holding period) window of bars.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+EXIT_TARGET = 0
+EXIT_STOP = 1
+EXIT_TIME = 2
+EXIT_REASONS = {EXIT_TARGET: 'Target', EXIT_STOP: 'Stop', EXIT_TIME: 'Time'}
+
+# Rows of the (entries x max_hold) window evaluated per pass, bounds peak memory
+ENTRY_CHUNK = 20000
+
+
+def simulate_exits(entries: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                   profit_target: float, stop_loss: float, max_hold: int,
+                   series_end: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """
+    Find each entry's first passage of the profit target or stop loss.
+
+    Entries fill at close[entry]. The following `max_hold` bars are scanned;
+    a bar whose high reaches entry * (1 + profit_target) exits at the target,
+    one whose low reaches entry * (1 + stop_loss) exits at the stop. When both
+    are touched within the same bar the stop is assumed to fill first. Entries
+    that hit neither exit at the close of their last available bar.
+
+    Several series can be laid end to end in one array (e.g. a flattened
+    symbols x minutes grid); `series_end` then gives, per entry, the index one
+    past the last bar of its own series so paths never run into the next one.
+
+    Returns 'exit_index', 'hold_minutes', 'percent_return' and 'exit_reason' arrays.
+    """
+    entries = np.asarray(entries, dtype=np.int64)
+    num_bars = len(close)
+    if series_end is None:
+        series_end = np.full(len(entries), num_bars, dtype=np.int64)
+    results = {
+        'exit_index': np.empty(len(entries), dtype=np.int64),
+        'percent_return': np.empty(len(entries), dtype=float),
+        'exit_reason': np.empty(len(entries), dtype=np.int8),
+    }
+
+    offsets = np.arange(1, max_hold + 1)
+    for start in range(0, len(entries), ENTRY_CHUNK):
+        chunk = entries[start:start + ENTRY_CHUNK]
+        end = start + len(chunk)
+        entry_price = close[chunk][:, None]
+
+        chunk_end = series_end[start:end]
+        bar_index = chunk[:, None] + offsets[None, :]
+        available = bar_index < chunk_end[:, None]
+        bar_index = np.minimum(bar_index, num_bars - 1)
+
+        # Best and worst return seen so far along each entry's path
+        best = np.maximum.accumulate(np.where(available, high[bar_index] / entry_price - 1, -np.inf), axis=1)
+        worst = np.minimum.accumulate(np.where(available, low[bar_index] / entry_price - 1, np.inf), axis=1)
+
+        hit_target = best >= profit_target
+        hit_stop = worst <= stop_loss
+        target_bar = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), max_hold)
+        stop_bar = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), max_hold)
+
+        # Time exit at the last bar actually available to the entry
+        last_bar = np.maximum(available.sum(axis=1) - 1, 0)
+        time_index = np.minimum(chunk + 1 + last_bar, chunk_end - 1)
+        time_return = close[time_index] / close[chunk] - 1
+
+        stopped = (stop_bar <= target_bar) & (stop_bar < max_hold)
+        targeted = ~stopped & (target_bar < max_hold)
+
+        results['exit_reason'][start:end] = np.select([stopped, targeted], [EXIT_STOP, EXIT_TARGET], EXIT_TIME)
+        results['percent_return'][start:end] = np.select(
+            [stopped, targeted], [stop_loss, profit_target], time_return
+        )
+        results['exit_index'][start:end] = np.select(
+            [stopped, targeted], [chunk + 1 + stop_bar, chunk + 1 + target_bar], time_index
+        )
+
+    # Entries on the final bar have nothing to scan and exit flat
+    results['exit_index'] = np.minimum(results['exit_index'], series_end - 1)
+    results['hold_minutes'] = results['exit_index'] - entries
+    return results
+
+
+def synthetic_option_bars(underlying_open: np.ndarray, underlying_high: np.ndarray,
+                          underlying_low: np.ndarray, underlying_close: np.ndarray,
+                          leverage: float, base_premium: float = 5.0) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Derive call and put premium OHLC bars from underlying bars. Premiums move
+    `leverage` times the underlying's log return (calls up, puts down), so the
+    return between any two bars is independent of when the series started.
+    """
+    log_base = np.log(underlying_close[0])
+
+    def premium(prices, sign):
+        return base_premium * np.exp(sign * leverage * (np.log(prices) - log_base))
+
+    return {
+        'calls': {
+            'open': premium(underlying_open, 1),
+            'high': premium(underlying_high, 1),
+            'low': premium(underlying_low, 1),
+            'close': premium(underlying_close, 1),
+        },
+        'puts': {
+            'open': premium(underlying_open, -1),
+            'high': premium(underlying_low, -1),
+            'low': premium(underlying_high, -1),
+            'close': premium(underlying_close, -1),
+        },
+    }
@@ -0,0 +1,265 @@
+"""
+Flat File Column Cache
+Converted OPRA minute aggregates per (date, underlying): typed .npy columns
+sorted by window_start, memory-mapped on load. Each day directory carries
+its own entry.json and appears with a single rename; manifest.json is an
+index rebuilt from those entries under a file lock, so processes sharing
+the cache never lose each other's days. Replaying a day seen before skips
+the download and parse.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from occ_symbols import intern_tickers
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows: the rebuild alone keeps days from being lost
+    fcntl = None
+
+
+# Bump whenever the stored columns change so older days are rebuilt
+CACHE_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+ENTRY_NAME = 'entry.json'
+
+# Cached per-row column -> dtype
+CACHE_COLUMNS = {
+    'window_start': np.dtype(np.int64),
+    'contract': np.dtype(np.int32),  # index into the day's contract table
+    'expiry': np.dtype('datetime64[D]'),
+    'type': np.dtype('S1'),  # b'C' or b'P'
+    'strike': np.dtype(np.float64),
+    'volume': np.dtype(np.float64),
+    'open': np.dtype(np.float64),
+    'high': np.dtype(np.float64),
+    'low': np.dtype(np.float64),
+    'close': np.dtype(np.float64),
+}
+# Per-contract tickers, stored alongside the row columns
+CONTRACTS_FILE = 'contracts.npy'
+
+
+def contract_columns(minute_data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Cache columns from parsed flat-file rows (see flat_file_parser), sorted
+    by window_start. Tickers are interned, so only unique contracts are
+    parsed; 'contracts' holds the ticker of each contract id.
+    """
+    order = np.argsort(minute_data['window_start'], kind='stable')
+    contract, contracts = intern_tickers(minute_data['ticker'][order])
+    columns = {'contract': contract}
+    columns.update({field: contracts[field][contract] for field in ('expiry', 'type', 'strike')})
+    columns.update({column: minute_data[column][order]
+                    for column in ('window_start', 'volume', 'open', 'high', 'low', 'close')})
+    columns = {column: np.ascontiguousarray(columns[column], dtype=dtype) for column, dtype in CACHE_COLUMNS.items()}
+    columns['contracts'] = contracts['ticker']
+    return columns
+
+
+class FlatFileCache:
+    """Columnar store of converted flat-file days under `root`, indexed by a JSON manifest"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._entries = self._read_manifest()
+
+    def get(self, date: str, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-mapped columns (plus the 'contracts' table) of a cached day, or None if it is not cached"""
+        entry = self.entry(date, symbol)
+        if entry is None:
+            return None
+        try:
+            return self._load(os.path.join(self.root, entry['path']))
+        except (OSError, ValueError):
+            # Evicted or damaged on disk: treat as a miss so the day is rebuilt
+            return None
+
+    def entry(self, date: str, symbol: str) -> Optional[Dict]:
+        """Manifest entry of a cached day; falls back to the day's own entry for days cached by other processes"""
+        key = self._key(date, symbol)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._read_entry(os.path.join(self.root, self._relative(date, symbol)))
+            if entry is not None:
+                with self._lock:
+                    self._entries = {**self._entries, key: entry}
+        return entry
+
+    def entries(self) -> List[Dict]:
+        """Every cached day on disk, oldest date first"""
+        return sorted(self._scan().values(), key=lambda e: (e['date'], e['symbol']))
+
+    def put(self, date: str, symbol: str, columns: Dict[str, np.ndarray], source: str = None) -> Dict:
+        """
+        Write a day's cache columns (see contract_columns) atomically and index
+        it. If another writer got there first with a complete day, that copy
+        is kept and returned.
+        """
+        relative = self._relative(date, symbol)
+        target = os.path.join(self.root, relative)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp)
+        try:
+            for column, dtype in CACHE_COLUMNS.items():
+                np.save(os.path.join(tmp, f"{column}.npy"), np.asarray(columns[column], dtype=dtype))
+            np.save(os.path.join(tmp, CONTRACTS_FILE), np.asarray(columns['contracts'], dtype=np.str_))
+
+            window_start = columns['window_start']
+            entry = {
+                'date': date,
+                'symbol': symbol,
+                'path': relative,
+                'rows': len(window_start),
+                'first_window_start': int(window_start[0]) if len(window_start) else None,
+                'last_window_start': int(window_start[-1]) if len(window_start) else None,
+                'contracts': len(columns['contracts']),
+                'expiries': int(len(np.unique(columns['expiry']))),
+                'strikes': int(len(np.unique(columns['strike']))),
+                'bytes': sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)),
+                'source': source,
+                'cached_at': datetime.now().isoformat()
+            }
+            with open(os.path.join(tmp, ENTRY_NAME), 'w') as f:
+                json.dump(entry, f, indent=2)
+            entry = self._publish(tmp, target) or entry
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        with self._lock:
+            self._entries = {**self._entries, self._key(date, symbol): entry}
+            self._write_manifest()
+        return entry
+
+    def _publish(self, tmp: str, target: str) -> Optional[Dict]:
+        """
+        Rename `tmp` into place. Returns None when it was published, or the
+        entry of a complete day another writer published first (tmp is then
+        left for the caller to discard). A damaged day in the way is moved
+        aside first, so readers never see a half-replaced directory.
+        """
+        try:
+            os.rename(tmp, target)
+            return None
+        except OSError:
+            if not os.path.exists(target):
+                raise
+        entry = self._read_entry(target)
+        if entry is not None:
+            return entry
+
+        stale = f"{target}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(target, stale)
+        except OSError:
+            pass  # Another writer is replacing it too
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            entry = self._read_entry(target)
+            if entry is None:
+                raise
+            return entry
+        finally:
+            shutil.rmtree(stale, ignore_errors=True)
+        return None
+
+    def remove(self, date: str, symbol: str) -> bool:
+        """Drop a cached day; returns whether it was cached"""
+        entry = self.entry(date, symbol)
+        if entry is None:
+            return False
+        shutil.rmtree(os.path.join(self.root, entry['path']), ignore_errors=True)
+        with self._lock:
+            self._entries = {key: e for key, e in self._entries.items() if key != self._key(date, symbol)}
+            self._write_manifest()
+        return True
+
+    @staticmethod
+    def _key(date: str, symbol: str) -> str:
+        return f"{date}/{symbol}"
+
+    @staticmethod
+    def _relative(date: str, symbol: str) -> str:
+        return os.path.join(f"v{CACHE_VERSION}", f"date={date}", f"symbol={symbol}")
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, np.ndarray]:
+        columns = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r') for column in CACHE_COLUMNS}
+        columns['contracts'] = np.load(os.path.join(path, CONTRACTS_FILE), mmap_mode='r')
+        return columns
+
+    def _read_entry(self, path: str) -> Optional[Dict]:
+        """A day directory's own entry, or None unless the day is complete and readable"""
+        try:
+            with open(os.path.join(path, ENTRY_NAME)) as f:
+                entry = json.load(f)
+            self._load(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _scan(self) -> Dict[str, Dict]:
+        """Entries of every complete day directory under the current cache version"""
+        entries = {}
+        version_dir = os.path.join(self.root, f"v{CACHE_VERSION}")
+        for date_dir in sorted(os.listdir(version_dir)) if os.path.isdir(version_dir) else []:
+            if not date_dir.startswith('date=') or not os.path.isdir(os.path.join(version_dir, date_dir)):
+                continue
+            for symbol_dir in sorted(os.listdir(os.path.join(version_dir, date_dir))):
+                if not symbol_dir.startswith('symbol=') or symbol_dir.endswith(('.tmp', '.stale')):
+                    continue  # Being written or replaced
+                entry = self._read_entry(os.path.join(version_dir, date_dir, symbol_dir))
+                if entry is not None:
+                    entries[self._key(entry['date'], entry['symbol'])] = entry
+        return entries
+
+    def _read_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(os.path.join(self.root, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('cache_version') != CACHE_VERSION:
+            return {}
+        return manifest['entries']
+
+    def _write_manifest(self):
+        """
+        Rebuild the manifest from the day directories and replace it
+        atomically (callers hold the lock). Scan and write happen under a
+        file lock shared with other processes, so the last manifest written
+        always includes every day renamed into place before it.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_NAME)
+        with self._manifest_lock(path):
+            self._entries = self._scan()
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'cache_version': CACHE_VERSION, 'columns': {c: str(d) for c, d in CACHE_COLUMNS.items()},
+                           'entries': self._entries}, f, indent=2)
+            os.replace(tmp, path)
+
+    @staticmethod
+    @contextmanager
+    def _manifest_lock(path: str):
+        """Exclusive lock across processes on `path`.lock (no-op without fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,227 @@
+"""
+OPRA Minute Aggregate Flat File Parser
+Streams a day's minute_aggs CSV (gzip or plain) into typed column arrays.
+Rows are filtered on the exact OCC root (`O:<SYMBOL>` followed by the expiry
+digits, so SPY does not match SPYG) before anything is split, and only the
+requested columns are kept. Several underlyings can be extracted in one pass
+and split afterwards with `split_by_underlying`.
+"""
+import gzip
+import re
+import zlib
+from typing import BinaryIO, Callable, Dict, Iterable, Union
+
+import numpy as np
+
+from occ_symbols import parse_occ_tickers
+
+
+# Column name -> dtype of the parsed array
+MINUTE_AGG_DTYPES = {
+    'ticker': np.str_,
+    'window_start': np.int64,
+    'volume': np.float64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'transactions': np.float64,
+}
+DEFAULT_COLUMNS = ('ticker', 'window_start', 'volume', 'open', 'high', 'low', 'close')
+
+# Substituted for empty numeric fields (missing volume counts as no trades)
+EMPTY_FIELD_VALUES = {'volume': b'0', 'transactions': b'0'}
+
+CHUNK_SIZE = 1 << 20
+
+# zlib window bits for gzip-wrapped streams
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class MinuteAggParser:
+    """
+    Incremental parser: `feed` raw bytes in chunks of any size (line breaks
+    may fall anywhere), then `result` returns the matching rows as arrays.
+    Each complete block of lines is filtered with one regex scan and
+    converted to typed arrays straight away, so no per-row objects are built.
+    `symbol` may be one underlying or several, matched in the same scan.
+
+    `sink`, if given, receives each block's columns as they are parsed, so
+    callers can fold rows into running aggregates; `discard` then drops the
+    rows kept so far and stops keeping more, bounding memory to one block.
+    """
+
+    def __init__(self, symbol: Union[str, Iterable[str]], columns: Iterable[str] = DEFAULT_COLUMNS,
+                 sink: Callable[[Dict[str, np.ndarray]], None] = None):
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        self.symbols = tuple(dict.fromkeys(s.upper() for s in symbols))
+        if not self.symbols:
+            raise ValueError("At least one symbol is required")
+        self.symbol = ','.join(self.symbols)
+        self.columns = tuple(columns)
+        unknown = [c for c in self.columns if c not in MINUTE_AGG_DTYPES]
+        if unknown:
+            raise ValueError(f"Unknown minute aggregate columns: {unknown}")
+
+        self.sink = sink
+        self.retain = True
+        self.rows_matched = 0
+        self.bytes_read = 0
+        self._pattern = None  # compiled once the header gives the ticker position
+        self._indices = None
+        self._width = None
+        self._tail = b''
+        self._parts = {column: [] for column in self.columns}
+
+    def feed(self, chunk: bytes):
+        """Parse every complete line in `chunk`, keeping a trailing partial line for the next call"""
+        self.bytes_read += len(chunk)
+        data = self._tail + chunk if self._tail else chunk
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            self._tail = data
+            return
+        self._tail = data[cut:]
+        block = data[:cut]
+
+        if self._pattern is None:
+            header_end = block.index(b'\n')
+            self._read_header(block[:header_end])
+            block = block[header_end + 1:]
+        self._parse_block(block)
+
+    def discard(self):
+        """Stop keeping parsed rows (they still reach the sink) and free those kept so far"""
+        self.retain = False
+        self._parts = {column: [] for column in self.columns}
+
+    def result(self) -> Dict[str, np.ndarray]:
+        """Flush any final unterminated line and return the parsed columns (empty after `discard`)"""
+        if self._tail:
+            tail, self._tail = self._tail, b''
+            self.bytes_read -= len(tail) + 1
+            self.feed(tail + b'\n')
+
+        return {
+            column: np.concatenate(parts) if parts else np.empty(0, dtype=MINUTE_AGG_DTYPES[column])
+            for column, parts in self._parts.items()
+        }
+
+    def _read_header(self, header: bytes):
+        names = header.strip().decode('ascii').split(',')
+        missing = [c for c in self.columns + ('ticker',) if c not in names]
+        if missing:
+            raise ValueError(f"Flat file is missing columns: {missing}")
+
+        self._width = len(names)
+        self._indices = [names.index(column) for column in self.columns]
+        # Skip the fields before the ticker, then require the exact root and an expiry digit.
+        # Anchoring on a literal newline (rather than ^ with MULTILINE) lets the regex
+        # engine jump between candidate lines instead of trying every position.
+        leading = rb'(?:[^,\n]*,)' * names.index('ticker')
+        roots = b'|'.join(re.escape(symbol.encode('ascii')) for symbol in self.symbols)
+        self._pattern = re.compile(rb'\n(' + leading + rb'O:(?:' + roots + rb')\d[^\r\n]*)')
+
+    def _parse_block(self, block: bytes):
+        lines = self._pattern.findall(b'\n' + block)
+        if not lines:
+            return
+
+        # One split for the whole block; column i is then every width-th field
+        fields = b','.join(lines).split(b',')
+        if len(fields) != len(lines) * self._width:
+            raise ValueError(f"Malformed {self.symbol} rows: expected {self._width} fields per row")
+
+        block_columns = {column: self._convert(column, fields[index::self._width])
+                         for column, index in zip(self.columns, self._indices)}
+        del fields
+        self.rows_matched += len(lines)
+        if self.sink:
+            self.sink(block_columns)
+        if self.retain:
+            for column, values in block_columns.items():
+                self._parts[column].append(values)
+
+    @staticmethod
+    def _convert(column: str, values: list) -> np.ndarray:
+        raw = np.array(values)
+        dtype = MINUTE_AGG_DTYPES[column]
+        if dtype is np.str_:
+            return raw.astype(np.str_)
+        try:
+            return raw.astype(dtype)
+        except ValueError:
+            return np.where(raw == b'', EMPTY_FIELD_VALUES.get(column, b'nan'), raw).astype(dtype)
+
+
+class GzipChunkParser:
+    """
+    Decompresses a gzip flat file arriving as compressed chunks (e.g. while
+    it downloads) and feeds a MinuteAggParser, so parsing keeps pace with
+    the transfer. Concatenated gzip members are handled.
+    """
+
+    def __init__(self, symbol: Union[str, Iterable[str]], columns: Iterable[str] = DEFAULT_COLUMNS,
+                 progress_callback=None, sink=None):
+        self.parser = MinuteAggParser(symbol, columns, sink=sink)
+        self.compressed_bytes = 0
+        self.progress_callback = progress_callback
+        self._decompressor = zlib.decompressobj(GZIP_WBITS)
+
+    def feed(self, chunk: bytes):
+        self.compressed_bytes += len(chunk)
+        # At most CHUNK_SIZE of text per step, so each parsed block (and its
+        # temporaries) stays fixed-size however well the file compresses
+        data = chunk
+        while data:
+            self.parser.feed(self._decompressor.decompress(data, CHUNK_SIZE))
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(GZIP_WBITS)
+            else:
+                data = self._decompressor.unconsumed_tail
+        if self.progress_callback:
+            self.progress_callback({'compressed_bytes': self.compressed_bytes,
+                                    'bytes_parsed': self.parser.bytes_read,
+                                    'rows': self.parser.rows_matched})
+
+    def result(self) -> Dict[str, np.ndarray]:
+        self.parser.feed(self._decompressor.flush())
+        return self.parser.result()
+
+
+def parse_minute_aggs(source: Union[str, BinaryIO], symbol: Union[str, Iterable[str]],
+                      columns: Iterable[str] = DEFAULT_COLUMNS, chunk_size: int = CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Parse a minute aggregates file for one underlying's options (or several,
+    see split_by_underlying). `source` is a path (gzip when it ends in .gz)
+    or an open binary stream.
+    """
+    parser = MinuteAggParser(symbol, columns)
+    stream = source
+    if isinstance(source, str):
+        stream = gzip.open(source, 'rb') if source.endswith('.gz') else open(source, 'rb')
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    finally:
+        if stream is not source:
+            stream.close()
+    return parser.result()
+
+
+def split_by_underlying(rows: Dict[str, np.ndarray], symbols: Iterable[str]) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Split rows parsed for several underlyings into one set of columns per
+    symbol, in file order. Roots are parsed once per unique ticker.
+    """
+    tickers, inverse = np.unique(rows['ticker'], return_inverse=True)
+    roots = parse_occ_tickers(tickers)['root'][inverse.ravel()]
+    buckets = {}
+    for symbol in dict.fromkeys(s.upper() for s in symbols):
+        mask = roots == symbol
+        buckets[symbol] = {column: values[mask] for column, values in rows.items()}
+    return buckets
@@ -0,0 +1,230 @@
+"""
+Flat File Store
+Downloads flat files from an S3-compatible object store into a size-bounded
+local directory. Objects are fetched as byte ranges in parallel and handed
+in order to an optional consumer (e.g. a decompress-and-parse pipeline) as
+they arrive. Downloads land in a unique temp file and are renamed into
+place only after their size and ETag (MD5 for single-part objects) check
+out. Concurrent requests for the same key share one download, and the
+least recently used files are evicted once the store exceeds its size limit.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+META_SUFFIX = '.meta.json'
+TMP_SUFFIX = '.tmp'
+
+PART_SIZE = 8 * 1024 * 1024
+DOWNLOAD_WORKERS = 8
+MAX_BUFFERED_BYTES = 64 * 1024 * 1024
+
+
+class FlatFileIntegrityError(IOError):
+    """A downloaded file did not match the object store's size or checksum"""
+
+
+class FlatFileStore:
+    """Local LRU store of object-store files, keyed by object key"""
+
+    def __init__(self, s3_client, bucket: str, root: str, max_bytes: int, retries: int = 1,
+                 part_size: int = PART_SIZE, max_workers: int = DOWNLOAD_WORKERS,
+                 max_buffered_bytes: int = MAX_BUFFERED_BYTES):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.root = root
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.max_buffered_bytes = max_buffered_bytes
+        self.stats = {'hits': 0, 'downloads': 0, 'deduplicated': 0, 'evictions': 0, 'bytes_downloaded': 0}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._executor = None
+
+    def fetch(self, key: str, consumer_factory: Callable[[], Callable[[bytes], None]] = None) -> str:
+        """
+        Local path of an up-to-date copy of `key`, downloading it if missing
+        or changed. Callers asking for a key that is already downloading wait
+        for that download instead of starting another.
+
+        When this call downloads, `consumer_factory` is invoked at the start
+        of each attempt and the callable it returns receives the object's
+        bytes in order while later ranges are still in flight. It is not
+        invoked for local hits or deduplicated waits, so callers fall back to
+        reading the returned path.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats['deduplicated'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            path = self._fetch(key, consumer_factory)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def _fetch(self, key: str, consumer_factory) -> str:
+        head = self.s3.head_object(Bucket=self.bucket, Key=key)
+        etag = head['ETag'].strip('"')
+        size = head['ContentLength']
+        path = self.local_path(key)
+
+        meta = self._read_meta(path)
+        if meta and meta['etag'] == etag and meta['size'] == size and self._size(path) == size:
+            os.utime(path)  # mark as recently used
+            with self._lock:
+                self.stats['hits'] += 1
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for attempt in range(self.retries + 1):
+            tmp = f"{path}.{uuid.uuid4().hex}{TMP_SUFFIX}"
+            try:
+                consume = consumer_factory() if consumer_factory else None
+                written, md5 = self._download(key, etag, size, tmp, consume)
+                self._verify(key, etag, size, written, md5)
+                os.replace(tmp, path)
+                break
+            except FlatFileIntegrityError as e:
+                self._remove(tmp)
+                if attempt == self.retries:
+                    raise
+                print(f"⚠️  {e}; retrying")
+            except BaseException:
+                self._remove(tmp)
+                raise
+
+        self._write_meta(path, {'key': key, 'etag': etag, 'size': size,
+                                'downloaded_at': datetime.now().isoformat()})
+        with self._lock:
+            self.stats['downloads'] += 1
+            self.stats['bytes_downloaded'] += size
+        self._evict(keep=path)
+        return path
+
+    def _download(self, key: str, etag: str, size: int, path: str, consume=None):
+        """
+        Fetch `key` as parallel byte ranges, writing (and consuming) them in
+        order. At most 2 x max_workers ranges (and max_buffered_bytes) are
+        outstanding, so a slow consumer holds back the download instead of
+        buffering the whole file. Returns (bytes written, MD5 hex digest).
+        """
+        window = max(1, min(2 * self.max_workers, self.max_buffered_bytes // self.part_size))
+        ranges = deque((start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size))
+        executor = self._pool()
+        pending = deque()
+        md5 = hashlib.md5()
+        written = 0
+        try:
+            with open(path, 'wb') as f:
+                while ranges or pending:
+                    while ranges and len(pending) < window:
+                        pending.append(executor.submit(self._get_range, key, etag, *ranges.popleft()))
+                    data = pending.popleft().result()
+                    f.write(data)
+                    md5.update(data)
+                    written += len(data)
+                    if consume:
+                        consume(data)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return written, md5.hexdigest()
+
+    def _get_range(self, key: str, etag: str, start: int, end: int) -> bytes:
+        # IfMatch fails the range instead of mixing two versions of a replaced object
+        response = self.s3.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag)
+        return response['Body'].read()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='flat-file-download')
+            return self._executor
+
+    def _verify(self, key: str, etag: str, size: int, written: int, md5: str):
+        """Size always; MD5 when the ETag is a plain MD5 (multipart ETags are not)"""
+        if written != size:
+            raise FlatFileIntegrityError(f"Size mismatch for {key}: expected {size} bytes, got {written}")
+        if '-' not in etag and len(etag) == 32 and md5 != etag:
+            raise FlatFileIntegrityError(f"Checksum mismatch for {key}: expected {etag}, got {md5}")
+
+    def _evict(self, keep: str):
+        """Remove least recently used files until the store fits in max_bytes"""
+        with self._lock:
+            busy = {self.local_path(key) for key in self._inflight} | {keep}
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(META_SUFFIX) or name.endswith(TMP_SUFFIX):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # evicted concurrently
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in busy:
+                continue
+            self._remove(path + META_SUFFIX)
+            self._remove(path)
+            total -= size
+            with self._lock:
+                self.stats['evictions'] += 1
+
+    def _read_meta(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path + META_SUFFIX) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, path: str, meta: Dict):
+        tmp = f"{path}{META_SUFFIX}.{uuid.uuid4().hex}{TMP_SUFFIX}"
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path + META_SUFFIX)
+
+    @staticmethod
+    def _size(path: str) -> Optional[int]:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -3,14 +3,36 @@ Historical Replay System using Massive Flat Files
 Downloads and processes real historical options data to create snapshots
 """
 import os
-import csv
-import gzip
+import sys
+import tempfile
+import threading
+import time
 import boto3
+import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from collections import defaultdict
+from typing import Dict, List, Optional, Union
+from collections import OrderedDict, deque
+from zoneinfo import ZoneInfo
 from botocore.config import Config
 
+from config import Config as AppConfig
+from flat_file_cache import FlatFileCache, contract_columns
+from flat_file_parser import CHUNK_SIZE, GzipChunkParser, split_by_underlying
+from flat_file_store import FlatFileStore
+from strike_flow import StrikeFlowAggregator, cumulative_flow
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MINUTES_PER_SESSION = 390  # 9:30 AM to 4:00 PM ET
+MINUTE_FRAME_CACHE_SIZE = 16
+STRIKE_FLOW_CACHE_SIZE = 4
+LOAD_METRICS_HISTORY = 100
+# Cached rows folded into strike flow per step
+FOLD_ROWS = 1 << 18
+# Minimum spacing of partial strike flow updates while a day downloads
+PARTIAL_FLOW_SECONDS = 0.5
+# Default snapshot times as minutes after the open: 9:45, 11:30, 14:00, 15:45 ET
+DEFAULT_SNAPSHOT_MINUTES = (15, 120, 270, 375)
+
 
 class HistoricalReplayLoader:
     """Load historical options data from Massive S3 and create replay snapshots"""
@@ -18,8 +40,8 @@ class HistoricalReplayLoader:
     def __init__(self):
         self.s3_access_key = os.getenv('MASSIVE_S3_ACCESS_KEY')
         self.s3_secret_key = os.getenv('MASSIVE_S3_SECRET_KEY')
-        self.endpoint = 'https://files.massive.com'
-        self.bucket = 'flatfiles'
+        self.endpoint = AppConfig.MASSIVE_S3_ENDPOINT
+        self.bucket = AppConfig.MASSIVE_S3_BUCKET
         
         if self.s3_access_key and self.s3_secret_key:
             self.session = boto3.Session(
@@ -29,115 +51,442 @@ class HistoricalReplayLoader:
             self.s3 = self.session.client(
                 's3',
                 endpoint_url=self.endpoint,
-                config=Config(signature_version='s3v4'),
+                config=Config(signature_version='s3v4',
+                              max_pool_connections=AppConfig.FLAT_FILE_DOWNLOAD_WORKERS),
             )
             print("✅ S3 client initialized for Massive Flat Files")
+            # Downloaded day files, shared by concurrent requests and reused while they fit
+            self.flat_files = FlatFileStore(self.s3, self.bucket, AppConfig.FLAT_FILE_DIR,
+                                            AppConfig.FLAT_FILE_MAX_BYTES,
+                                            part_size=AppConfig.FLAT_FILE_PART_SIZE,
+                                            max_workers=AppConfig.FLAT_FILE_DOWNLOAD_WORKERS,
+                                            max_buffered_bytes=AppConfig.FLAT_FILE_MAX_BUFFER_BYTES)
         else:
             self.s3 = None
+            self.flat_files = None
             print("⚠️  No S3 credentials found - using pre-generated snapshots")
+        
+        # Converted days, reused across requests and restarts
+        self.cache = FlatFileCache(AppConfig.FLAT_FILE_CACHE_DIR) if AppConfig.FLAT_FILE_CACHE_DIR else None
+        
+        # (date, symbol) -> per-minute columnar frame, most recently used last
+        self._minute_frames = OrderedDict()
+        # (date, symbol) -> per-minute strike flow, most recently used last
+        self._strike_flows = OrderedDict()
+        # Guards both LRUs above across request threads; each process has its own caches
+        self._cache_lock = threading.Lock()
+        # Recent flat-file loads: rows, whether they were kept, time and peak RSS
+        self.load_metrics = deque(maxlen=LOAD_METRICS_HISTORY)
     
-    def download_minute_data(self, date: str, symbol: str = 'SPY') -> List[Dict]:
+    def download_minute_data(self, date: str, symbol: str = 'SPY') -> Optional[Dict[str, np.ndarray]]:
         """
-        Download minute aggregate data for a specific date
+        Minute aggregate data for a specific date
         date format: YYYY-MM-DD (e.g., '2025-12-27')
+        Returns the symbol's option rows as cache columns sorted by window_start
+        (see flat_file_cache.CACHE_COLUMNS), memory-mapped when the day was
+        cached before, or None when no data is available.
         """
-        if not self.s3:
+        if self.cache:
+            cached = self.cache.get(date, symbol)
+            if cached is not None:
+                print(f"✅ Loaded {len(cached['window_start'])} cached minute records for {symbol} options")
+                return cached
+        
+        rows = self._fetch_minute_aggs(date, symbol)
+        if rows is None:
             return self._get_fallback_data(date, symbol)
+        return self._cache_rows(date, symbol, rows)
+    
+    def _cache_rows(self, date: str, symbol: str, rows: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Cache columns of freshly parsed rows, written to the cache when one is configured"""
+        columns = contract_columns(rows)
+        if self.cache:
+            try:
+                self.cache.put(date, symbol, columns, source=self._object_key(date))
+            except OSError as e:
+                print(f"⚠️  Could not cache {symbol} {date}: {e}")
+        return columns
+    
+    def load_strike_flow(self, date: str, symbol: str = 'SPY',
+                         partial_callback=None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Per-minute, per-strike call/put volume for the session (see
+        strike_flow.StrikeFlowAggregator), or None when no data is available.
+        Rows are folded in fixed-size chunks: from the cached columns when the
+        day is cached, otherwise as the flat file is parsed, in which case the
+        rows are also kept and cached unless the load grows memory past
+        REPLAY_MAX_RSS_MB. A failed download gives None rather than the part
+        already folded.
+        
+        While the file downloads and parses, `partial_callback` receives the
+        flow of the rows folded so far (with parse progress), at most every
+        PARTIAL_FLOW_SECONDS; the returned flow is the complete day.
+        """
+        key = (date, symbol)
+        flow = self._cached(self._strike_flows, key)
+        if flow is not None:
+            return flow
+        
+        open_ns = int(self._session_open(date).timestamp() * 1e9)
+        aggregators = [StrikeFlowAggregator(open_ns, MINUTES_PER_SESSION)]
+        cached = self.cache.get(date, symbol) if self.cache else None
+        if cached is not None:
+            for start in range(0, len(cached['window_start']), FOLD_ROWS):
+                chunk = slice(start, start + FOLD_ROWS)
+                aggregators[0].add(cached['window_start'][chunk], cached['strike'][chunk],
+                                   cached['type'][chunk] == b'P', cached['volume'][chunk])
+        else:
+            def start_sink():
+                # A fresh aggregator per download attempt, so a retry does not count rows twice
+                aggregators[:] = [StrikeFlowAggregator(open_ns, MINUTES_PER_SESSION)]
+                return aggregators[0].add_tickers
+            
+            last_partial = []
+            
+            def on_progress(progress: Dict):
+                now = time.perf_counter()
+                if aggregators[0].rows == 0 or (last_partial and now - last_partial[0] < PARTIAL_FLOW_SECONDS):
+                    return
+                last_partial[:] = [now]
+                partial_callback({**progress, 'flow': aggregators[0].result()})
+            
+            try:
+                rows = self._fetch_minute_aggs(date, symbol, sink_factory=start_sink, raise_errors=True,
+                                               progress_callback=on_progress if partial_callback else None)
+            except Exception as e:
+                # Blocks folded before the failure are only part of the day: never serve or cache them
+                print(f"❌ Error downloading data: {e}")
+                return self._get_fallback_data(date, symbol)
+            if rows is not None:
+                self._cache_rows(date, symbol, rows)
+                if aggregators[0].rows == 0:
+                    aggregators[0].add_tickers(rows)  # Rows that did not come through the parser
+            elif aggregators[0].rows == 0:
+                return self._get_fallback_data(date, symbol)
+        
+        flow = aggregators[0].result()
+        self._remember(self._strike_flows, key, flow, STRIKE_FLOW_CACHE_SIZE)
+        return flow
+    
+    def _cached(self, cache: OrderedDict, key):
+        """Look up and mark as most recently used; None when absent"""
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+    
+    def _remember(self, cache: OrderedDict, key, value, size: int):
+        """Store as most recently used, evicting the least recently used beyond `size`"""
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > size:
+                cache.popitem(last=False)
+    
+    def download_underlyings(self, date: str, symbols: List[str] = None) -> Dict[str, Optional[Dict[str, np.ndarray]]]:
+        """
+        Minute data for several underlyings (Config.SYMBOLS by default) from a
+        single pass over the day's flat file. Days already cached are served
+        from the cache; the rest are parsed together, split per underlying and
+        cached, so later download_minute_data calls for any of them skip the file.
+        Returns {symbol: columns or None when the symbol had no rows}.
         
+        Parsed blocks are spilled per underlying to a spool beside the cache
+        rather than kept, and each underlying is then converted and cached on
+        its own, so peak memory is one block or one underlying's day, not
+        every requested underlying at once. Cached days are returned memory-mapped.
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in (symbols or AppConfig.SYMBOLS)))
+        result = {symbol: self.cache.get(date, symbol) if self.cache else None for symbol in symbols}
+        missing = [symbol for symbol, columns in result.items() if columns is None]
+        if not missing:
+            return result
+        
+        spool_root = self.cache.root if self.cache else None
+        if spool_root:
+            os.makedirs(spool_root, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix='.spool-', dir=spool_root) as spool:
+            spilled = {}
+            
+            def start_spool():
+                # A fresh directory per download attempt, so a retry does not spill rows twice
+                attempt = tempfile.mkdtemp(dir=spool)
+                spilled.clear()
+                
+                def spill(block: Dict[str, np.ndarray]):
+                    for symbol, bucket in split_by_underlying(block, missing).items():
+                        if len(bucket['ticker']):
+                            paths = spilled.setdefault(symbol, [])
+                            paths.append(os.path.join(attempt, f"{symbol}-{len(paths)}.npz"))
+                            np.savez(paths[-1], **bucket)
+                return spill
+            
+            try:
+                rows = self._fetch_minute_aggs(date, missing, sink_factory=start_spool, keep_rows=False,
+                                               raise_errors=True)
+            except Exception as e:
+                print(f"❌ Error downloading data: {e}")
+                return result
+            if rows is not None and not spilled:
+                start_spool()(rows)  # Rows that did not come through the parser
+            del rows
+            if not spilled:
+                return result
+            
+            for symbol, paths in spilled.items():
+                blocks = [dict(np.load(path)) for path in paths]
+                rows = {column: np.concatenate([block[column] for block in blocks]) for column in blocks[0]}
+                del blocks
+                columns = self._cache_rows(date, symbol, rows)
+                del rows
+                cached = self.cache.get(date, symbol) if self.cache else None
+                result[symbol] = columns if cached is None else cached
+        print(f"✅ Extracted {', '.join(missing)} from one pass over {date}")
+        return result
+    
+    def _object_key(self, date: str) -> str:
+        """Flat file key, e.g. us_options_opra/minute_aggs_v1/2025/12/2025-12-27.csv.gz"""
+        date_obj = datetime.strptime(date, '%Y-%m-%d')
+        return f'us_options_opra/minute_aggs_v1/{date_obj.year}/{date_obj.month:02d}/{date}.csv.gz'
+    
+    def _fetch_minute_aggs(self, date: str, symbol: Union[str, List[str]], progress_callback=None,
+                           sink_factory=None, keep_rows: bool = True,
+                           raise_errors: bool = False) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Download the day's flat file and parse the symbol's rows (or those of
+        several symbols, see download_underlyings); None if unavailable or
+        empty. Parsing runs on the chunks as they download; `progress_callback`
+        receives GzipChunkParser progress along the way.
+        
+        `sink_factory` is called at the start of each parse and returns a sink
+        receiving every parsed block (see MinuteAggParser). Once the load has
+        grown the process by REPLAY_MAX_RSS_MB the rows are dropped and only
+        the sink sees the rest, so None is returned; without a sink the load
+        fails. With `keep_rows` off only the sink ever sees the rows.
+        
+        Failed downloads and parses also return None unless `raise_errors` is
+        set, which callers with a sink use to tell a failure (the sink saw
+        only part of the day) from rows dropped under the ceiling.
+        """
+        if not self.s3:
+            return None
+        
+        object_key = self._object_key(date)
+        rss_mb = current_rss() / 2**20
+        load = {'date': date, 'symbol': symbol if isinstance(symbol, str) else ','.join(symbol),
+                'source': object_key, 'rows': 0, 'rows_kept': True, 'start_rss_mb': rss_mb, 'peak_rss_mb': rss_mb,
+                'rss_ceiling_mb': AppConfig.REPLAY_MAX_RSS_MB or None}
+        started = time.perf_counter()
         try:
-            # Format: us_options_opra/minute_aggs_v1/2025/12/2025-12-27.csv.gz
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            year = date_obj.year
-            month = f"{date_obj.month:02d}"
-            
-            object_key = f'us_options_opra/minute_aggs_v1/{year}/{month}/{date}.csv.gz'
-            local_file = f'/tmp/{date}_minute_aggs.csv.gz'
-            
-            print(f"📥 Downloading {object_key}...")
-            self.s3.download_file(self.bucket, object_key, local_file)
-            print(f"✅ Downloaded to {local_file}")
-            
-            # Parse CSV
-            data = []
-            with gzip.open(local_file, 'rt') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # Filter for the specific symbol's options
-                    if symbol in row['ticker']:
-                        data.append(row)
-            
-            print(f"✅ Parsed {len(data)} minute records for {symbol} options")
-            return data
+            print(f"📥 Fetching {object_key}...")
+            pipeline = []
+            
+            def start_pipeline():
+                # A fresh parser per attempt, so a retried download starts clean
+                sink = sink_factory() if sink_factory else None
+                parser = GzipChunkParser(symbol, progress_callback=progress_callback, sink=sink)
+                pipeline[:] = [parser]
+                load['rows_kept'] = keep_rows
+                if not keep_rows:
+                    parser.parser.discard()
+                
+                def feed(chunk: bytes):
+                    parser.feed(chunk)
+                    self._check_memory(parser.parser, load, bounded=sink is not None)
+                return feed
+            
+            local_file = self.flat_files.fetch(object_key, consumer_factory=start_pipeline)
+            print(f"✅ Local copy at {local_file}")
+            
+            # A local hit or a download shared with another request is parsed from disk
+            if not pipeline:
+                feed = start_pipeline()
+                with open(local_file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        feed(chunk)
+            data = pipeline[0].result()
+            load['rows'] = pipeline[0].parser.rows_matched
+            print(f"✅ Parsed {load['rows']} minute records for {symbol} options")
+            return data if len(data['ticker']) else None
             
         except Exception as e:
+            load['error'] = str(e)
+            if raise_errors:
+                raise
             print(f"❌ Error downloading data: {e}")
-            return self._get_fallback_data(date, symbol)
+            return None
+        finally:
+            load['seconds'] = round(time.perf_counter() - started, 3)
+            load['finished_at'] = datetime.now().isoformat()
+            self.load_metrics.append(load)
     
-    def create_snapshots(self, date: str, symbol: str = 'SPY', num_snapshots: int = 4) -> List[Dict]:
+    def _check_memory(self, parser, load: Dict, bounded: bool):
         """
-        Create N snapshots throughout a trading day
-        Default times: 9:45 AM, 11:30 AM, 2:00 PM, 3:45 PM ET
+        Track peak RSS of a load; once it has grown RSS past the ceiling, drop
+        its rows (or fail when nothing else consumes them). Growth rather than
+        total RSS is checked so the process's baseline does not count.
         """
-        minute_data = self.download_minute_data(date, symbol)
+        rss_mb = current_rss() / 2**20
+        load['peak_rss_mb'] = max(load['peak_rss_mb'], rss_mb)
+        ceiling = AppConfig.REPLAY_MAX_RSS_MB
+        if not ceiling or rss_mb - load['start_rss_mb'] <= ceiling or not parser.retain:
+            return
+        if not bounded:
+            raise MemoryError(f"Loading {load['source']} grew RSS past the {ceiling} MB ceiling")
+        print(f"⚠️  {load['source']} grew RSS past the {ceiling} MB ceiling; keeping per-minute aggregates only")
+        parser.discard()
+        load['rows_kept'] = False
+    
+    def load_minute_frame(self, date: str, symbol: str = 'SPY') -> Optional[Dict[str, np.ndarray]]:
+        """
+        Aggregate a day's OPRA minute bars into a per-minute columnar frame for
+        the regular session: put/call volume, put/call ratio and volume spike.
+        Frames are cached per (date, symbol); returns None when no data is available.
+        """
+        key = (date, symbol)
+        frame = self._cached(self._minute_frames, key)
+        if frame is not None:
+            return frame
         
+        minute_data = self.download_minute_data(date, symbol)
         if not minute_data:
-            return self._get_fallback_snapshots(date, symbol)
+            return None
         
-        # Define snapshot times (Unix nanoseconds)
-        date_obj = datetime.strptime(date, '%Y-%m-%d')
-        snapshot_times = [
-            date_obj.replace(hour=9, minute=45),   # Market open
-            date_obj.replace(hour=11, minute=30),  # Mid-morning
-            date_obj.replace(hour=14, minute=0),   # Afternoon
-            date_obj.replace(hour=15, minute=45),  # Near close
-        ]
+        open_ns = int(self._session_open(date).timestamp() * 1e9)
+        
+        window_start = np.asarray(minute_data['window_start'])
+        volume = np.asarray(minute_data['volume'])
+        is_put = np.asarray(minute_data['type']) == b'P'
+        contracts = np.asarray(minute_data['contract'])
+        ohlc = {field: minute_data[field] for field in ('open', 'high', 'low', 'close')}
+        
+        minute = (window_start - open_ns) // (60 * 10**9)
+        in_session = (minute >= 0) & (minute < MINUTES_PER_SESSION)
+        minute, volume, is_put = minute[in_session], volume[in_session], is_put[in_session]
+        contracts = contracts[in_session]
+        ohlc = {field: np.asarray(values)[in_session] for field, values in ohlc.items()}
+        
+        put_volume = np.bincount(minute[is_put], weights=volume[is_put], minlength=MINUTES_PER_SESSION)
+        call_volume = np.bincount(minute[~is_put], weights=volume[~is_put], minlength=MINUTES_PER_SESSION)
+        total_volume = put_volume + call_volume
+        avg_volume = total_volume.mean()
+        
+        frame = {
+            'minute': np.arange(MINUTES_PER_SESSION),
+            'put_volume': put_volume,
+            'call_volume': call_volume,
+            'total_volume': total_volume,
+            'put_call_ratio': put_volume / np.maximum(call_volume, 1),
+            'volume_spike': total_volume / avg_volume if avg_volume > 0 else np.ones(MINUTES_PER_SESSION),
+            # Price bars of the day's most traded contract on each side, used for trade exits
+            'put_bars': self._most_traded_contract_bars(contracts[is_put], minute[is_put], volume[is_put],
+                                                        {f: v[is_put] for f, v in ohlc.items()}),
+            'call_bars': self._most_traded_contract_bars(contracts[~is_put], minute[~is_put], volume[~is_put],
+                                                         {f: v[~is_put] for f, v in ohlc.items()})
+        }
+        
+        self._remember(self._minute_frames, key, frame, MINUTE_FRAME_CACHE_SIZE)
+        return frame
+    
+    def _most_traded_contract_bars(self, contracts: np.ndarray, minute: np.ndarray, volume: np.ndarray,
+                                   ohlc: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Per-minute OHLC of the highest-volume contract, carried forward over
+        minutes without trades. Bars without a valid close are ignored, so a
+        contract whose prices are missing is never picked; flat bars (1.0)
+        stand in when no contract has any.
+        """
+        bars = {field: np.full(MINUTES_PER_SESSION, np.nan) for field in ohlc}
+        priced = np.asarray(ohlc['close'], dtype=float) > 0  # False for NaN
+        if not priced.any():
+            return {field: np.ones(MINUTES_PER_SESSION) for field in ohlc}
+        
+        unique_contracts, contract = np.unique(contracts[priced], return_inverse=True)
+        top = np.bincount(contract, weights=volume[priced]).argmax()
+        rows = np.flatnonzero(priced)[contract == top]
+        for field, values in ohlc.items():
+            bars[field][minute[rows]] = values[rows]
+        
+        # Forward-fill quiet minutes with the last close; back-fill before the first trade
+        traded = ~np.isnan(bars['close'])
+        last_traded = np.maximum.accumulate(np.where(traded, np.arange(MINUTES_PER_SESSION), -1))
+        last_traded = np.where(last_traded < 0, np.argmax(traded), last_traded)
+        filled_close = bars['close'][last_traded]
+        for field in ohlc:
+            # Also covers a traded minute missing only its open, high or low
+            bars[field] = np.where(traded & ~np.isnan(bars[field]), bars[field], filled_close)
+        return bars
+    
+    def create_snapshots(self, date: str, symbol: str = 'SPY', num_snapshots: int = 4,
+                         partial_callback=None) -> List[Dict]:
+        """
+        Create N snapshots throughout a trading day
+        Default (N=4) times: 9:45 AM, 11:30 AM, 2:00 PM, 3:45 PM ET; any other N
+        is spread evenly over the session, up to one per minute.
+        When the day has to be downloaded, `partial_callback` receives
+        {'compressed_bytes', 'bytes_parsed', 'rows', 'snapshots'} built from
+        the rows parsed so far, so the first snapshots show up before the
+        download finishes.
+        """
+        snapshot_times = self.snapshot_times(date, num_snapshots)
+        on_partial = None
+        if partial_callback:
+            def on_partial(update: Dict):
+                flow = update.pop('flow')
+                partial_callback({**update, 'snapshots': self._flow_snapshots(date, flow, snapshot_times)})
+        minute_flow = self.load_strike_flow(date, symbol, partial_callback=on_partial)
+        
+        if minute_flow is None:
+            return self._get_fallback_snapshots(date, symbol)
+        return self._flow_snapshots(date, minute_flow, snapshot_times)
+    
+    def _flow_snapshots(self, date: str, minute_flow: Dict[str, np.ndarray],
+                        snapshot_times: List[datetime]) -> List[Dict]:
+        """Snapshots at each time from per-minute strike flow"""
+        session_open = self._session_open(date)
+        flow = cumulative_flow(minute_flow, [(t - session_open) // timedelta(minutes=1) for t in snapshot_times])
         
         snapshots = []
-        for snap_time in snapshot_times:
-            snapshot = self._create_snapshot_at_time(minute_data, snap_time, symbol)
+        for index, snap_time in enumerate(snapshot_times):
+            snapshot = self.snapshot_from_flow(flow, index, snap_time)
             snapshot['snapshot_time'] = snap_time.strftime('%H:%M:%S')
             snapshot['snapshot_label'] = self._get_snapshot_label(snap_time)
             snapshots.append(snapshot)
         
         return snapshots
     
-    def _create_snapshot_at_time(self, minute_data: List[Dict], target_time: datetime, symbol: str) -> Dict:
-        """Create a single snapshot at a specific time"""
-        target_ns = int(target_time.timestamp() * 1e9)
-        
-        # Aggregate all data up to this time
-        strikes_data = defaultdict(lambda: {'call_volume': 0, 'put_volume': 0})
-        total_call_volume = 0
-        total_put_volume = 0
+    def snapshot_times(self, date: str, num_snapshots: int) -> List[datetime]:
+        """Snapshot times (ET) for a day"""
+        if not 1 <= num_snapshots <= MINUTES_PER_SESSION:
+            raise ValueError(f"num_snapshots must be between 1 and {MINUTES_PER_SESSION}")
         
-        for record in minute_data:
-            window_start = int(record['window_start'])
-            if window_start <= target_ns:
-                ticker = record['ticker']
-                volume = int(record.get('volume', 0))
-                
-                # Parse strike from ticker (format: O:SPY230327P00390000)
-                parts = ticker.split('P') if 'P' in ticker else ticker.split('C')
-                if len(parts) == 2:
-                    strike_str = parts[1]
-                    strike = float(strike_str) / 1000  # Convert from 00390000 to 390.000
-                    is_put = 'P' in ticker
-                    
-                    if is_put:
-                        strikes_data[strike]['put_volume'] += volume
-                        total_put_volume += volume
-                    else:
-                        strikes_data[strike]['call_volume'] += volume
-                        total_call_volume += volume
+        session_open = self._session_open(date)
+        if num_snapshots == len(DEFAULT_SNAPSHOT_MINUTES):
+            minutes = DEFAULT_SNAPSHOT_MINUTES
+        else:
+            # Evenly spaced minute ends, the last one at the close
+            minutes = np.linspace(MINUTES_PER_SESSION / num_snapshots, MINUTES_PER_SESSION,
+                                  num_snapshots).round().astype(int).tolist()
+        return [session_open + timedelta(minutes=minute) for minute in minutes]
+    
+    def _session_open(self, date: str) -> datetime:
+        return datetime.strptime(date, '%Y-%m-%d').replace(hour=9, minute=30, tzinfo=MARKET_TZ)
+    
+    def snapshot_from_flow(self, flow: Dict[str, np.ndarray], index: int, target_time: datetime) -> Dict:
+        """Snapshot dict for one row of the cumulative strike flow"""
+        seen = flow['seen'][index]
+        call_volume = flow['call_volume'][index][seen].astype(np.int64)
+        put_volume = flow['put_volume'][index][seen].astype(np.int64)
+        total_call_volume = int(call_volume.sum())
+        total_put_volume = int(put_volume.sum())
         
         # Format strikes for visualization
-        strikes = []
-        for strike, volumes in sorted(strikes_data.items()):
-            strikes.append({
-                'strike': strike,
-                'call_volume': volumes['call_volume'],
-                'put_volume': volumes['put_volume']
-            })
+        strikes = [
+            {'strike': strike, 'call_volume': calls, 'put_volume': puts}
+            for strike, calls, puts in zip(flow['strikes'][seen].tolist(), call_volume.tolist(),
+                                           put_volume.tolist())
+        ]
         
         # Get current price (approximate from ATM strike)
         price = self._estimate_price_from_strikes(strikes)
@@ -183,10 +532,10 @@ class HistoricalReplayLoader:
         else:
             return "Near Close"
     
-    def _get_fallback_data(self, date: str, symbol: str) -> List[Dict]:
-        """Return empty data for fallback"""
+    def _get_fallback_data(self, date: str, symbol: str) -> None:
+        """No minute data for fallback"""
         print(f"⚠️  Using fallback: no real data for {date}")
-        return []
+        return None
     
     def _get_fallback_snapshots(self, date: str, symbol: str) -> List[Dict]:
         """Generate realistic-looking fallback snapshots using simulated data"""
@@ -244,6 +593,17 @@ class HistoricalReplayLoader:
         return snapshots
 
 
+def current_rss() -> int:
+    """Resident set size of this process in bytes (the peak where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
 # Global instance
 _replay_loader = None
 
@@ -3,15 +3,62 @@ Historical Scenario Generator for Backtesting
 Creates realistic day-by-day options flow data based on actual market characteristics
 """
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Dict, List, Optional
 import hashlib
+import os
+import threading
+import uuid
+import zlib
+
+from config import Config
+
+
+# Bump whenever generated values change so persisted days are not reused
+GENERATOR_VERSION = 3
+
+# Market hours: 9:30 AM to 4:00 PM
+MINUTES_PER_SESSION = 390
+
+# Per-minute columns of a generated day (cached and persisted)
+FRAME_COLUMNS = ('minute', 'timestamp', 'put_call_ratio', 'call_volume', 'put_volume', 'total_volume',
+                 'volume_spike', 'volume_spike_mult', 'iv_percentile', 'volume_concentration',
+                 'underlying_open', 'underlying_high', 'underlying_low', 'underlying_close')
+
+# Per-minute volatility of the simulated underlying at a regime volatility of 1.0
+UNDERLYING_MINUTE_VOLATILITY = 0.0006
+
+CACHE_FORMATS = ('npz', 'npy')
+
+# Intraday patterns and spike frequencies drawn for regular (non-event) days
+INTRADAY_PATTERNS = ['rally', 'selloff', 'choppy', 'drift', 'reversal']
+SPIKE_FREQUENCIES = ['low', 'medium', 'high']
+SPIKE_FREQUENCY_WEIGHTS = [0.3, 0.5, 0.2]
+
+# Chance that any given minute has a volume spike, by scenario spike frequency
+SPIKE_PROBABILITY = {
+    'very_low': 0.02,
+    'low': 0.05,
+    'medium': 0.10,
+    'high': 0.20,
+    'very_high': 0.35
+}
 
 
 class HistoricalScenarioGenerator:
     """Generate realistic historical market scenarios for backtesting"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = None, cache_dir: str = None, cache_format: str = None):
+        # Generated days: in-memory LRU, optionally backed by files under cache_dir
+        self.cache_size = Config.SCENARIO_CACHE_SIZE if cache_size is None else cache_size
+        self.cache_dir = Config.SCENARIO_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache_format = cache_format or Config.SCENARIO_CACHE_FORMAT
+        if self.cache_format not in CACHE_FORMATS:
+            raise ValueError(f"Invalid cache format '{self.cache_format}'. Expected one of: {', '.join(CACHE_FORMATS)}")
+        self._frames: "OrderedDict[tuple, Dict[str, np.ndarray]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+        
         # Market regime definitions
         self.market_regimes = {
             'bull_run': {'trend': 0.6, 'volatility': 0.8, 'pc_ratio_avg': 0.85},
@@ -88,21 +135,19 @@ class HistoricalScenarioGenerator:
                 'seed': int(hashlib.md5(date_str.encode()).hexdigest()[:8], 16)
             }
         
-        # Generate consistent scenario based on date hash
+        # Generate consistent scenario based on date hash (local RNG, global state untouched)
         date_hash = int(hashlib.md5(date_str.encode()).hexdigest()[:8], 16)
-        np.random.seed(date_hash)
+        rng = np.random.RandomState(date_hash)
         
         # Pick a random regime
-        regime_name = np.random.choice(list(self.market_regimes.keys()))
+        regime_name = rng.choice(list(self.market_regimes.keys()))
         regime_data = self.market_regimes[regime_name]
         
         # Determine intraday pattern
-        patterns = ['rally', 'selloff', 'choppy', 'drift', 'reversal']
-        pattern = np.random.choice(patterns)
+        pattern = rng.choice(INTRADAY_PATTERNS)
         
         # Volume spike frequency
-        vol_frequencies = ['low', 'medium', 'high']
-        vol_freq = np.random.choice(vol_frequencies, p=[0.3, 0.5, 0.2])
+        vol_freq = rng.choice(SPIKE_FREQUENCIES, p=SPIKE_FREQUENCY_WEIGHTS)
         
         return {
             'regime': regime_name,
@@ -115,94 +160,200 @@ class HistoricalScenarioGenerator:
             'seed': date_hash % 100000
         }
     
-    def generate_intraday_data(self, date_str: str, symbol: str = 'SPY') -> List[Dict]:
-        """Generate minute-by-minute options flow for entire trading day"""
-        scenario = self.get_daily_scenario(date_str)
-        
-        # Market hours: 9:30 AM to 4:00 PM = 390 minutes
-        data_points = []
+    def generate_intraday_frame(self, date_str: str, symbol: str = 'SPY') -> Dict:
+        """
+        The entire trading day's options flow as columns (one array entry per
+        minute). Days are memoized in an LRU of read-only arrays and, when a
+        cache directory is configured, persisted per generator version so
+        other processes and restarts skip generation too.
+        """
+        key = (date_str, symbol)
+        with self._cache_lock:
+            columns = self._frames.get(key)
+            if columns is not None:
+                self._frames.move_to_end(key)
+                self.cache_stats['hits'] += 1
         
-        for minute in range(390):
-            time_factor = minute / 390  # 0 to 1 through day
-            
-            # Generate data point for this minute
-            data = self._generate_minute_data(
-                scenario, 
-                time_factor, 
-                minute,
-                symbol
-            )
-            
-            # Add timestamp
-            market_open = datetime.strptime(f"{date_str} 09:30:00", "%Y-%m-%d %H:%M:%S")
-            data['timestamp'] = (market_open + timedelta(minutes=minute)).isoformat()
-            data['minute'] = minute
+        if columns is None:
+            columns = self._load_persisted(date_str, symbol)
+            source = 'disk_hits' if columns is not None else 'misses'
+            if columns is None:
+                columns = self.generate_columns(date_str, symbol)
+                self._persist(date_str, symbol, columns)
             
-            data_points.append(data)
+            for values in columns.values():
+                values.flags.writeable = False  # Shared between callers
+            self._remember(key, columns, source)
         
-        return data_points
+        return {
+            'symbol': symbol,
+            'date': date_str,
+            'scenario': self.get_daily_scenario(date_str),
+            **columns
+        }
     
-    def _generate_minute_data(self, scenario: Dict, time_factor: float, minute: int, symbol: str) -> Dict:
-        """Generate realistic options flow data for a single minute"""
-        # Seed based on date + minute for consistency
-        np.random.seed(scenario['seed'] + minute)
-        
-        # Base volumes
-        base_volume = 10000
+    def _remember(self, key: tuple, columns: Dict[str, np.ndarray], source: str):
+        """Add a day to the in-memory LRU, counting where it came from"""
+        with self._cache_lock:
+            self.cache_stats[source] += 1
+            if self.cache_size <= 0:
+                return
+            self._frames[key] = columns
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+    
+    def _cache_path(self, date_str: str, symbol: str) -> str:
+        """Persisted location of a day: <cache_dir>/v<version>/<symbol>/<date>[.npz]"""
+        path = os.path.join(self.cache_dir, f"v{GENERATOR_VERSION}", symbol, date_str)
+        return path + '.npz' if self.cache_format == 'npz' else path
+    
+    def _load_persisted(self, date_str: str, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        """Persisted columns for a day, memory-mapped for the npy format; None if absent"""
+        if not self.cache_dir:
+            return None
+        path = self._cache_path(date_str, symbol)
+        try:
+            if self.cache_format == 'npz':
+                with np.load(path) as data:
+                    return {column: data[column] for column in FRAME_COLUMNS}
+            return {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r')
+                    for column in FRAME_COLUMNS}
+        except (OSError, KeyError, ValueError):
+            # Missing or partially written day: regenerate it
+            return None
+    
+    def _persist(self, date_str: str, symbol: str, columns: Dict[str, np.ndarray]):
+        """Write a day's columns atomically (temp file/dir, then rename)"""
+        if not self.cache_dir:
+            return
+        path = self._cache_path(date_str, symbol)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.cache_format == 'npz':
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, **columns)
+                os.replace(tmp_path, path)
+            else:
+                os.makedirs(tmp_path)
+                for column, values in columns.items():
+                    np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+                try:
+                    os.rename(tmp_path, path)
+                except OSError:
+                    # Another process persisted the same day first
+                    self._remove_path(tmp_path)
+        except OSError as e:
+            print(f"⚠️  Could not persist scenario {symbol} {date_str}: {e}")
+            self._remove_path(tmp_path)
+    
+    def _remove_path(self, path: str):
+        """Best-effort removal of a temp file or directory"""
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                os.remove(os.path.join(path, name))
+            os.rmdir(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    
+    def clear_cache(self):
+        """Drop the in-memory LRU (persisted days are kept)"""
+        with self._cache_lock:
+            self._frames.clear()
+    
+    def generate_columns(self, date_str: str, symbol: str, scenario: Dict = None) -> Dict[str, np.ndarray]:
+        """
+        Generate a day's per-minute columns in a single vectorized pass (no
+        caching). Draws come from a Generator seeded by the scenario seed and
+        symbol, so a day is reproducible and each symbol gets its own flow
+        while the regime stays market-wide. The day includes the simulated
+        underlying's minute bars that backtest option prices are derived
+        from. `scenario` defaults to the date's daily scenario.
+        """
+        scenario = scenario or self.get_daily_scenario(date_str)
+        symbol_seed = zlib.crc32(symbol.encode()) % 100000
+        rng = np.random.default_rng([scenario['seed'], symbol_seed])
         
-        # Apply intraday pattern
-        volume_mult = self._get_volume_multiplier(scenario['intraday_pattern'], time_factor)
+        # Market hours: 9:30 AM to 4:00 PM = 390 minutes
+        minute = np.arange(MINUTES_PER_SESSION)
+        time_factor = minute / MINUTES_PER_SESSION  # 0 to 1 through day
         
-        # Apply volatility from regime
+        # Apply intraday pattern and volatility from regime
+        volume_mult = self._get_volume_multiplier(scenario['intraday_pattern'], time_factor, rng)
         vol_mult = scenario['volatility']
         
-        # Determine if this minute has a volume spike
-        spike_prob = {
-            'very_low': 0.02,
-            'low': 0.05,
-            'medium': 0.10,
-            'high': 0.20,
-            'very_high': 0.35
-        }
-        has_spike = np.random.random() < spike_prob.get(scenario['vol_spike_frequency'], 0.10)
-        
-        spike_mult = np.random.uniform(1.5, 2.5) if has_spike else 1.0
+        # Determine which minutes have a volume spike
+        has_spike = rng.random(MINUTES_PER_SESSION) < SPIKE_PROBABILITY.get(scenario['vol_spike_frequency'], 0.10)
+        spike_mult = np.where(has_spike, rng.uniform(1.5, 2.5, MINUTES_PER_SESSION), 1.0)
         
         # Generate volumes
         total_mult = volume_mult * vol_mult * spike_mult
-        call_buy = int(np.random.uniform(8000, 15000) * total_mult)
-        call_sell = int(np.random.uniform(10000, 18000) * total_mult)
-        put_buy = int(np.random.uniform(12000, 22000) * total_mult * (1 + scenario['trend'] * 0.3))
-        put_sell = int(np.random.uniform(8000, 16000) * total_mult * (1 - scenario['trend'] * 0.3))
-        
-        # Calculate ratios
-        put_call_ratio = (put_buy + put_sell) / max((call_buy + call_sell), 1)
+        call_buy = (rng.uniform(8000, 15000, MINUTES_PER_SESSION) * total_mult).astype(np.int64)
+        call_sell = (rng.uniform(10000, 18000, MINUTES_PER_SESSION) * total_mult).astype(np.int64)
+        put_buy = (rng.uniform(12000, 22000, MINUTES_PER_SESSION) * total_mult
+                   * (1 + scenario['trend'] * 0.3)).astype(np.int64)
+        put_sell = (rng.uniform(8000, 16000, MINUTES_PER_SESSION) * total_mult
+                    * (1 - scenario['trend'] * 0.3)).astype(np.int64)
+        call_volume = call_buy + call_sell
+        put_volume = put_buy + put_sell
         
-        # Add noise to match scenario's PC ratio average
-        target_pc = scenario['pc_ratio_avg']
-        put_call_ratio = put_call_ratio * 0.7 + target_pc * 0.3 + np.random.uniform(-0.15, 0.15)
-        put_call_ratio = max(0.5, min(2.5, put_call_ratio))  # Clamp to realistic range
+        # Calculate ratios, with noise pulling toward the scenario's P/C average
+        put_call_ratio = put_volume / np.maximum(call_volume, 1)
+        put_call_ratio = (put_call_ratio * 0.7 + scenario['pc_ratio_avg'] * 0.3
+                          + rng.uniform(-0.15, 0.15, MINUTES_PER_SESSION))
+        put_call_ratio = np.clip(put_call_ratio, 0.5, 2.5)  # Clamp to realistic range
         
         # IV percentile (higher in high vol scenarios)
         iv_base = 45 if scenario['volatility'] > 1.5 else 35
-        iv_percentile = max(10, min(90, iv_base + np.random.uniform(-15, 15)))
+        iv_percentile = np.clip(iv_base + rng.uniform(-15, 15, MINUTES_PER_SESSION), 10, 90)
+        
+        # Drawn after the flow columns so those keep their values for a given seed
+        volume_concentration = 0.6 + rng.random(MINUTES_PER_SESSION) * 0.3
+        underlying = simulate_underlying_bars(rng, MINUTES_PER_SESSION, scenario['volatility'], scenario['trend'])
         
         return {
-            'symbol': symbol,
-            'put_call_ratio': round(put_call_ratio, 4),
-            'call_volume': call_buy + call_sell,
-            'put_volume': put_buy + put_sell,
-            'total_volume': call_buy + call_sell + put_buy + put_sell,
+            'minute': minute,
+            'timestamp': np.datetime64(f"{date_str}T09:30", 's') + minute * np.timedelta64(60, 's'),
+            'put_call_ratio': np.round(put_call_ratio, 4),
+            'call_volume': call_volume,
+            'put_volume': put_volume,
+            'total_volume': call_volume + put_volume,
             'volume_spike': has_spike,
-            'volume_spike_mult': round(spike_mult, 2) if has_spike else 1.0,
-            'iv_percentile': round(iv_percentile, 1),
-            'regime': scenario['regime'],
-            'event': scenario.get('event', 'Regular'),
+            'volume_spike_mult': np.round(spike_mult, 2),
+            'iv_percentile': np.round(iv_percentile, 1),
+            'volume_concentration': volume_concentration,
+            **{f'underlying_{field}': values for field, values in underlying.items()},
         }
     
-    def _get_volume_multiplier(self, pattern: str, time_factor: float) -> float:
-        """Get volume multiplier based on intraday pattern"""
+    def generate_intraday_data(self, date_str: str, symbol: str = 'SPY') -> List[Dict]:
+        """Generate minute-by-minute options flow for entire trading day (list-of-dicts view)"""
+        return self.intraday_records(self.generate_intraday_frame(date_str, symbol))
+    
+    def intraday_records(self, frame: Dict) -> List[Dict]:
+        """One dict per minute from a columnar intraday frame"""
+        columns = {
+            'put_call_ratio': frame['put_call_ratio'].tolist(),
+            'call_volume': frame['call_volume'].tolist(),
+            'put_volume': frame['put_volume'].tolist(),
+            'total_volume': frame['total_volume'].tolist(),
+            'volume_spike': frame['volume_spike'].tolist(),
+            'volume_spike_mult': frame['volume_spike_mult'].tolist(),
+            'iv_percentile': frame['iv_percentile'].tolist(),
+            'timestamp': np.datetime_as_string(frame['timestamp'], unit='s').tolist(),
+            'minute': frame['minute'].tolist(),
+        }
+        constants = {
+            'symbol': frame['symbol'],
+            'regime': frame['scenario']['regime'],
+            'event': frame['scenario'].get('event', 'Regular'),
+        }
+        return [{**constants, **dict(zip(columns, row))} for row in zip(*columns.values())]
+    
+    def _get_volume_multiplier(self, pattern: str, time_factor, rng=None):
+        """Get volume multiplier based on intraday pattern (scalar or per-minute array)"""
         # time_factor: 0 (open) to 1 (close)
+        time_factor = np.asarray(time_factor, dtype=float)
         
         if pattern == 'rally':
             # Volume increases steadily
@@ -210,14 +361,12 @@ class HistoricalScenarioGenerator:
         
         elif pattern == 'selloff':
             # Volume spikes early, stays elevated
-            if time_factor < 0.1:
-                return 1.5  # Opening spike
-            return 1.2 + time_factor * 0.3
+            return np.where(time_factor < 0.1, 1.5, 1.2 + time_factor * 0.3)  # Opening spike
         
         elif pattern == 'choppy':
             # Multiple volume waves
             wave = np.sin(time_factor * 4 * np.pi) * 0.3 + 1.0
-            return max(0.6, wave)
+            return np.maximum(0.6, wave)
         
         elif pattern == 'drift':
             # Low volume, slight increase into close
@@ -225,17 +374,16 @@ class HistoricalScenarioGenerator:
         
         elif pattern == 'reversal':
             # V-shaped: high early, low mid, high late
-            if time_factor < 0.2 or time_factor > 0.8:
-                return 1.3
-            return 0.7
+            return np.where((time_factor < 0.2) | (time_factor > 0.8), 1.3, 0.7)
         
         elif pattern == 'volatile' or pattern == 'whipsaw':
             # Random spikes throughout
-            return 1.0 + np.random.uniform(-0.3, 0.7)
+            rng = rng or np.random.default_rng()
+            return 1.0 + rng.uniform(-0.3, 0.7, time_factor.shape)
         
         elif pattern == 'flat':
             # Very low, consistent volume
-            return 0.4
+            return np.full(time_factor.shape, 0.4)
         
         elif pattern == 'grind_higher':
             # Steady volume with slight uptick
@@ -243,9 +391,19 @@ class HistoricalScenarioGenerator:
         
         else:
             # Default: slight U-shape (higher at open/close)
-            if time_factor < 0.1 or time_factor > 0.9:
-                return 1.2
-            return 0.9
+            return np.where((time_factor < 0.1) | (time_factor > 0.9), 1.2, 0.9)
+
+
+def simulate_underlying_bars(rng, data_points: int, volatility: float, trend: float) -> Dict[str, np.ndarray]:
+    """Random-walk underlying minute bars ('open', 'high', 'low', 'close') for a regime"""
+    sigma = UNDERLYING_MINUTE_VOLATILITY * volatility
+    log_returns = sigma * (rng.standard_normal(data_points) + trend * 0.05)
+    close = 100.0 * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    # Intrabar range beyond the open/close body
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.standard_normal(data_points)) * sigma * 0.5)
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.standard_normal(data_points)) * sigma * 0.5)
+    return {'open': open_, 'high': high, 'low': low, 'close': close}
 
 
 # Global instance
@@ -0,0 +1,66 @@
+"""
+OCC Option Symbols
+Vectorized parsing of OCC/OPRA tickers (e.g. O:SPY251227P00590000) into
+root, expiry, type and strike, and interning of ticker arrays to integer
+contract ids so per-row work runs on ints instead of strings.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+# <yymmdd><C|P><strike x 1000, 8 digits> after the root
+OCC_SUFFIX_LENGTH = 15
+FLAT_FILE_PREFIX = 'O:'
+
+
+def parse_occ_tickers(tickers: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Root, expiry, type (b'C'/b'P') and strike of every ticker, with or
+    without the flat-file `O:` prefix. Roots of any length may be mixed.
+    Raises ValueError on a malformed ticker.
+    """
+    encoded = np.char.encode(np.asarray(tickers, dtype=np.str_), 'ascii')
+    count = len(encoded)
+    if count == 0:
+        return {'root': np.empty(0, dtype=np.str_), 'expiry': np.empty(0, dtype='datetime64[D]'),
+                'type': np.empty(0, dtype='S1'), 'strike': np.empty(0)}
+    width = max(encoded.dtype.itemsize, OCC_SUFFIX_LENGTH + 1)
+    # Right-align so the suffix sits in the same byte columns whatever the root length
+    aligned = np.char.rjust(encoded, width).astype(f'S{width}')
+    chars = aligned.view(np.uint8).reshape(count, width)
+    suffix = chars[:, -OCC_SUFFIX_LENGTH:]
+
+    digits = suffix.astype(np.int64) - ord('0')
+    contract_type = suffix[:, 6]
+    numeric = np.delete(digits, 6, axis=1)
+    if ((numeric < 0) | (numeric > 9)).any() or not np.isin(contract_type, (ord('C'), ord('P'))).all():
+        raise ValueError("Malformed OCC ticker")
+
+    year, month, day = (digits[:, 0:6:2] * 10 + digits[:, 1:6:2]).T
+    months = ((2000 + year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    strike_milli = numeric[:, 6:] @ (10 ** np.arange(7, -1, -1))
+
+    head = np.ascontiguousarray(chars[:, :-OCC_SUFFIX_LENGTH]).view(f'S{width - OCC_SUFFIX_LENGTH}').ravel()
+    root = np.char.lstrip(head)
+    prefixed = np.char.startswith(root, FLAT_FILE_PREFIX.encode())
+    root = np.where(prefixed, np.char.replace(root, FLAT_FILE_PREFIX.encode(), b'', count=1), root)
+    if (np.char.str_len(root) == 0).any():
+        raise ValueError("Malformed OCC ticker: missing root")
+
+    return {
+        'root': np.char.decode(root, 'ascii'),
+        'expiry': months.astype('datetime64[D]') + (day - 1),
+        'type': contract_type.view('S1'),
+        'strike': strike_milli / 1000
+    }
+
+
+def intern_tickers(tickers: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Integer contract id of every ticker plus the contract table the ids
+    index: 'ticker' and its parsed fields. Ids follow sorted ticker order
+    (root, expiry, type, strike), and only unique tickers are parsed.
+    """
+    unique, contract_ids = np.unique(np.asarray(tickers, dtype=np.str_), return_inverse=True)
+    return contract_ids.astype(np.int32).ravel(), {'ticker': unique, **parse_occ_tickers(unique)}
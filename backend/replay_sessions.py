@@ -0,0 +1,353 @@
+"""
+Live Replay Sessions
+Streams a historical day minute by minute to a Socket.IO room at 1x-500x,
+with pause, seek and rate changes. Each (date, symbol) is loaded once into
+cumulative per-minute strike flow shared by every session replaying it, so
+an update is a row lookup and a seek is a binary search over minute times.
+Sessions nobody has joined or controlled for REPLAY_IDLE_SECONDS are closed.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from historical_replay import MARKET_TZ, MINUTES_PER_SESSION, get_replay_loader
+from strike_flow import cumulative_flow
+
+
+MIN_RATE = 1
+MAX_RATE = 500
+SECONDS_PER_MINUTE = 60  # Wall-clock seconds per replayed minute at 1x
+CONTROL_ACTIONS = ('play', 'pause', 'seek', 'rate')
+
+
+class ReplayDay:
+    """A day's cumulative strike flow as of every session minute, read-only once built"""
+
+    def __init__(self, loader, date: str, symbol: str):
+        minute_flow = loader.load_strike_flow(date, symbol)
+        if minute_flow is None:
+            raise ValueError(f"No minute data for {symbol} on {date}")
+
+        self.loader = loader
+        self.date = date
+        self.symbol = symbol
+        # Minute i covers bars up to the end of the session's (i + 1)th minute,
+        # matching create_snapshots(date, symbol, MINUTES_PER_SESSION)
+        self.times = loader.snapshot_times(date, MINUTES_PER_SESSION)
+        self.times_ns = np.array([int(t.timestamp() * 1e9) for t in self.times], dtype=np.int64)
+        self.flow = cumulative_flow(minute_flow, range(1, MINUTES_PER_SESSION + 1))
+
+    def __len__(self):
+        return len(self.times)
+
+    def index_at(self, time_ns: int) -> int:
+        """Last minute at or before `time_ns` (the first minute for earlier times)"""
+        return max(int(np.searchsorted(self.times_ns, time_ns, side='right')) - 1, 0)
+
+    def snapshot(self, index: int) -> Dict:
+        snapshot = self.loader.snapshot_from_flow(self.flow, index, self.times[index])
+        snapshot['snapshot_time'] = self.times[index].strftime('%H:%M:%S')
+        return snapshot
+
+
+class ReplaySession:
+    """
+    Playback position over a ReplayDay. Position is derived from the clock
+    (anchor minute + elapsed time x rate), so sessions need no timer of their
+    own; play, pause, seek and rate changes just move the anchor.
+    """
+
+    def __init__(self, day: ReplayDay, rate: float, minute: int, clock):
+        self.session_id = uuid.uuid4().hex
+        self.room = f"replay:{self.session_id}"
+        self.day = day
+        self.rate = rate
+        self.playing = False
+        self.created_at = datetime.now().isoformat()
+        self.last_emitted = None
+        self.viewers = set()  # Socket.IO sids that joined the room
+        self.last_active = clock()
+        self._clock = clock
+        self._anchor_minute = float(minute)
+        self._anchor_time = clock()
+
+    @property
+    def minute(self) -> int:
+        position = self._anchor_minute
+        if self.playing:
+            position += (self._clock() - self._anchor_time) * self.rate / SECONDS_PER_MINUTE
+        return min(int(position), len(self.day) - 1)
+
+    def _rebase(self, minute: float = None):
+        if minute is None:
+            minute = self._anchor_minute
+            if self.playing:
+                minute += (self._clock() - self._anchor_time) * self.rate / SECONDS_PER_MINUTE
+        self._anchor_minute = min(float(minute), len(self.day) - 1)
+        self._anchor_time = self._clock()
+
+    def play(self):
+        self._rebase(0 if self.minute == len(self.day) - 1 else None)  # Restart a finished replay
+        self.playing = True
+
+    def pause(self):
+        self._rebase()
+        self.playing = False
+
+    def seek(self, minute: int):
+        self._rebase(minute)
+
+    def set_rate(self, rate: float):
+        self._rebase()
+        self.rate = rate
+
+
+class ReplaySessionManager:
+    """
+    Create and control replay sessions; `tick` advances them and queues
+    (event, payload, room) updates for a background task to emit.
+    """
+
+    def __init__(self, loader_factory=get_replay_loader, clock=time.monotonic, max_sessions: int = None,
+                 day_cache_size: int = None, idle_seconds: float = None):
+        self.loader_factory = loader_factory
+        self.clock = clock
+        self.max_sessions = max_sessions or Config.REPLAY_MAX_SESSIONS
+        self.day_cache_size = Config.REPLAY_DAY_CACHE_SIZE if day_cache_size is None else day_cache_size
+        self.idle_seconds = Config.REPLAY_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.sessions: Dict[str, ReplaySession] = {}
+        self._days: "OrderedDict[Tuple[str, str], ReplayDay]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], Future] = {}
+        self._notifications = deque(maxlen=1000)
+        self._lock = threading.RLock()
+
+    def create(self, date: str, symbol: str = 'SPY', rate: float = 1, minute: int = 0,
+               autoplay: bool = True) -> Dict:
+        """Start a session over a day (loading it unless another session already has)"""
+        rate = self._validate_rate(rate)
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise ValueError(f"Too many replay sessions (max {self.max_sessions})")
+
+        day = self._day(date, symbol)
+        session = ReplaySession(day, rate, self._validate_minute(day, minute), self.clock)
+        if autoplay:
+            session.play()
+        with self._lock:
+            # Other requests may have filled the last slots while the day loaded
+            if len(self.sessions) >= self.max_sessions:
+                self._prune_days()
+                raise ValueError(f"Too many replay sessions (max {self.max_sessions})")
+            self.sessions[session.session_id] = session
+            self._prune_days()
+        return self._public(session)
+
+    def _day(self, date: str, symbol: str) -> ReplayDay:
+        """Shared ReplayDay for (date, symbol); concurrent first requests wait for one load"""
+        key = (date, symbol)
+        with self._lock:
+            if key in self._days:
+                self._days.move_to_end(key)
+                return self._days[key]
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            day = ReplayDay(self.loader_factory(), date, symbol)
+            future.set_result(day)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._loading[key]
+        with self._lock:
+            self._days[key] = day
+        return day
+
+    def _prune_days(self):
+        """Drop the least recently used days no session is replaying beyond the cache size"""
+        in_use = {(s.day.date, s.day.symbol) for s in self.sessions.values()}
+        idle = [key for key in self._days if key not in in_use]
+        for key in idle[:max(0, len(idle) - self.day_cache_size)]:
+            del self._days[key]
+
+    def control(self, session_id: str, action: str, minute: int = None, time: str = None,
+                rate: float = None) -> Optional[Dict]:
+        """
+        Apply a control action: 'play', 'pause', 'seek' (to a minute index or
+        an ET 'HH:MM' time) or 'rate'. Returns the new status, or None if the
+        session does not exist.
+        """
+        if action not in CONTROL_ACTIONS:
+            raise ValueError(f"Invalid action '{action}'. Expected one of: {', '.join(CONTROL_ACTIONS)}")
+
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            session.last_active = self.clock()
+            if action == 'play':
+                session.play()
+            elif action == 'pause':
+                session.pause()
+            elif action == 'seek':
+                session.seek(self._seek_minute(session.day, minute, time))
+                session.last_emitted = None  # Always show where the seek landed
+            else:
+                session.set_rate(self._validate_rate(rate))
+            return self._public(session)
+
+    def _seek_minute(self, day: ReplayDay, minute: int = None, time: str = None) -> int:
+        if time is not None:
+            try:
+                clock_time = datetime.strptime(time, '%H:%M:%S' if time.count(':') == 2 else '%H:%M').time()
+            except ValueError:
+                raise ValueError(f"Invalid seek time '{time}'. Expected HH:MM or HH:MM:SS (ET)")
+            target = datetime.combine(datetime.strptime(day.date, '%Y-%m-%d').date(), clock_time, MARKET_TZ)
+            return day.index_at(int(target.timestamp() * 1e9))
+        if minute is None:
+            raise ValueError("Seek requires a minute or time")
+        return self._validate_minute(day, minute)
+
+    @staticmethod
+    def _validate_minute(day: ReplayDay, minute) -> int:
+        minute = int(minute)
+        if not 0 <= minute < len(day):
+            raise ValueError(f"minute must be between 0 and {len(day) - 1}")
+        return minute
+
+    @staticmethod
+    def _validate_rate(rate) -> float:
+        rate = float(rate)
+        if not MIN_RATE <= rate <= MAX_RATE:
+            raise ValueError(f"rate must be between {MIN_RATE} and {MAX_RATE}")
+        return rate
+
+    def close(self, session_id: str) -> bool:
+        """End a session; returns whether it existed"""
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._notifications.append(('replay_closed', {'session_id': session_id}, session.room))
+            self._prune_days()
+        return True
+
+    def join(self, session_id: str, sid: str) -> Optional[Dict]:
+        """Register a client in a session's room; returns the session's status, or None if it does not exist"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            session.viewers.add(sid)
+            session.last_active = self.clock()
+            return self._public(session)
+
+    def leave(self, session_id: str, sid: str) -> Optional[Dict]:
+        """Remove a client from a session's room; the idle timeout starts once the last one leaves"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            session.viewers.discard(sid)
+            session.last_active = self.clock()
+            return self._public(session)
+
+    def disconnect(self, sid: str):
+        """Drop a disconnected client from every session it joined"""
+        with self._lock:
+            for session in self.sessions.values():
+                if sid in session.viewers:
+                    self.leave(session.session_id, sid)
+
+    def _close_idle(self):
+        """Close sessions with no joined client and no API activity within the idle timeout"""
+        if not self.idle_seconds:
+            return
+        now = self.clock()
+        for session in list(self.sessions.values()):
+            if not session.viewers and now - session.last_active >= self.idle_seconds:
+                self.sessions.pop(session.session_id)
+                self._notifications.append(('replay_closed', {'session_id': session.session_id, 'reason': 'idle'},
+                                            session.room))
+        self._prune_days()
+
+    def get_status(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            return self._public(session) if session else None
+
+    def list_sessions(self) -> List[Dict]:
+        with self._lock:
+            return [self._public(session) for session in self.sessions.values()]
+
+    def current_update(self, session_id: str) -> Optional[Dict]:
+        """Update payload for a session's current minute (e.g. for a client that just joined)"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            return self._update(session, session.minute) if session else None
+
+    def tick(self):
+        """Close idle sessions and queue an update for every session whose minute changed since its last update"""
+        with self._lock:
+            self._close_idle()
+            for session in self.sessions.values():
+                minute = session.minute
+                if minute == session.last_emitted:
+                    continue
+                session.last_emitted = minute
+                finished = session.playing and minute == len(session.day) - 1
+                if finished:
+                    session.pause()
+                self._notifications.append(('replay_update', self._update(session, minute), session.room))
+                if finished:
+                    self._notifications.append(('replay_finished', self._public(session), session.room))
+
+    def drain_events(self) -> List[Tuple[str, Dict, str]]:
+        """Collect pending (event, payload, room) notifications"""
+        with self._lock:
+            notifications = list(self._notifications)
+            self._notifications.clear()
+        return notifications
+
+    def _update(self, session: ReplaySession, minute: int) -> Dict:
+        return {
+            'session_id': session.session_id,
+            'date': session.day.date,
+            'symbol': session.day.symbol,
+            'minute': minute,
+            'minutes': len(session.day),
+            'rate': session.rate,
+            'playing': session.playing,
+            'snapshot': session.day.snapshot(minute)
+        }
+
+    def _public(self, session: ReplaySession) -> Dict:
+        return {
+            'session_id': session.session_id,
+            'room': session.room,
+            'date': session.day.date,
+            'symbol': session.day.symbol,
+            'rate': session.rate,
+            'playing': session.playing,
+            'minute': session.minute,
+            'minutes': len(session.day),
+            'viewers': len(session.viewers),
+            'created_at': session.created_at
+        }
+
+
+# Global instance
+replay_sessions = ReplaySessionManager()
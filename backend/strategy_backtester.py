@@ -2,11 +2,26 @@
 Advanced Strategy Backtester Module
 Implements put/call ratio strategies with multiple filters and comparisons
 """
+import heapq
+import zlib
 import numpy as np
-import pandas as pd
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from config import Config
-from historical_scenario_generator import historical_generator
+from historical_scenario_generator import historical_generator, simulate_underlying_bars
+from historical_replay import get_replay_loader
+from trade_log import build_trade_log, trade_records, trade_log_store
+from exit_engine import simulate_exits, synthetic_option_bars
+from backtest_metrics import MetricsAccumulator
+
+# Trailing windows (minutes) checked by the multi-timeframe alignment filter
+MULTI_TIMEFRAME_WINDOWS = (5, 10, 30)
+
+# Where date-mode market data comes from: synthetic scenarios or real OPRA minute aggregates
+DATA_SOURCES = ('scenario', 'replay')
+
+# Synthetic option bars: premium leverage to the simulated underlying
+OPTION_LEVERAGE = 20.0
 
 
 class StrategyBacktester:
@@ -24,10 +39,12 @@ class StrategyBacktester:
             'iv_threshold': Config.DEFAULT_IV_THRESHOLD,
             'use_volume_spike': True,
             'use_iv_filter': True,
-            'use_multi_timeframe': True
+            'use_multi_timeframe': True,
+            'data_source': 'scenario',
+            'max_hold_minutes': Config.DEFAULT_MAX_HOLD_MINUTES
         }
     
-    def run_backtest(self, params=None, date=None):
+    def run_backtest(self, params=None, date=None, symbol='SPY', progress_callback=None):
         """Run a single backtest with given parameters"""
         if params is None:
             params = self.default_params.copy()
@@ -40,9 +57,328 @@ class StrategyBacktester:
         # Validate parameters
         self._validate_params(params)
         
-        result = self._execute_backtest(params, 'puts', date=date)
+        result = self._execute_backtest(params, 'puts', date=date, symbol=symbol,
+                                        progress_callback=progress_callback)
         return result
     
+    def run_backtest_range(self, params=None, start_date=None, end_date=None, symbol='SPY',
+                           progress_callback=None):
+        """
+        Run the backtest over every trading day in [start_date, end_date].
+        Each day is executed in a worker process and the per-day results are
+        merged into one equity curve. `num_trades` caps trades per day.
+        progress_callback(dict) is called as each day completes.
+        """
+        if params is None:
+            params = self.default_params.copy()
+        else:
+            p = self.default_params.copy()
+            p.update(params)
+            params = p
+        
+        self._validate_params(params)
+        trading_days = self._get_trading_days(start_date, end_date)
+        
+        day_results = {}
+        # Running metrics over the contiguous prefix of days completed so far
+        running = MetricsAccumulator(params['initial_capital'])
+        days_accumulated = 0
+        max_workers = max(1, min(Config.BACKTEST_MAX_WORKERS, len(trading_days)))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_run_backtest_day, params, 'puts', day, symbol): day
+                for day in trading_days
+            }
+            try:
+                for future in as_completed(futures):
+                    day = futures[future]
+                    day_results[day] = future.result()
+                    
+                    while days_accumulated < len(trading_days) and trading_days[days_accumulated] in day_results:
+                        trade_log = day_results[trading_days[days_accumulated]]['trade_log']
+                        running.update_batch(trade_log['profit'], trade_log['percent_return'].astype(float),
+                                             trade_log['is_win'])
+                        days_accumulated += 1
+                    
+                    if progress_callback:
+                        progress_callback({
+                            'date': day,
+                            'completed': len(day_results),
+                            'total': len(trading_days),
+                            'total_trades': day_results[day]['total_trades'],
+                            'total_profit': day_results[day]['total_profit'],
+                            'win_rate': day_results[day]['win_rate'],
+                            'through_date': trading_days[days_accumulated - 1] if days_accumulated else None,
+                            'running_metrics': running.metrics()
+                        })
+            except BaseException:
+                # Don't wait on the remaining days if a day failed or the caller aborted
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        
+        return self._merge_day_results(params, 'puts', symbol,
+                                       [day_results[day] for day in trading_days])
+    
+    def run_portfolio_backtest(self, params=None, date=None, symbols=None, progress_callback=None):
+        """
+        Backtest several symbols against one shared capital pool.
+        Signals are evaluated on aligned (symbol x minute) arrays in a single
+        pass; trades are taken earliest-first across all symbols up to
+        `num_trades`, limited to as many open positions as capital allows.
+        """
+        if params is None:
+            params = self.default_params.copy()
+        else:
+            p = self.default_params.copy()
+            p.update(params)
+            params = p
+        
+        self._validate_params(params)
+        symbols = list(symbols or Config.SYMBOLS)
+        if len(symbols) > Config.PORTFOLIO_MAX_SYMBOLS:
+            raise ValueError(f"Invalid parameters: at most {Config.PORTFOLIO_MAX_SYMBOLS} symbols allowed")
+        if len(set(symbols)) != len(symbols):
+            raise ValueError("Invalid parameters: duplicate symbols")
+        
+        direction = 'puts'
+        frames = []
+        for i, symbol in enumerate(symbols):
+            frames.append(self._build_market_frame(params, date=date, symbol=symbol))
+            if progress_callback:
+                progress_callback({'stage': 'signals', 'symbol': symbol, 'completed': i + 1, 'total': len(symbols)})
+        frame = self._stack_frames(frames)
+        
+        mask, timeframe_alignment, edge_bonus, iv_filter_applied = self._entry_signals(frame, params, direction)
+        num_symbols, minutes = mask.shape
+        
+        # Minute-major order so the trade cap keeps the earliest signals across symbols
+        entry_minute, symbol_idx = np.nonzero(mask.T)
+        
+        # Resolve exits for all symbols at once on the flattened (symbol x minute) bars
+        bars = frame['option_bars'][direction]
+        flat_entries = symbol_idx * minutes + entry_minute
+        exits = simulate_exits(flat_entries, bars['high'].ravel(), bars['low'].ravel(), bars['close'].ravel(),
+                               params['profit_target'], params['stop_loss'], params['max_hold_minutes'],
+                               series_end=(symbol_idx + 1) * minutes)
+        exit_minute = exits['exit_index'] - symbol_idx * minutes
+        
+        # Shared capital: skip signals while every position slot is in use, until
+        # num_trades are taken (skipped signals do not count toward the cap)
+        taken = self._capital_limited_entries(entry_minute, exit_minute, params, limit=params['num_trades'])
+        capped = int(taken.sum()) == params['num_trades']
+        considered = int(np.flatnonzero(taken)[-1]) + 1 if capped else len(taken)
+        signals_skipped = int((~taken[:considered]).sum())
+        trades_attempted = (int(entry_minute[considered - 1]) + 1 if capped else minutes) * num_symbols
+        entry_minute, symbol_idx, flat_entries, exit_minute = (
+            entry_minute[taken], symbol_idx[taken], flat_entries[taken], exit_minute[taken]
+        )
+        exits = {key: values[taken] for key, values in exits.items()}
+        
+        percent_return = exits['percent_return']
+        is_win = percent_return > 0
+        trade_profit = params['position_size'] * percent_return
+        
+        # P&L is realized at exit: order trades by exit minute (then entry)
+        order = np.lexsort((entry_minute, exit_minute))
+        capital, drawdown, metrics = self._equity_metrics(
+            params, trade_profit[order], percent_return[order], is_win[order]
+        )
+        
+        win_probability = self._win_probability(
+            frame['put_call_ratio'].ravel()[flat_entries], frame['volume_concentration'].ravel()[flat_entries],
+            direction, edge_bonus
+        )
+        trade_log = build_trade_log(
+            len(order),
+            symbol_id=symbol_idx[order],
+            minute=entry_minute[order],
+            put_call_ratio=frame['put_call_ratio'].ravel()[flat_entries][order],
+            volume_spike=frame['volume_spike'].ravel()[flat_entries][order],
+            iv_percentile=frame['iv_percentile'].ravel()[flat_entries][order],
+            timeframe_align=timeframe_alignment.ravel()[flat_entries][order],
+            volume_conc=frame['volume_concentration'].ravel()[flat_entries][order],
+            is_win=is_win[order],
+            percent_return=percent_return[order],
+            profit=trade_profit[order],
+            capital=capital,
+            drawdown=drawdown,
+            win_prob=win_probability[order],
+            exit_reason=exits['exit_reason'][order],
+            hold_minutes=exits['hold_minutes'][order]
+        )
+        run_id = trade_log_store.put(trade_log, direction, symbols=symbols, date=date)
+        
+        # Portfolio equity per minute from realized P&L, sampled for the client
+        realized = np.bincount(exit_minute, weights=trade_profit, minlength=minutes)
+        equity = params['initial_capital'] + np.cumsum(realized)
+        sample = np.unique(np.linspace(0, minutes - 1, min(minutes, Config.PORTFOLIO_EQUITY_POINTS)).astype(int))
+        
+        # Open positions per minute: +1 at entry, -1 at exit
+        open_positions = np.cumsum(
+            np.bincount(entry_minute, minlength=minutes + 1) - np.bincount(exit_minute, minlength=minutes + 1)
+        )
+        
+        symbol_trades = np.bincount(symbol_idx, minlength=num_symbols)
+        symbol_wins = np.bincount(symbol_idx, weights=is_win, minlength=num_symbols)
+        symbol_profit = np.bincount(symbol_idx, weights=trade_profit, minlength=num_symbols)
+        
+        return {
+            'direction': direction,
+            'symbols': symbols,
+            'date': date,
+            'params': params,
+            'data_source': params['data_source'],
+            'iv_filter_applied': bool(iv_filter_applied),
+            'run_id': run_id,
+            'trades': trade_records(trade_log[-50:], direction, symbols),  # Last 50 trades
+            'total_trades': len(order),
+            'trades_attempted': trades_attempted,
+            'trades_filtered': trades_attempted - len(order),
+            'filter_rate': round((trades_attempted - len(order)) / trades_attempted * 100, 1) if trades_attempted else 0,
+            'signals_skipped_for_capital': signals_skipped,
+            'peak_open_positions': int(open_positions.max()) if len(open_positions) else 0,
+            **metrics,
+            'equity_curve': [
+                {'minute': int(m), 'capital': round(float(equity[m]), 2)} for m in sample
+            ],
+            'by_symbol': [
+                {
+                    'symbol': symbol,
+                    'trades': int(symbol_trades[i]),
+                    'win_rate': round(float(symbol_wins[i] / symbol_trades[i] * 100), 2) if symbol_trades[i] else 0,
+                    'total_profit': round(float(symbol_profit[i]), 2)
+                }
+                for i, symbol in enumerate(symbols)
+            ],
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _stack_frames(self, frames):
+        """Align per-symbol market frames into (symbol x minute) arrays"""
+        stacked = {}
+        for key, value in frames[0].items():
+            if key == 'option_bars':
+                stacked[key] = {
+                    direction: {
+                        field: np.stack([f[key][direction][field] for f in frames])
+                        for field in value[direction]
+                    }
+                    for direction in value
+                }
+            else:
+                stacked[key] = np.stack([f[key] for f in frames])
+        return stacked
+    
+    def _capital_limited_entries(self, entry_minute, exit_minute, params, limit=None):
+        """
+        Mask of entries that fit in the shared capital pool, where a position
+        occupies one slot of `position_size` from its entry until its exit minute.
+        Once `limit` entries are taken the walk stops and later entries stay False.
+        """
+        max_positions = int(params['initial_capital'] // params['position_size'])
+        minutes = int(max(entry_minute.max(), exit_minute.max())) + 2 if len(entry_minute) else 1
+        open_positions = np.cumsum(
+            np.bincount(entry_minute, minlength=minutes) - np.bincount(exit_minute, minlength=minutes)
+        )
+        if len(open_positions) == 0 or open_positions.max() <= max_positions:
+            taken = np.ones(len(entry_minute), dtype=bool)
+            taken[limit:] = False
+            return taken
+        
+        # Capacity is binding somewhere: allocate slots greedily in entry order. Each
+        # decision depends on the ones before it, so this stays a heap walk (over
+        # Python ints; per-minute NumPy batches measured 4-40x slower at <= 390 minutes)
+        taken = np.zeros(len(entry_minute), dtype=bool)
+        exits = exit_minute.tolist()
+        open_exits = []
+        remaining = len(entry_minute) if limit is None else limit
+        for i, entry in enumerate(entry_minute.tolist()):
+            if remaining == 0:
+                break
+            while open_exits and open_exits[0] <= entry:
+                heapq.heappop(open_exits)
+            if len(open_exits) < max_positions:
+                heapq.heappush(open_exits, exits[i])
+                taken[i] = True
+                remaining -= 1
+        return taken
+    
+    def _get_trading_days(self, start_date, end_date):
+        """List weekdays between two YYYY-MM-DD dates (inclusive)"""
+        if not start_date or not end_date:
+            raise ValueError("Invalid parameters: start_date and end_date are required")
+        
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        if end < start:
+            raise ValueError("Invalid parameters: end_date must not be before start_date")
+        
+        days = []
+        current = start
+        while current <= end:
+            if current.weekday() < 5:
+                days.append(current.strftime('%Y-%m-%d'))
+            current += timedelta(days=1)
+        
+        if not days:
+            raise ValueError("Invalid parameters: date range contains no trading days")
+        if len(days) > Config.BACKTEST_MAX_RANGE_DAYS:
+            raise ValueError(
+                f"Invalid parameters: date range cannot exceed {Config.BACKTEST_MAX_RANGE_DAYS} trading days"
+            )
+        return days
+    
+    def _merge_day_results(self, params, direction, symbol, day_results):
+        """Chain per-day results into a combined equity curve and metrics"""
+        initial_capital = params['initial_capital']
+        trade_log = np.concatenate([r.pop('trade_log') for r in day_results])
+        
+        # Trade-level equity path across all days
+        equity, drawdowns, metrics = self._equity_metrics(
+            params, trade_log['profit'], trade_log['percent_return'].astype(float), trade_log['is_win']
+        )
+        trade_log['trade_num'] = np.arange(1, len(trade_log) + 1)
+        trade_log['capital'] = equity
+        trade_log['drawdown'] = drawdowns
+        run_id = trade_log_store.put(trade_log, direction, symbols=[symbol],
+                                     date=f"{day_results[0]['date']}..{day_results[-1]['date']}")
+        
+        # Day-level equity curve
+        equity_curve = []
+        capital = initial_capital
+        for r in day_results:
+            capital += r['total_profit']
+            equity_curve.append({
+                'date': r['date'],
+                'capital': round(capital, 2),
+                'profit': r['total_profit'],
+                'trades': r['total_trades'],
+                'win_rate': r['win_rate']
+            })
+        
+        total_trades = len(trade_log)
+        trades_attempted = sum(r['trades_attempted'] for r in day_results)
+        trades_filtered = sum(r['trades_filtered'] for r in day_results)
+        
+        return {
+            'direction': direction,
+            'symbol': symbol,
+            'params': params,
+            'run_id': run_id,
+            'trades': trade_records(trade_log[-50:], direction, [symbol]),  # Last 50 trades
+            'start_date': day_results[0]['date'],
+            'end_date': day_results[-1]['date'],
+            'days': len(day_results),
+            'equity_curve': equity_curve,
+            'daily_results': day_results,
+            'total_trades': total_trades,
+            'trades_attempted': trades_attempted,
+            'trades_filtered': trades_filtered,
+            'filter_rate': round(trades_filtered / trades_attempted * 100, 1) if trades_attempted > 0 else 0,
+            **metrics,
+            'timestamp': datetime.now().isoformat()
+        }
+    
     def _validate_params(self, params):
         """Validate backtest parameters"""
         errors = []
@@ -67,12 +403,21 @@ class StrategyBacktester:
             errors.append("Volume spike threshold must be greater than 0")
         if params['iv_threshold'] < 0 or params['iv_threshold'] > 100:
             errors.append("IV threshold must be between 0 and 100")
+        if params['max_hold_minutes'] < 1 or params['max_hold_minutes'] > 390:
+            errors.append("Max hold must be between 1 and 390 minutes")
+        if params['data_source'] not in DATA_SOURCES:
+            errors.append(f"Data source must be one of: {', '.join(DATA_SOURCES)}")
         
         if errors:
             raise ValueError("Invalid parameters: " + "; ".join(errors))
     
-    def compare_strategies(self, params=None, date=None):
-        """Compare multiple strategies: advanced puts, basic puts, advanced calls"""
+    def compare_strategies(self, params=None, date=None, symbol='SPY', progress_callback=None, variants=None):
+        """
+        Compare multiple strategies: advanced puts, basic puts, advanced calls.
+        The market/signal frame is generated once and every strategy, including
+        any user-defined `variants`, is evaluated as a set of masks over it.
+        Each variant is {'name': str, 'direction': 'puts'|'calls', 'params': {...overrides}}.
+        """
         if params is None:
             params = self.default_params.copy()
         else:
@@ -82,247 +427,317 @@ class StrategyBacktester:
         
         # Validate parameters
         self._validate_params(params)
+        variant_specs = self._prepare_variants(params, variants or [])
         
-        # Run advanced puts strategy
-        advanced_puts = self._execute_backtest(params, 'puts', date=date)
-        
-        # Run basic puts (no filters)
         basic_params = params.copy()
         basic_params.update({
             'use_volume_spike': False,
             'use_iv_filter': False,
             'use_multi_timeframe': False
         })
-        basic_puts = self._execute_backtest(basic_params, 'puts', date=date)
+        strategies = [
+            ('advanced_puts', 'puts', params),
+            ('basic_puts', 'puts', basic_params),
+            ('advanced_calls', 'calls', params),
+        ] + variant_specs
         
-        # Run advanced calls (inverse signals)
-        advanced_calls = self._execute_backtest(params, 'calls', date=date)
+        # Shared market/signal frame, sized for the largest variant
+        frame_params = params.copy()
+        frame_params['num_trades'] = max(spec_params['num_trades'] for _, _, spec_params in strategies)
+        frame = self._build_market_frame(frame_params, date=date, symbol=symbol)
         
-        return {
+        results = {}
+        for i, (name, direction, strategy_params) in enumerate(strategies):
+            results[name] = self._evaluate_strategy(frame, strategy_params, direction, date=date, symbol=symbol)
+            if progress_callback:
+                progress_callback({
+                    'stage': name,
+                    'completed': i + 1,
+                    'total': len(strategies),
+                    'trades': results[name]['total_trades']
+                })
+        
+        advanced_puts = results['advanced_puts']
+        basic_puts = results['basic_puts']
+        advanced_calls = results['advanced_calls']
+        
+        comparison = {
             'advanced_puts': advanced_puts,
             'basic_puts': basic_puts,
             'advanced_calls': advanced_calls,
             'comparison': self._calculate_comparison(advanced_puts, basic_puts, advanced_calls)
         }
+        if variant_specs:
+            comparison['variants'] = {name: results[name] for name, _, _ in variant_specs}
+        return comparison
     
-    def _execute_backtest(self, params, direction, date=None):
-        """Execute backtest for a specific direction (puts or calls)"""
-        trades = []
-        capital = params['initial_capital']
-        wins = 0
-        losses = 0
-        total_profit = 0
-        max_drawdown = 0
-        peak_capital = params['initial_capital']
-        consecutive_wins = 0
-        consecutive_losses = 0
-        max_consecutive_wins = 0
-        max_consecutive_losses = 0
-        
-        trades_attempted = 0
-        trades_filtered = 0
+    def _prepare_variants(self, params, variants):
+        """Validate user-defined variants and merge their overrides onto params"""
+        if len(variants) > Config.BACKTEST_MAX_VARIANTS:
+            raise ValueError(f"Invalid parameters: at most {Config.BACKTEST_MAX_VARIANTS} variants allowed")
         
+        reserved = {'advanced_puts', 'basic_puts', 'advanced_calls'}
+        specs = []
+        for i, variant in enumerate(variants):
+            if not isinstance(variant, dict) or not isinstance(variant.get('params', {}), dict):
+                raise ValueError(f"Invalid parameters: variant {i + 1} must be an object with a 'params' object")
+            name = variant.get('name') or f'variant_{i + 1}'
+            direction = variant.get('direction', 'puts')
+            if name in reserved or name in {spec[0] for spec in specs}:
+                raise ValueError(f"Invalid parameters: duplicate variant name '{name}'")
+            if direction not in ('puts', 'calls'):
+                raise ValueError(f"Invalid parameters: variant '{name}' direction must be 'puts' or 'calls'")
+            
+            variant_params = params.copy()
+            variant_params.update(variant.get('params', {}))
+            self._validate_params(variant_params)
+            specs.append((name, direction, variant_params))
+        return specs
+    
+    def _execute_backtest(self, params, direction, date=None, symbol='SPY', include_trade_series=False,
+                          progress_callback=None):
+        """
+        Execute backtest for a specific direction (puts or calls).
+        Progress is reported after each stage (building the market frame,
+        then evaluating the strategy over it), the points where a job can be
+        cancelled; each stage itself runs as one vectorized pass.
+        """
+        frame = self._build_market_frame(params, date=date, symbol=symbol)
+        if progress_callback:
+            progress_callback({'stage': 'frame', 'completed': 1, 'total': 2,
+                               'minutes': len(frame['put_call_ratio'])})
+        
+        result = self._evaluate_strategy(frame, params, direction, date=date, symbol=symbol,
+                                         include_trade_series=include_trade_series)
+        if progress_callback:
+            progress_callback({
+                'stage': 'evaluate',
+                'completed': 2,
+                'total': 2,
+                'processed': result['trades_attempted'],
+                'minutes': len(frame['put_call_ratio']),
+                'trades': result['total_trades']
+            })
+        return result
+    
+    def _build_market_frame(self, params, date=None, symbol='SPY'):
+        """
+        Build the per-minute market and signal columns shared by every strategy,
+        including the call and put option price bars that trade exits are
+        resolved against.
+        """
+        # Real OPRA minute flow for the date, aggregated once per (date, symbol)
+        if params['data_source'] == 'replay':
+            if not date:
+                raise ValueError("Invalid parameters: replay data source requires a date")
+            replay_frame = get_replay_loader().load_minute_frame(date, symbol)
+            if replay_frame is None:
+                raise ValueError(f"No replay data available for {symbol} on {date}")
+            
+            data_points = len(replay_frame['minute'])
+            put_call_ratio = replay_frame['put_call_ratio']
+            volume_spike = replay_frame['volume_spike']
+            put_volume = replay_frame['put_volume']
+            call_volume = replay_frame['call_volume']
+            iv_percentile = np.full(data_points, np.nan)  # Not in minute aggregates
+            # Not in minute aggregates either; seeded per (date, symbol) so runs repeat
+            rng = np.random.default_rng(zlib.crc32(f"{date}:{symbol}".encode()))
+            volume_concentration = 0.6 + rng.random(data_points) * 0.3
+            option_bars = {'calls': replay_frame['call_bars'], 'puts': replay_frame['put_bars']}
         # Generate realistic historical data if date is provided
-        if date:
-            scenario_data_list = historical_generator.generate_intraday_data(date, 'SPY')
-            scenario_data = pd.DataFrame(scenario_data_list)
-            # Use scenario data for backtest
-            data_points = len(scenario_data)
+        elif date:
+            scenario_data = historical_generator.generate_intraday_frame(date, symbol)
+            put_call_ratio = scenario_data['put_call_ratio']
+            current_volume = scenario_data['total_volume'].astype(float)
+            avg_volume = current_volume.mean()
+            volume_spike = current_volume / avg_volume if avg_volume > 0 else np.ones(len(current_volume))
+            iv_percentile = scenario_data['iv_percentile']
+            put_volume = scenario_data['put_volume'].astype(float)
+            call_volume = scenario_data['call_volume'].astype(float)
+            # Drawn with the rest of the day, so dated runs are reproducible
+            volume_concentration = scenario_data['volume_concentration']
+            option_bars = synthetic_option_bars(
+                scenario_data['underlying_open'], scenario_data['underlying_high'],
+                scenario_data['underlying_low'], scenario_data['underlying_close'], OPTION_LEVERAGE
+            )
         else:
-            # Fallback to random generation
+            # Random generation fallback
             data_points = params['num_trades'] * 3  # Attempt 3x trades to account for filters
-            scenario_data = None
+            put_call_ratio = 0.8 + np.random.random(data_points) * 1.5
+            volume_concentration = np.random.random(data_points)
+            current_volume = 50000 + np.random.random(data_points) * 150000
+            volume_spike = current_volume / 100000
+            iv_percentile = np.random.random(data_points) * 100
+            # Split each minute's volume so that puts / calls == put_call_ratio
+            call_volume = current_volume / (1 + put_call_ratio)
+            put_volume = current_volume - call_volume
+            option_bars = self._simulate_option_bars(data_points, volatility=1.0, trend=0.0)
         
-        for i in range(data_points):
-            if len(trades) >= params['num_trades']:
-                break
-            
-            trades_attempted += 1
-            
-            # Get market conditions from scenario or random generation
-            if scenario_data is not None and i < len(scenario_data):
-                data_point = scenario_data.iloc[i]
-                put_call_ratio = data_point['put_call_ratio']
-                current_volume = data_point['total_volume']
-                avg_volume = scenario_data['total_volume'].mean()
-                volume_spike = current_volume / avg_volume if avg_volume > 0 else 1.0
-                iv_percentile = data_point['iv_percentile']
-                volume_concentration = 0.6 + np.random.random() * 0.3  # Reasonable range
-            else:
-                # Random generation fallback
-                put_call_ratio = 0.8 + np.random.random() * 1.5
-                volume_concentration = np.random.random()
-                current_volume = 50000 + np.random.random() * 150000
-                avg_volume = 100000
-                volume_spike = current_volume / avg_volume
-                iv_percentile = np.random.random() * 100
-            
-            # Multi-timeframe alignment
-            tf5min = put_call_ratio + (np.random.random() - 0.5) * 0.1
-            tf10min = put_call_ratio + (np.random.random() - 0.5) * 0.15
-            tf30min = put_call_ratio + (np.random.random() - 0.5) * 0.2
-            timeframe_alignment = (
-                abs(tf5min - put_call_ratio) < 0.1 and 
-                abs(tf10min - put_call_ratio) < 0.15 and
-                abs(tf30min - put_call_ratio) < 0.2
-            )
-            
-            # Entry logic with filters
-            should_trade = False
-            edge_bonus = 0
-            
-            if direction == 'puts':
-                should_trade = put_call_ratio > params['put_call_threshold']
-            else:
-                should_trade = put_call_ratio < (2 - params['put_call_threshold'])
-            
-            if not should_trade:
-                trades_filtered += 1
-                continue
-            
-            # Apply filters
-            if params['use_volume_spike']:
-                if volume_spike > params['volume_spike_threshold']:
-                    edge_bonus += 0.05  # 5% win probability boost
-                else:
-                    trades_filtered += 1
-                    continue
-            
-            if params['use_iv_filter']:
-                if params['iv_threshold'] < iv_percentile < 70:
-                    edge_bonus += 0.04  # 4% win probability boost
-                else:
-                    trades_filtered += 1
-                    continue
-            
-            if params['use_multi_timeframe']:
-                if timeframe_alignment:
-                    edge_bonus += 0.06  # 6% win probability boost
-                else:
-                    trades_filtered += 1
-                    continue
-            
-            # Calculate win probability
-            win_probability = 0.45 if direction == 'puts' else 0.43
-            
-            # Adjust for extreme readings
+        frame = {
+            'put_call_ratio': put_call_ratio,
+            'volume_spike': volume_spike,
+            'iv_percentile': iv_percentile,
+            'volume_concentration': volume_concentration,
+            'option_bars': option_bars
+        }
+        
+        # Multi-timeframe put/call ratios over the minute series
+        for window in MULTI_TIMEFRAME_WINDOWS:
+            frame[f'tf{window}min'] = self._rolling_ratio(put_volume, call_volume, window)
+        return frame
+    
+    def _simulate_option_bars(self, data_points, volatility, trend):
+        """Unseeded random-walk underlying minute bars for a regime, converted to call/put premium bars"""
+        underlying = simulate_underlying_bars(np.random.default_rng(), data_points, volatility, trend)
+        return synthetic_option_bars(underlying['open'], underlying['high'], underlying['low'],
+                                     underlying['close'], OPTION_LEVERAGE)
+    
+    def _rolling_ratio(self, put_volume, call_volume, window):
+        """
+        Trailing `window`-minute put/call volume ratio in O(n) via cumulative sums.
+        The first minutes of a series use the partial window available.
+        """
+        put_cumsum = np.concatenate(([0.0], np.cumsum(put_volume)))
+        call_cumsum = np.concatenate(([0.0], np.cumsum(call_volume)))
+        end = np.arange(1, len(put_volume) + 1)
+        start = np.maximum(end - window, 0)
+        
+        window_puts = put_cumsum[end] - put_cumsum[start]
+        window_calls = call_cumsum[end] - call_cumsum[start]
+        return window_puts / np.maximum(window_calls, 1)
+    
+    def _timeframe_alignment(self, frame, params, direction):
+        """Minutes where every rolling timeframe agrees with the entry signal"""
+        aligned = np.ones(frame['put_call_ratio'].shape, dtype=bool)
+        for window in MULTI_TIMEFRAME_WINDOWS:
+            rolling_ratio = frame[f'tf{window}min']
             if direction == 'puts':
-                if put_call_ratio > 1.5:
-                    win_probability = 0.52  # Oversold
-                elif put_call_ratio > 1.3:
-                    win_probability = 0.48
-            else:
-                if put_call_ratio < 0.9:
-                    win_probability = 0.50  # Overbought
-            
-            # Volume concentration bonus
-            if volume_concentration > 0.7:
-                edge_bonus += 0.03
-            
-            # Apply edge bonus
-            win_probability += edge_bonus
-            
-            # Execute trade
-            is_win = np.random.random() < win_probability
-            
-            if is_win:
-                # Winner - hit profit target or partial profit
-                percent_return = params['profit_target'] if np.random.random() < 0.35 else (0.05 + np.random.random() * 0.15)
-                wins += 1
-                consecutive_wins += 1
-                consecutive_losses = 0
-                max_consecutive_wins = max(max_consecutive_wins, consecutive_wins)
+                aligned &= rolling_ratio > params['put_call_threshold']
             else:
-                # Loser - hit stop loss or partial loss
-                percent_return = params['stop_loss'] if np.random.random() < 0.4 else (-0.10 - np.random.random() * 0.40)
-                losses += 1
-                consecutive_losses += 1
-                consecutive_wins = 0
-                max_consecutive_losses = max(max_consecutive_losses, consecutive_losses)
-            
-            trade_profit = params['position_size'] * percent_return
-            capital += trade_profit
-            total_profit += trade_profit
-            
-            # Track drawdown
-            if capital > peak_capital:
-                peak_capital = capital
-            current_drawdown = ((peak_capital - capital) / peak_capital) * 100 if peak_capital > 0 else 0
-            max_drawdown = max(max_drawdown, current_drawdown)
-            
-            # Record trade
-            trades.append({
-                'trade_num': len(trades) + 1,
-                'direction': direction,
-                'put_call_ratio': round(put_call_ratio, 4),
-                'volume_spike': round(volume_spike, 2),
-                'iv_percentile': round(iv_percentile, 1),
-                'timeframe_align': 'Yes' if timeframe_alignment else 'No',
-                'volume_conc': round(volume_concentration * 100, 1),
-                'result': 'Win' if is_win else 'Loss',
-                'percent_return': round(percent_return * 100, 2),
-                'profit': round(trade_profit, 2),
-                'capital': round(capital, 2),
-                'drawdown': round(current_drawdown, 2),
-                'win_prob': round(win_probability * 100, 1)
-            })
+                aligned &= rolling_ratio < (2 - params['put_call_threshold'])
+        return aligned
+    
+    def _evaluate_strategy(self, frame, params, direction, date=None, symbol='SPY', include_trade_series=False):
+        """Evaluate one strategy's entry filters and trade outcomes as masks over a market frame"""
+        put_call_ratio = frame['put_call_ratio']
+        data_points = len(put_call_ratio)
         
-        # Calculate metrics
-        total_trades = wins + losses
-        win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
+        mask, timeframe_alignment, edge_bonus, iv_filter_applied = self._entry_signals(frame, params, direction)
         
-        winning_trades = [t for t in trades if t['result'] == 'Win']
-        losing_trades = [t for t in trades if t['result'] == 'Loss']
+        entries = np.flatnonzero(mask)[:params['num_trades']]
+        total_trades = len(entries)
+        trades_attempted = int(entries[-1]) + 1 if total_trades == params['num_trades'] else data_points
+        trades_filtered = trades_attempted - total_trades
         
-        avg_win = np.mean([t['profit'] for t in winning_trades]) if winning_trades else 0
-        avg_loss = np.mean([t['profit'] for t in losing_trades]) if losing_trades else 0
+        entry_ratio = put_call_ratio[entries]
+        volume_concentration = frame['volume_concentration'][entries]
+        win_probability = self._win_probability(entry_ratio, volume_concentration, direction, edge_bonus)
         
-        profit_factor = abs(avg_win * wins / (avg_loss * losses)) if losses > 0 and avg_loss != 0 else 0
-        sharpe_ratio = self._calculate_sharpe([t['percent_return'] for t in trades])
-        expectancy = total_profit / total_trades if total_trades > 0 else 0
-        return_percent = ((capital - params['initial_capital']) / params['initial_capital']) * 100
+        # Execute trades: resolve target / stop / time exits on the option's price path
+        bars = frame['option_bars'][direction]
+        exits = simulate_exits(entries, bars['high'], bars['low'], bars['close'],
+                               params['profit_target'], params['stop_loss'], params['max_hold_minutes'])
+        percent_return = exits['percent_return']
+        is_win = percent_return > 0
+        trade_profit = params['position_size'] * percent_return
         
-        return {
+        capital, drawdown, metrics = self._equity_metrics(params, trade_profit, percent_return, is_win)
+        
+        trade_log = build_trade_log(
+            total_trades,
+            minute=entries,
+            put_call_ratio=entry_ratio,
+            volume_spike=frame['volume_spike'][entries],
+            iv_percentile=frame['iv_percentile'][entries],
+            timeframe_align=timeframe_alignment[entries],
+            volume_conc=volume_concentration,
+            is_win=is_win,
+            percent_return=percent_return,
+            profit=trade_profit,
+            capital=capital,
+            drawdown=drawdown,
+            win_prob=win_probability,
+            exit_reason=exits['exit_reason'],
+            hold_minutes=exits['hold_minutes']
+        )
+        
+        result = {
             'direction': direction,
+            'symbol': symbol,
+            'date': date,
             'params': params,
-            'trades': trades[-50:],  # Last 50 trades
-            'all_trades_count': len(trades),
+            'data_source': params['data_source'],
+            'iv_filter_applied': bool(iv_filter_applied),
+            'trades': trade_records(trade_log[-50:], direction, [symbol]),  # Last 50 trades
+            'all_trades_count': total_trades,
             'total_trades': total_trades,
             'trades_attempted': trades_attempted,
             'trades_filtered': trades_filtered,
             'filter_rate': round(trades_filtered / trades_attempted * 100, 1) if trades_attempted > 0 else 0,
-            'wins': wins,
-            'losses': losses,
-            'win_rate': round(win_rate, 2),
-            'total_profit': round(total_profit, 2),
-            'final_capital': round(capital, 2),
-            'return_percent': round(return_percent, 2),
-            'avg_win': round(avg_win, 2),
-            'avg_loss': round(avg_loss, 2),
-            'profit_factor': round(profit_factor, 2),
-            'max_drawdown': round(max_drawdown, 2),
-            'sharpe_ratio': round(sharpe_ratio, 2),
-            'max_consecutive_wins': max_consecutive_wins,
-            'max_consecutive_losses': max_consecutive_losses,
-            'expectancy': round(expectancy, 2),
+            **metrics,
             'timestamp': datetime.now().isoformat()
         }
+        
+        if include_trade_series:
+            # Multi-day runs merge the raw per-day logs in the parent process
+            result['trade_log'] = trade_log
+        else:
+            result['run_id'] = trade_log_store.put(trade_log, direction, symbols=[symbol], date=date)
+        
+        return result
     
-    def _calculate_sharpe(self, returns):
-        """Calculate Sharpe ratio"""
-        if not returns:
-            return 0
+    def _entry_signals(self, frame, params, direction):
+        """
+        Entry mask after filters, for frames of any shape (minutes, or symbols x minutes).
+        Returns (mask, timeframe_alignment, edge_bonus, iv_filter_applied).
+        """
+        put_call_ratio = frame['put_call_ratio']
+        
+        # Entry logic with filters
+        if direction == 'puts':
+            mask = put_call_ratio > params['put_call_threshold']
+        else:
+            mask = put_call_ratio < (2 - params['put_call_threshold'])
+        edge_bonus = 0.0
         
-        returns_array = np.array(returns)
-        avg_return = np.mean(returns_array)
-        std_dev = np.std(returns_array)
+        if params['use_volume_spike']:
+            mask &= frame['volume_spike'] > params['volume_spike_threshold']
+            edge_bonus += 0.05  # 5% win probability boost
         
-        if std_dev == 0:
-            return 0
+        # IV isn't available for every data source (e.g. replay minute aggregates)
+        iv_filter_applied = params['use_iv_filter'] and not np.isnan(frame['iv_percentile']).all()
+        if iv_filter_applied:
+            iv_percentile = frame['iv_percentile']
+            mask &= (params['iv_threshold'] < iv_percentile) & (iv_percentile < 70)
+            edge_bonus += 0.04  # 4% win probability boost
         
-        # Annualized Sharpe (assuming 252 trading days)
-        sharpe = (avg_return / std_dev) * np.sqrt(252)
-        return sharpe
+        timeframe_alignment = self._timeframe_alignment(frame, params, direction)
+        if params['use_multi_timeframe']:
+            mask &= timeframe_alignment
+            edge_bonus += 0.06  # 6% win probability boost
+        
+        return mask, timeframe_alignment, edge_bonus, iv_filter_applied
+    
+    def _win_probability(self, entry_ratio, volume_concentration, direction, edge_bonus):
+        """Signal score per entry: base odds adjusted for extreme readings plus filter edge"""
+        if direction == 'puts':
+            win_probability = np.select(
+                [entry_ratio > 1.5, entry_ratio > 1.3], [0.52, 0.48], 0.45  # Oversold
+            )
+        else:
+            win_probability = np.where(entry_ratio < 0.9, 0.50, 0.43)  # Overbought
+        
+        # Volume concentration bonus, then filter edge bonus
+        return win_probability + np.where(volume_concentration > 0.7, 0.03, 0) + edge_bonus
+    
+    def _equity_metrics(self, params, trade_profit, percent_return, is_win):
+        """
+        Capital path, drawdown path and summary metrics for trades in realization order.
+        Returns (capital, drawdown, metrics).
+        """
+        accumulator = MetricsAccumulator(params['initial_capital'])
+        capital, drawdown = accumulator.update_batch(trade_profit, percent_return, is_win)
+        return capital, drawdown, accumulator.metrics()
     
     def _calculate_comparison(self, advanced_puts, basic_puts, advanced_calls):
         """Calculate comparison metrics between strategies"""
@@ -350,5 +765,12 @@ class StrategyBacktester:
         }
 
 
+def _run_backtest_day(params, direction, date, symbol):
+    """Process pool entry point: backtest a single trading day"""
+    return StrategyBacktester()._execute_backtest(
+        params, direction, date=date, symbol=symbol, include_trade_series=True
+    )
+
+
 # Singleton instance
 strategy_backtester = StrategyBacktester()
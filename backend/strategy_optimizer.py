@@ -0,0 +1,466 @@
+"""
+Strategy Parameter Optimizer
+Random search with successive halving: many sampled configurations are scored
+on a short window of trading days, and only the best fraction is promoted to
+longer windows. Walk-forward validation re-picks parameters on rolling train
+windows and scores each pick on the days that follow. Evaluations run on a
+process pool over StrategyBacktester.
+"""
+import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from numpy.lib.recfunctions import repack_fields
+
+from config import Config
+from backtest_metrics import MetricsAccumulator
+
+
+# Searchable parameters: (low, high) for numeric ranges, a list for discrete choices
+SEARCH_SPACE = {
+    'put_call_threshold': (0.9, 2.0),
+    'volume_spike_threshold': (1.0, 3.0),
+    'iv_threshold': (0, 80),
+    'profit_target': (0.05, 1.0),
+    'stop_loss': (-0.9, -0.05),
+    'max_hold_minutes': (5, 240),
+    'use_multi_timeframe': [True, False],
+}
+
+INTEGER_PARAMS = ('iv_threshold', 'max_hold_minutes')
+
+OBJECTIVES = ('return_percent', 'sharpe_ratio', 'expectancy', 'profit_factor')
+
+# Keyword settings accepted by StrategyOptimizer.optimize / walk_forward alongside strategy params
+OPTIMIZER_SETTINGS = ('direction', 'num_configs', 'eta', 'min_days', 'max_days', 'objective',
+                      'search_space', 'seed')
+WALK_FORWARD_SETTINGS = ('direction', 'train_days', 'test_days', 'step_days', 'num_configs', 'objective',
+                         'search_space', 'seed')
+
+# Metrics kept per evaluation in the optimizer result
+REPORTED_METRICS = ('total_trades', 'win_rate', 'total_profit', 'return_percent', 'max_drawdown',
+                    'sharpe_ratio', 'profit_factor', 'expectancy')
+
+# Trade log columns cached per (configuration, day) for walk-forward windows
+WINDOW_COLUMNS = ['profit', 'percent_return', 'is_win']
+
+# Market frames kept per worker process; frames don't depend on strategy params
+FRAME_CACHE_SIZE = 32
+_frame_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+
+def pareto_front(returns: np.ndarray, drawdowns: np.ndarray) -> np.ndarray:
+    """Indices of points not dominated on (higher return, lower drawdown), by drawdown"""
+    returns = np.asarray(returns, dtype=float)
+    drawdowns = np.asarray(drawdowns, dtype=float)
+    if len(returns) == 0:
+        return np.array([], dtype=int)
+
+    # Walk from lowest drawdown up; a point survives only if it beats every return before it
+    order = np.lexsort((-returns, drawdowns))
+    best_before = np.concatenate(([-np.inf], np.maximum.accumulate(returns[order])[:-1]))
+    return order[returns[order] > best_before]
+
+
+def _market_frame(backtester, params: Dict, date: str, symbol: str) -> Dict:
+    """Per-process cached market frame for (data source, date, symbol)"""
+    key = (params['data_source'], date, symbol)
+    frame = _frame_cache.get(key)
+    if frame is None:
+        frame = backtester._build_market_frame(params, date=date, symbol=symbol)
+        _frame_cache[key] = frame
+        while len(_frame_cache) > FRAME_CACHE_SIZE:
+            _frame_cache.popitem(last=False)
+    else:
+        _frame_cache.move_to_end(key)
+    return frame
+
+
+def _evaluate_config(params: Dict, direction: str, dates: List[str], symbol: str) -> Dict:
+    """Process pool entry point: backtest one configuration over a window of days"""
+    from strategy_backtester import StrategyBacktester
+
+    backtester = StrategyBacktester()
+    accumulator = MetricsAccumulator(params['initial_capital'])
+    for date in dates:
+        trade_log = backtester._evaluate_strategy(_market_frame(backtester, params, date, symbol), params,
+                                                  direction, date=date, symbol=symbol,
+                                                  include_trade_series=True)['trade_log']
+        accumulator.update_batch(trade_log['profit'], trade_log['percent_return'].astype(float), trade_log['is_win'])
+    return _reported_metrics(accumulator)
+
+
+def _reported_metrics(accumulator: MetricsAccumulator) -> Dict:
+    """Subset of accumulated metrics kept per evaluation"""
+    metrics = accumulator.metrics()
+    metrics['total_trades'] = accumulator.trades
+    return {key: metrics[key] for key in REPORTED_METRICS}
+
+
+def _evaluate_day(candidates: List[Dict], direction: str, date: str, symbol: str) -> List[np.ndarray]:
+    """Process pool entry point: backtest several configurations on one day's shared frame"""
+    from strategy_backtester import StrategyBacktester
+
+    backtester = StrategyBacktester()
+    frame = _market_frame(backtester, candidates[0], date, symbol)
+    # Only the columns window metrics need, packed so they pickle compactly
+    return [
+        repack_fields(backtester._evaluate_strategy(frame, params, direction, date=date, symbol=symbol,
+                                                    include_trade_series=True)['trade_log'][WINDOW_COLUMNS])
+        for params in candidates
+    ]
+
+
+class StrategyOptimizer:
+    """Search strategy parameters with successive halving over trading-day budgets"""
+
+    def optimize(self, params=None, end_date=None, symbol='SPY', direction='puts', num_configs=27,
+                 eta=3, min_days=1, max_days=9, objective='return_percent', search_space=None,
+                 seed=None, progress_callback=None):
+        """
+        Sample `num_configs` parameter sets from the search space and evaluate
+        them on the `min_days` trading days ending at `end_date`. After each
+        rung the top 1/`eta` by `objective` (plus the rung's return/drawdown
+        Pareto front) are promoted to an `eta` times longer window, up to
+        `max_days`. min_days == max_days is plain random search.
+
+        Returns every evaluation, the best configuration at the longest window
+        and the Pareto front of return vs. drawdown among those configurations.
+        """
+        from strategy_backtester import strategy_backtester
+
+        base_params = strategy_backtester.default_params.copy()
+        base_params.update(params or {})
+        strategy_backtester._validate_params(base_params)
+
+        space = self._resolve_space(search_space)
+        self._validate_options(direction, num_configs, eta, min_days, max_days, objective)
+
+        end_date = end_date or self._last_trading_day()
+        all_days = self._trailing_trading_days(end_date, max_days)
+
+        candidates = self._sample_candidates(base_params, space, num_configs, seed)
+        budgets = self._budgets(eta, min_days, max_days)
+        survivors = list(range(len(candidates)))
+        evaluations = []
+
+        max_workers = max(1, min(Config.BACKTEST_MAX_WORKERS, len(candidates)))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                for rung, days in enumerate(budgets):
+                    window = all_days[-days:]
+                    futures = {
+                        executor.submit(_evaluate_config, candidates[i], direction, window, symbol): i
+                        for i in survivors
+                    }
+                    scores = {}
+                    for future in as_completed(futures):
+                        config_id = futures[future]
+                        scores[config_id] = future.result()
+                        evaluations.append({
+                            'config_id': config_id,
+                            'rung': rung,
+                            'days': days,
+                            'params': {key: candidates[config_id][key] for key in space},
+                            **scores[config_id]
+                        })
+
+                        if progress_callback:
+                            progress_callback({
+                                'rung': rung + 1,
+                                'rungs': len(budgets),
+                                'days': days,
+                                'completed': len(scores),
+                                'total': len(survivors),
+                                'best': max(s[objective] for s in scores.values())
+                            })
+
+                    if rung < len(budgets) - 1:
+                        survivors = self._promote(scores, objective, eta)
+            except BaseException:
+                # Don't wait on queued evaluations if one failed or the caller aborted
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        final = [e for e in evaluations if e['rung'] == len(budgets) - 1]
+        final.sort(key=lambda e: e[objective], reverse=True)
+        front = pareto_front([e['return_percent'] for e in final], [e['max_drawdown'] for e in final])
+
+        return {
+            'direction': direction,
+            'symbol': symbol,
+            'objective': objective,
+            'start_date': all_days[-budgets[-1]],
+            'end_date': end_date,
+            'base_params': base_params,
+            'search_space': {key: list(value) for key, value in space.items()},
+            'configs_sampled': num_configs,
+            'configs_evaluated': len(candidates),
+            'budgets': budgets,
+            'total_evaluations': len(evaluations),
+            'evaluation_days': sum(e['days'] for e in evaluations),
+            'best': final[0],
+            'pareto_front': [final[i] for i in front],
+            'evaluations': evaluations,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def walk_forward(self, params=None, start_date=None, end_date=None, symbol='SPY', direction='puts',
+                     train_days=20, test_days=5, step_days=None, num_configs=27, objective='return_percent',
+                     search_space=None, seed=None, progress_callback=None):
+        """
+        Walk-forward validation over [start_date, end_date]: the trading days
+        are split into rolling windows of `train_days` followed by `test_days`,
+        advancing `step_days` (default `test_days`) at a time. On each train
+        window the best of a shared set of sampled configurations (plus the
+        base params) is picked by `objective`, then backtested on the test
+        window that follows.
+
+        Every (configuration, day) pair is evaluated at most once, one pool
+        task per day, so overlapping train windows and test days already seen
+        in training are served from the cache.
+
+        Returns per-window picks with train and test metrics, and the
+        out-of-sample metrics of all test windows chained together.
+        """
+        from strategy_backtester import strategy_backtester
+
+        base_params = strategy_backtester.default_params.copy()
+        base_params.update(params or {})
+        strategy_backtester._validate_params(base_params)
+
+        step_days = step_days or test_days
+        space = self._resolve_space(search_space)
+        self._validate_options(direction, num_configs, 2, 1, 1, objective)
+        if train_days < 1 or test_days < 1 or step_days < 1:
+            raise ValueError("Invalid parameters: train_days, test_days and step_days must be at least 1")
+
+        trading_days = strategy_backtester._get_trading_days(start_date, end_date)
+        if len(trading_days) < train_days + test_days:
+            raise ValueError(
+                f"Invalid parameters: date range has {len(trading_days)} trading days, "
+                f"need at least train_days + test_days = {train_days + test_days}"
+            )
+
+        windows = [
+            (trading_days[i:i + train_days], trading_days[i + train_days:i + train_days + test_days])
+            for i in range(0, len(trading_days) - train_days - test_days + 1, step_days)
+        ]
+        # The unmodified params compete as config 0
+        candidates = [base_params] + self._sample_candidates(base_params, space, num_configs, seed)
+
+        cache = {}
+        max_workers = max(1, min(Config.BACKTEST_MAX_WORKERS, len(trading_days)))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                # Train: every candidate on every day covered by some train window
+                train_span = sorted({day for train, _ in windows for day in train})
+                self._evaluate_days(executor, cache, candidates, range(len(candidates)), train_span,
+                                    direction, symbol, 'train', progress_callback)
+
+                picks = []
+                for train, test in windows:
+                    scores = [self._window_metrics(base_params, cache, i, train) for i in range(len(candidates))]
+                    best = max(range(len(candidates)), key=lambda i: scores[i][objective])
+                    picks.append((best, scores[best]))
+
+                # Test: picked configs on their test days, reusing anything evaluated in training
+                for (train, test), (best, _) in zip(windows, picks):
+                    self._evaluate_days(executor, cache, candidates, [best], test,
+                                        direction, symbol, 'test', progress_callback)
+            except BaseException:
+                # Don't wait on queued days if one failed or the caller aborted
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        results = []
+        out_of_sample = []
+        for (train, test), (best, train_metrics) in zip(windows, picks):
+            out_of_sample.extend(cache[(best, day)] for day in test)
+            results.append({
+                'train_start': train[0],
+                'train_end': train[-1],
+                'test_start': test[0],
+                'test_end': test[-1],
+                'config_id': best,
+                'params': {key: candidates[best][key] for key in space},
+                'train': train_metrics,
+                'test': self._window_metrics(base_params, cache, best, test)
+            })
+
+        oos_metrics = self._log_metrics(base_params, out_of_sample)
+        train_per_day = np.mean([w['train']['return_percent'] / train_days for w in results])
+        test_per_day = np.mean([w['test']['return_percent'] / test_days for w in results])
+
+        return {
+            'direction': direction,
+            'symbol': symbol,
+            'objective': objective,
+            'start_date': trading_days[0],
+            'end_date': trading_days[-1],
+            'train_days': train_days,
+            'test_days': test_days,
+            'step_days': step_days,
+            'base_params': base_params,
+            'search_space': {key: list(value) for key, value in space.items()},
+            'configs_evaluated': len(candidates),
+            'evaluations': len(cache),
+            'windows': results,
+            'out_of_sample': oos_metrics,
+            # Out-of-sample vs. in-sample return per day; well below 1 means the picks overfit
+            'walk_forward_efficiency': round(float(test_per_day / train_per_day), 2) if train_per_day > 0 else None,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def _evaluate_days(self, executor, cache, candidates, config_ids, days, direction, symbol, stage,
+                       progress_callback):
+        """Fill cache[(config_id, day)] with trade logs, one pool task per day for the missing pairs"""
+        pending = {}
+        for day in days:
+            missing = [i for i in config_ids if (i, day) not in cache]
+            if missing:
+                pending[day] = missing
+        futures = {
+            executor.submit(_evaluate_day, [candidates[i] for i in missing], direction, day, symbol): day
+            for day, missing in pending.items()
+        }
+
+        for completed, future in enumerate(as_completed(futures), 1):
+            day = futures[future]
+            for config_id, trade_log in zip(pending[day], future.result()):
+                cache[(config_id, day)] = trade_log
+
+            if progress_callback:
+                progress_callback({
+                    'stage': stage,
+                    'date': day,
+                    'completed': completed,
+                    'total': len(futures),
+                    'evaluations': len(cache)
+                })
+
+    def _window_metrics(self, base_params, cache, config_id, days):
+        """Metrics of one configuration over a window of cached days"""
+        return self._log_metrics(base_params, [cache[(config_id, day)] for day in days])
+
+    def _log_metrics(self, base_params, trade_logs):
+        """Reported metrics for trade logs chained in order"""
+        accumulator = MetricsAccumulator(base_params['initial_capital'])
+        for trade_log in trade_logs:
+            accumulator.update_batch(trade_log['profit'], trade_log['percent_return'].astype(float),
+                                     trade_log['is_win'])
+        return _reported_metrics(accumulator)
+
+    def _sample_candidates(self, base_params, space, num_configs, seed):
+        """Sampled configurations merged onto base_params, dropping any that fail validation"""
+        from strategy_backtester import strategy_backtester
+
+        rng = np.random.default_rng(seed)
+        candidates = []
+        for _ in range(num_configs):
+            candidate = base_params.copy()
+            candidate.update(self._sample_config(space, rng))
+            try:
+                strategy_backtester._validate_params(candidate)
+            except ValueError:
+                # Sampled combination is inconsistent with the fixed params (e.g. base overrides); skip it
+                continue
+            candidates.append(candidate)
+        if not candidates:
+            raise ValueError("Invalid parameters: no valid configurations in the search space")
+        return candidates
+
+    def _resolve_space(self, search_space):
+        """Default search space, narrowed or extended by user-supplied entries"""
+        space = dict(SEARCH_SPACE)
+        if not isinstance(search_space or {}, dict):
+            raise ValueError("Invalid parameters: search_space must be an object")
+        for key, value in (search_space or {}).items():
+            if key not in SEARCH_SPACE:
+                raise ValueError(f"Invalid parameters: '{key}' is not a searchable parameter")
+            if not isinstance(value, (list, tuple)):
+                raise ValueError(f"Invalid parameters: '{key}' must be a list")
+            if isinstance(SEARCH_SPACE[key], tuple):
+                if (len(value) != 2 or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+                        or value[0] > value[1]):
+                    raise ValueError(f"Invalid parameters: '{key}' range must be [low, high]")
+                space[key] = (value[0], value[1])
+            else:
+                if not value:
+                    raise ValueError(f"Invalid parameters: '{key}' needs at least one choice")
+                space[key] = list(value)
+        return space
+
+    def _validate_options(self, direction, num_configs, eta, min_days, max_days, objective):
+        """Validate search settings"""
+        errors = []
+
+        if direction not in ('puts', 'calls'):
+            errors.append("Direction must be 'puts' or 'calls'")
+        if num_configs < 1 or num_configs > Config.OPTIMIZER_MAX_CONFIGS:
+            errors.append(f"Number of configurations must be between 1 and {Config.OPTIMIZER_MAX_CONFIGS}")
+        if eta < 2:
+            errors.append("Halving rate (eta) must be at least 2")
+        if min_days < 1 or max_days < min_days:
+            errors.append("Day budgets must satisfy 1 <= min_days <= max_days")
+        if max_days > Config.BACKTEST_MAX_RANGE_DAYS:
+            errors.append(f"max_days cannot exceed {Config.BACKTEST_MAX_RANGE_DAYS} trading days")
+        if objective not in OBJECTIVES:
+            errors.append(f"Objective must be one of: {', '.join(OBJECTIVES)}")
+
+        if errors:
+            raise ValueError("Invalid parameters: " + "; ".join(errors))
+
+    def _budgets(self, eta, min_days, max_days):
+        """Window length (trading days) per rung: min_days * eta^k, ending at max_days"""
+        rungs = int(math.floor(math.log(max_days / min_days, eta) + 1e-9)) + 1
+        budgets = [min(max_days, min_days * eta ** k) for k in range(rungs)]
+        if budgets[-1] < max_days:
+            budgets.append(max_days)
+        return budgets
+
+    def _sample_config(self, space, rng):
+        """Draw one configuration uniformly from the search space"""
+        config = {}
+        for key, bounds in space.items():
+            if isinstance(bounds, tuple):
+                if key in INTEGER_PARAMS:
+                    config[key] = int(rng.integers(bounds[0], bounds[1] + 1))
+                else:
+                    config[key] = round(float(rng.uniform(bounds[0], bounds[1])), 2)
+            else:
+                config[key] = bounds[int(rng.integers(len(bounds)))]
+        return config
+
+    def _promote(self, scores, objective, eta):
+        """Top 1/eta of a rung by objective, plus its return/drawdown Pareto front"""
+        config_ids = sorted(scores, key=lambda i: scores[i][objective], reverse=True)
+        keep = set(config_ids[:max(1, math.ceil(len(config_ids) / eta))])
+        front = pareto_front([scores[i]['return_percent'] for i in config_ids],
+                             [scores[i]['max_drawdown'] for i in config_ids])
+        keep.update(config_ids[i] for i in front)
+        return sorted(keep)
+
+    def _last_trading_day(self):
+        """Most recent weekday before today"""
+        day = datetime.now() - timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day.strftime('%Y-%m-%d')
+
+    def _trailing_trading_days(self, end_date, count):
+        """The `count` weekdays ending at end_date (inclusive), oldest first"""
+        day = datetime.strptime(end_date, '%Y-%m-%d')
+        days = []
+        while len(days) < count:
+            if day.weekday() < 5:
+                days.append(day.strftime('%Y-%m-%d'))
+            day -= timedelta(days=1)
+        return days[::-1]
+
+
+# Singleton instance
+strategy_optimizer = StrategyOptimizer()
@@ -0,0 +1,106 @@
+"""
+Per-Minute Strike Flow
+Running call/put volume per (minute, strike) for one trading session, folded
+from row chunks as they are parsed, so a day's rows never have to be held at
+once. Cumulative sums over the minutes give the strike flow as of any minute
+end (see HistoricalReplayLoader.create_snapshots).
+"""
+from typing import Dict, Iterable
+
+import numpy as np
+
+from occ_symbols import intern_tickers
+
+
+NS_PER_MINUTE = 60 * 10**9
+INITIAL_STRIKES = 64
+
+
+class StrikeFlowAggregator:
+    """
+    Folds rows into per-minute, per-strike volume for a session of `minutes`
+    minutes. Bin k holds bars starting after minute end k-1 up to minute end
+    k (inclusive), so the cumulative sum through bin k covers every bar that
+    started at or before `session_open + k minutes`; earlier bars fall in
+    bin 0 and bars after the close are dropped.
+    """
+
+    def __init__(self, session_open_ns: int, minutes: int):
+        self.session_open_ns = session_open_ns
+        self.bins = minutes + 1
+        self.rows = 0
+        self._strike_index: Dict[float, int] = {}
+        # Columns are allocated ahead and doubled when full, so new strikes rarely copy
+        self._volume = np.zeros((self.bins, 2, INITIAL_STRIKES))  # (bin, call/put, strike)
+        self._bars = np.zeros((self.bins, INITIAL_STRIKES), dtype=np.int64)
+
+    def add_tickers(self, columns: Dict[str, np.ndarray]):
+        """Fold parsed flat-file rows ('ticker', 'window_start', 'volume'); strikes are parsed per unique ticker"""
+        if len(columns['ticker']) == 0:
+            return
+        contract, contracts = intern_tickers(columns['ticker'])
+        self.add(columns['window_start'], contracts['strike'][contract], contracts['type'][contract] == b'P',
+                 columns['volume'])
+
+    def add(self, window_start: np.ndarray, strike: np.ndarray, is_put: np.ndarray, volume: np.ndarray):
+        """Fold a chunk of rows given as parallel arrays"""
+        # Ceiling of minutes after the open: a bar starting exactly on a minute end counts toward it
+        minute = -((self.session_open_ns - np.asarray(window_start, dtype=np.int64)) // NS_PER_MINUTE)
+        keep = minute < self.bins
+        minute = np.maximum(minute[keep], 0)
+        if len(minute) == 0:
+            return
+        strike = np.asarray(strike)[keep]
+        is_put = np.asarray(is_put)[keep].astype(np.int64)
+        volume = np.asarray(volume, dtype=np.float64)[keep]
+
+        unique_strikes, strike_of_row = np.unique(strike, return_inverse=True)
+        columns = np.array([self._column(value) for value in unique_strikes.tolist()])[strike_of_row.ravel()]
+
+        # Sum the chunk per touched cell, then add only those cells to the running arrays
+        capacity = self._bars.shape[1]
+        cells, cell_of_row = np.unique((minute * 2 + is_put) * capacity + columns, return_inverse=True)
+        cell_of_row = cell_of_row.ravel()
+        self._volume.reshape(-1)[cells] += np.bincount(cell_of_row, weights=volume)
+        bar_cells, bars = np.unique(minute * capacity + columns, return_counts=True)
+        self._bars.reshape(-1)[bar_cells] += bars
+        self.rows += len(minute)
+
+    def _column(self, strike: float) -> int:
+        """Column of a strike, assigning the next free one the first time it is seen"""
+        index = self._strike_index.get(strike)
+        if index is None:
+            index = self._strike_index[strike] = len(self._strike_index)
+            capacity = self._bars.shape[1]
+            if index == capacity:
+                self._volume = np.concatenate([self._volume, np.zeros((self.bins, 2, capacity))], axis=2)
+                self._bars = np.concatenate([self._bars, np.zeros((self.bins, capacity), dtype=np.int64)], axis=1)
+        return index
+
+    def result(self) -> Dict[str, np.ndarray]:
+        """
+        Per-minute flow with strikes ascending: 'call_volume', 'put_volume'
+        and 'bars' (row count) are (minutes + 1, strikes) arrays
+        """
+        strikes = np.array(list(self._strike_index), dtype=np.float64)
+        order = np.argsort(strikes)
+        return {
+            'strikes': strikes[order],
+            'call_volume': self._volume[:, 0, order],
+            'put_volume': self._volume[:, 1, order],
+            'bars': self._bars[:, order]
+        }
+
+
+def cumulative_flow(minute_flow: Dict[str, np.ndarray], minute_ends: Iterable[int]) -> Dict[str, np.ndarray]:
+    """
+    Cumulative per-strike call/put volume as of each minute end (minutes
+    after the open), plus which strikes had any bar by then
+    """
+    minute_ends = np.asarray(list(minute_ends), dtype=np.int64)
+    return {
+        'strikes': minute_flow['strikes'],
+        'call_volume': minute_flow['call_volume'].cumsum(axis=0)[minute_ends],
+        'put_volume': minute_flow['put_volume'].cumsum(axis=0)[minute_ends],
+        'seen': minute_flow['bars'].cumsum(axis=0)[minute_ends] > 0
+    }
@@ -0,0 +1,297 @@
+"""
+Bulk Synthetic History Builder
+Generates years of minute-level options flow for many symbols at once. Daily
+regimes follow a Markov chain (each day's transition drawn from a generator
+seeded by that day), days are generated on a process pool, and the output is
+written as columnar .npy partitions (one directory per symbol and month)
+described by a manifest, so other components can memory-map any slice.
+
+Usage:
+    python synthetic_history.py --out /data/history --start 2021-01-01 --end 2025-12-31 \\
+        --symbols SPY QQQ AAPL TSLA --seed 7
+    python synthetic_history.py --out /data/history --start 2025-01-01 --end 2025-12-31 --num-symbols 50
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from historical_scenario_generator import (
+    FRAME_COLUMNS, GENERATOR_VERSION, INTRADAY_PATTERNS, MINUTES_PER_SESSION, SPIKE_FREQUENCIES,
+    SPIKE_FREQUENCY_WEIGHTS, historical_generator
+)
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+REGIMES = ['bull_run', 'bear_market', 'high_vol', 'low_vol', 'choppy']
+
+# Day-to-day regime transition probabilities (rows: today, columns: tomorrow)
+REGIME_TRANSITIONS = np.array([
+    [0.85, 0.03, 0.03, 0.05, 0.04],  # bull_run
+    [0.04, 0.80, 0.10, 0.01, 0.05],  # bear_market
+    [0.05, 0.15, 0.65, 0.03, 0.12],  # high_vol
+    [0.10, 0.02, 0.03, 0.80, 0.05],  # low_vol
+    [0.12, 0.08, 0.08, 0.07, 0.65],  # choppy
+])
+
+# Per-day columns stored alongside the (days x minutes) minute columns
+DAY_COLUMNS = ('date', 'regime')
+
+# Minute columns written to disk; minute / timestamp are rebuilt from the date on read
+MINUTE_COLUMNS = tuple(c for c in FRAME_COLUMNS if c not in ('minute', 'timestamp'))
+
+
+def trading_days(start_date: str, end_date: str) -> List[str]:
+    """Weekdays between two YYYY-MM-DD dates (inclusive)"""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    if end < start:
+        raise ValueError("Invalid parameters: end_date must not be before start_date")
+    days = np.arange(np.datetime64(start.date()), np.datetime64(end.date() + timedelta(days=1)))
+    return days[np.is_busday(days)].astype(str).tolist()
+
+
+def regime_chain(days: List[str], seed: int) -> np.ndarray:
+    """
+    Regime index per day. The first day is drawn from the chain's stationary
+    distribution; each later day's transition uses a generator seeded by
+    (seed, day), so any day's draw is reproducible on its own.
+    """
+    stationary = np.linalg.matrix_power(REGIME_TRANSITIONS, 256)[0]
+    cumulative = np.cumsum(REGIME_TRANSITIONS, axis=1)
+    ordinals = np.array(days, dtype='datetime64[D]').astype(np.int64)
+
+    regimes = np.empty(len(days), dtype=np.int8)
+    for i, ordinal in enumerate(ordinals):
+        draw = np.random.default_rng([seed, int(ordinal)]).random()
+        row = np.cumsum(stationary) if i == 0 else cumulative[regimes[i - 1]]
+        regimes[i] = min(int(np.searchsorted(row, draw, side='right')), len(REGIMES) - 1)
+    return regimes
+
+
+def day_scenario(date_str: str, regime: int, seed: int) -> Dict:
+    """Scenario for one day of a built history: chain regime plus per-day pattern and spike frequency"""
+    ordinal = int(np.datetime64(date_str, 'D').astype(np.int64))
+    rng = np.random.default_rng([seed, ordinal, 1])
+    regime_name = REGIMES[regime]
+    return {
+        'regime': regime_name,
+        'event': 'Regular Trading',
+        'intraday_pattern': INTRADAY_PATTERNS[rng.integers(len(INTRADAY_PATTERNS))],
+        'vol_spike_frequency': SPIKE_FREQUENCIES[rng.choice(len(SPIKE_FREQUENCIES), p=SPIKE_FREQUENCY_WEIGHTS)],
+        **historical_generator.market_regimes[regime_name],
+        'date': date_str,
+        'seed': int(rng.integers(2**31))
+    }
+
+
+def _partition_dir(symbol: str, month: str) -> str:
+    """Relative directory of one partition"""
+    return os.path.join(f"symbol={symbol}", f"month={month}")
+
+
+def _build_partition(out_dir: str, symbol: str, month: str, days: List[str], regimes: List[int],
+                     seed: int) -> Dict:
+    """Process pool entry point: generate one symbol-month and write its columns"""
+    columns = [historical_generator.generate_columns(day, symbol, day_scenario(day, regime, seed))
+               for day, regime in zip(days, regimes)]
+
+    relative = _partition_dir(symbol, month)
+    target = os.path.join(out_dir, relative)
+    tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp)
+    try:
+        np.save(os.path.join(tmp, 'date.npy'), np.array(days, dtype='datetime64[D]'))
+        np.save(os.path.join(tmp, 'regime.npy'), np.array(regimes, dtype=np.int8))
+        for column in MINUTE_COLUMNS:
+            np.save(os.path.join(tmp, f"{column}.npy"), np.stack([c[column] for c in columns]))
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.rename(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    return {
+        'symbol': symbol,
+        'month': month,
+        'path': relative,
+        'days': len(days),
+        'start_date': days[0],
+        'end_date': days[-1]
+    }
+
+
+def build_history(out_dir: str, start_date: str, end_date: str, symbols: List[str] = None, seed: int = 0,
+                  max_workers: int = None, overwrite: bool = False, progress_callback=None) -> Dict:
+    """
+    Build N trading days x M symbols of synthetic minute data under `out_dir`.
+    Regimes are shared across symbols for a given day (market-wide), while
+    each symbol's minute flow is drawn independently. Returns the manifest.
+    """
+    symbols = list(symbols or Config.SYMBOLS)
+    if len(set(symbols)) != len(symbols):
+        raise ValueError("Invalid parameters: duplicate symbols")
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path) and not overwrite:
+        raise ValueError(f"{out_dir} already contains a history; pass overwrite=True to rebuild it")
+
+    days = trading_days(start_date, end_date)
+    if not days:
+        raise ValueError("Invalid parameters: date range contains no trading days")
+    regimes = regime_chain(days, seed)
+
+    # One partition per (symbol, month)
+    months = {}
+    for day, regime in zip(days, regimes.tolist()):
+        months.setdefault(day[:7], ([], []))
+        months[day[:7]][0].append(day)
+        months[day[:7]][1].append(regime)
+
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    partitions = []
+    total = len(symbols) * len(months)
+    max_workers = max(1, min(max_workers or Config.BACKTEST_MAX_WORKERS, total))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_build_partition, out_dir, symbol, month, month_days, month_regimes, seed)
+            for symbol in symbols
+            for month, (month_days, month_regimes) in months.items()
+        ]
+        try:
+            for future in as_completed(futures):
+                partitions.append(future.result())
+                if progress_callback:
+                    progress_callback({'completed': len(partitions), 'total': total,
+                                       'symbol': partitions[-1]['symbol'], 'month': partitions[-1]['month']})
+        except BaseException:
+            # Don't wait on the remaining partitions if one failed or the caller aborted
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    partitions.sort(key=lambda p: (symbols.index(p['symbol']), p['month']))
+    sample = historical_generator.generate_columns(days[0], symbols[0], day_scenario(days[0], int(regimes[0]), seed))
+    manifest = {
+        'manifest_version': MANIFEST_VERSION,
+        'generator_version': GENERATOR_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'seed': seed,
+        'start_date': days[0],
+        'end_date': days[-1],
+        'trading_days': len(days),
+        'minutes_per_session': MINUTES_PER_SESSION,
+        'symbols': symbols,
+        'regimes': REGIMES,
+        'regime_transitions': REGIME_TRANSITIONS.tolist(),
+        # Minute columns are (days, minutes) arrays; day columns are (days,)
+        'columns': {column: str(sample[column].dtype) for column in MINUTE_COLUMNS},
+        'day_columns': {'date': 'datetime64[D]', 'regime': 'int8'},
+        'partitions': partitions,
+        'build_seconds': round(time.perf_counter() - started, 3)
+    }
+
+    tmp_manifest = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, manifest_path)
+    return manifest
+
+
+class SyntheticHistory:
+    """Read access to a built history; every column is memory-mapped on demand"""
+
+    def __init__(self, root: str):
+        self.root = root
+        with open(os.path.join(root, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        if self.manifest['manifest_version'] != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported history manifest version {self.manifest['manifest_version']}")
+        self._partitions = {(p['symbol'], p['month']): p for p in self.manifest['partitions']}
+
+    @property
+    def symbols(self) -> List[str]:
+        return self.manifest['symbols']
+
+    def months(self, symbol: str) -> List[str]:
+        """Partition months available for a symbol, oldest first"""
+        return sorted(month for s, month in self._partitions if s == symbol)
+
+    def open_partition(self, symbol: str, month: str) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-mapped columns of one symbol-month, or None if it was not built"""
+        partition = self._partitions.get((symbol, month))
+        if partition is None:
+            return None
+        path = os.path.join(self.root, partition['path'])
+        return {
+            column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r')
+            for column in DAY_COLUMNS + MINUTE_COLUMNS
+        }
+
+    def day(self, symbol: str, date_str: str) -> Optional[Dict[str, np.ndarray]]:
+        """One day's minute columns (views into the mapped partition), or None"""
+        partition = self.open_partition(symbol, date_str[:7])
+        if partition is None:
+            return None
+        index = int(np.searchsorted(partition['date'], np.datetime64(date_str, 'D')))
+        if index >= len(partition['date']) or partition['date'][index] != np.datetime64(date_str, 'D'):
+            return None
+        minute = np.arange(self.manifest['minutes_per_session'])
+        return {
+            'symbol': symbol,
+            'date': date_str,
+            'regime': REGIMES[partition['regime'][index]],
+            'minute': minute,
+            'timestamp': np.datetime64(f"{date_str}T09:30", 's') + minute * np.timedelta64(60, 's'),
+            **{column: partition[column][index] for column in MINUTE_COLUMNS}
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build bulk synthetic options flow history')
+    parser.add_argument('--out', required=True, help='output directory')
+    parser.add_argument('--start', required=True, help='first date (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, help='last date (YYYY-MM-DD)')
+    symbols = parser.add_mutually_exclusive_group()
+    symbols.add_argument('--symbols', nargs='+', help='symbols to generate (default: Config.SYMBOLS)')
+    symbols.add_argument('--num-symbols', type=int, help='generate SYM000..SYMnnn placeholder symbols')
+    parser.add_argument('--seed', type=int, default=0, help='regime chain / scenario seed')
+    parser.add_argument('--workers', type=int, help='worker processes (default: BACKTEST_MAX_WORKERS)')
+    parser.add_argument('--overwrite', action='store_true', help='replace an existing history')
+    args = parser.parse_args(argv)
+
+    symbol_list = args.symbols
+    if args.num_symbols:
+        symbol_list = [f"SYM{i:03d}" for i in range(args.num_symbols)]
+
+    def report(progress):
+        if progress['completed'] % 50 == 0 or progress['completed'] == progress['total']:
+            print(f"   {progress['completed']}/{progress['total']} partitions")
+
+    try:
+        manifest = build_history(args.out, args.start, args.end, symbol_list, seed=args.seed,
+                                 max_workers=args.workers, overwrite=args.overwrite, progress_callback=report)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    symbol_days = manifest['trading_days'] * len(manifest['symbols'])
+    print(f"\n✓ {manifest['trading_days']} days x {len(manifest['symbols'])} symbols "
+          f"({symbol_days:,} symbol-days, {symbol_days * MINUTES_PER_SESSION:,} minutes) "
+          f"in {manifest['build_seconds']}s -> {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Test the background backtest job queue (offline, scenario generator only)"""
+import time
+from contextlib import contextmanager
+
+from backtest_jobs import BacktestJobManager
+
+
+@contextmanager
+def job_manager():
+    """A job manager with its own worker pool, shut down afterwards"""
+    manager = BacktestJobManager(max_workers=2)
+    try:
+        yield manager
+    finally:
+        manager.shutdown()
+
+
+def wait_for(manager, job_id, timeout=120):
+    deadline = time.time() + timeout
+    job = manager.get_status(job_id)
+    while job['status'] in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.1)
+        job = manager.get_status(job_id)
+    return job
+
+
+def test_run_job():
+    with job_manager() as manager:
+        job = manager.submit('run', {'num_trades': 200}, {'date': '2025-12-18'}, sid='test-sid')
+        assert job['status'] in ('queued', 'running'), job['status']
+
+        job = wait_for(manager, job['job_id'])
+        assert job['status'] == 'completed', job
+        assert job['result']['total_trades'] > 0
+
+        events = manager.drain_events()
+        names = [name for name, _, _ in events]
+        assert 'backtest_job_progress' in names, names
+        assert 'backtest_job_completed' in names, names
+        assert all(sid == 'test-sid' for _, _, sid in events)
+        print(f"✓ Run job completed: {job['result']['total_trades']} trades, {len(events)} events")
+
+
+def test_failed_job():
+    with job_manager() as manager:
+        job = manager.submit('run', {'num_trades': -1})
+        job = wait_for(manager, job['job_id'])
+        assert job['status'] == 'failed'
+        assert job['error_type'] == 'ValueError'
+        print(f"✓ Invalid params reported: {job['error']}")
+
+
+def test_cancel_job():
+    with job_manager() as manager:
+        job = manager.submit('range', {'num_trades': 2000},
+                             {'start_date': '2025-01-01', 'end_date': '2025-12-19'})
+        # Cancel once the first day has reported, so the job is running with days still to go
+        deadline = time.time() + 120
+        while manager.get_status(job['job_id'])['progress'] is None and time.time() < deadline:
+            time.sleep(0.01)
+        progress = manager.get_status(job['job_id'])['progress']
+        assert progress is not None and progress['completed'] < progress['total'], progress
+        manager.cancel(job['job_id'])
+        job = wait_for(manager, job['job_id'])
+        assert job['status'] == 'cancelled', job['status']
+        assert job['progress']['completed'] < job['progress']['total']
+        print(f"✓ Range job cancelled after {job['progress']['completed']} of {job['progress']['total']} days")
+
+
+if __name__ == '__main__':
+    test_run_job()
+    test_failed_job()
+    test_cancel_job()
+    print("\n✓ All tests completed successfully!")
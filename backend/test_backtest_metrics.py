@@ -0,0 +1,67 @@
+"""Test the streaming metrics accumulator against whole-array calculations"""
+import numpy as np
+
+from backtest_metrics import MetricsAccumulator
+
+
+def _reference_metrics(initial_capital, profit, percent_return, is_win):
+    """Metrics computed over the full trade arrays at once"""
+    capital = initial_capital + np.cumsum(profit)
+    peak = np.maximum.accumulate(np.concatenate(([initial_capital], capital)))[1:]
+    returns = percent_return * 100
+    
+    streaks = {True: 0, False: 0}
+    run, previous = 0, None
+    for win in is_win:
+        run = run + 1 if win == previous else 1
+        previous = win
+        streaks[bool(win)] = max(streaks[bool(win)], run)
+    
+    return {
+        'wins': int(is_win.sum()),
+        'final_capital': round(float(capital[-1]), 2),
+        'avg_win': round(float(profit[is_win].mean()), 2),
+        'avg_loss': round(float(profit[~is_win].mean()), 2),
+        'profit_factor': round(float(abs(profit[is_win].sum() / profit[~is_win].sum())), 2),
+        'max_drawdown': round(float(((peak - capital) / peak * 100).max()), 2),
+        'sharpe_ratio': round(float(returns.mean() / returns.std() * np.sqrt(252)), 2),
+        'max_consecutive_wins': streaks[True],
+        'max_consecutive_losses': streaks[False],
+    }
+
+
+def test_matches_full_arrays():
+    rng = np.random.default_rng(5)
+    percent_return = rng.normal(0.02, 0.3, 5000)
+    profit = 100 * percent_return
+    is_win = percent_return > 0
+    expected = _reference_metrics(10000, profit, percent_return, is_win)
+    
+    # One trade at a time
+    single = MetricsAccumulator(10000)
+    for i in range(len(profit)):
+        single.update_batch(profit[i:i + 1], percent_return[i:i + 1], is_win[i:i + 1])
+    
+    # Uneven batches (one empty), so streaks and drawdown peaks cross batch boundaries
+    batched = MetricsAccumulator(10000)
+    for chunk in np.array_split(np.arange(5000), [1, 7, 7, 300, 301, 2500]):
+        batched.update_batch(profit[chunk], percent_return[chunk], is_win[chunk])
+    
+    for accumulator in (single, batched):
+        metrics = accumulator.metrics()
+        for key, value in expected.items():
+            assert metrics[key] == value, (key, metrics[key], value)
+    assert single.metrics() == batched.metrics()
+    assert single.streak == batched.streak and np.isclose(single.peak_capital, batched.peak_capital)
+    print(f"✓ Streaming metrics match: {batched.metrics()}")
+
+
+def test_empty():
+    metrics = MetricsAccumulator(10000).metrics()
+    assert metrics['win_rate'] == 0 and metrics['sharpe_ratio'] == 0 and metrics['final_capital'] == 10000
+
+
+if __name__ == '__main__':
+    test_matches_full_arrays()
+    test_empty()
+    print("\n✓ All tests completed successfully!")
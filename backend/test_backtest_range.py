@@ -0,0 +1,68 @@
+"""Test multi-day date-range backtests (offline, scenario generator only)"""
+from strategy_backtester import StrategyBacktester
+
+
+def test_backtest_range():
+    bt = StrategyBacktester()
+    progress = []
+    
+    result = bt.run_backtest_range(
+        {'num_trades': 50},
+        start_date='2025-12-15',
+        end_date='2025-12-26',
+        progress_callback=progress.append
+    )
+    
+    # 10 weekdays in range
+    assert result['days'] == 10, result['days']
+    assert len(progress) == 10
+    assert progress[-1]['completed'] == 10
+    assert [d['date'] for d in result['equity_curve']] == sorted(d['date'] for d in result['equity_curve'])
+    
+    day_trades = sum(d['total_trades'] for d in result['daily_results'])
+    assert result['total_trades'] == day_trades
+    assert abs(result['equity_curve'][-1]['capital'] - result['final_capital']) < 0.05
+    assert 'trade_profits' not in result['daily_results'][0]
+    
+    print(f"Days: {result['days']}, Trades: {result['total_trades']}, "
+          f"Return: {result['return_percent']}%, Max DD: {result['max_drawdown']}%")
+
+
+def test_single_day_progress():
+    bt = StrategyBacktester()
+    progress = []
+    result = bt.run_backtest({'num_trades': 50}, date='2025-12-18', progress_callback=progress.append)
+    assert [p['stage'] for p in progress] == ['frame', 'evaluate']
+    assert progress[-1]['trades'] == result['total_trades'] and progress[-1]['minutes'] == 390
+    
+    # A callback raising at the frame stage (a cancelled job) stops before evaluation
+    class Stop(Exception):
+        pass
+    
+    def cancel(update):
+        raise Stop(update['stage'])
+    
+    try:
+        bt.run_backtest({'num_trades': 50}, date='2025-12-18', progress_callback=cancel)
+    except Stop as e:
+        assert str(e) == 'frame'
+    else:
+        raise AssertionError("Expected the frame-stage checkpoint to stop the run")
+    print(f"✓ Single-day progress stages: {[p['stage'] for p in progress]}")
+
+
+def test_invalid_range():
+    bt = StrategyBacktester()
+    try:
+        bt.run_backtest_range(start_date='2025-12-27', end_date='2025-12-28')
+    except ValueError as e:
+        print(f"✓ Weekend-only range rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError for range without trading days")
+
+
+if __name__ == '__main__':
+    test_backtest_range()
+    test_single_day_progress()
+    test_invalid_range()
+    print("\n✓ All tests completed successfully!")
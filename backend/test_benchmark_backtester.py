@@ -0,0 +1,37 @@
+"""Smoke test the backtester benchmark CLI and its JSON report"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmark_backtester import BENCHMARK_DATE, compare_to_baseline
+from historical_scenario_generator import MINUTES_PER_SESSION
+
+
+def test_benchmark_cli():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'bench.json')
+        subprocess.check_call([sys.executable, 'benchmark_backtester.py', '--sizes', '50', '--repeat', '1',
+                               '--output', output], cwd=os.path.dirname(__file__) or '.')
+        with open(output) as f:
+            report = json.load(f)
+
+    assert {'generated_at', 'python', 'numpy', 'platform', 'cpu_count', 'results'} <= set(report)
+    cases = [(r['name'], r['num_trades'], r['date']) for r in report['results']]
+    # Sizes only vary undated runs; the dated day is benchmarked once
+    assert cases == [('run_backtest', 50, None), ('compare_strategies', 50, None),
+                     ('run_backtest', MINUTES_PER_SESSION, BENCHMARK_DATE),
+                     ('compare_strategies', MINUTES_PER_SESSION, BENCHMARK_DATE)]
+    for result in report['results']:
+        assert result['repeat'] == 1
+        assert 0 < result['min_seconds'] <= result['mean_seconds']
+        assert result['ops_per_sec'] > 0 and result['peak_memory_mb'] > 0
+
+    assert compare_to_baseline(report, report) == []
+    print(f"✓ Benchmarked {len(cases)} cases")
+
+
+if __name__ == '__main__':
+    test_benchmark_cli()
+    print("\n✓ All tests completed successfully!")
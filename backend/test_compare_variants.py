@@ -0,0 +1,40 @@
+"""Test compare_strategies with user-defined variants over a shared signal frame"""
+from strategy_backtester import StrategyBacktester
+
+
+def test_compare_with_variants():
+    bt = StrategyBacktester()
+    variants = [
+        {'name': 'tight_puts', 'direction': 'puts', 'params': {'put_call_threshold': 1.4}},
+        {'name': 'iv_only_calls', 'direction': 'calls',
+         'params': {'use_volume_spike': False, 'use_multi_timeframe': False}},
+    ]
+    
+    result = bt.compare_strategies({'num_trades': 500}, date='2025-12-18', variants=variants)
+    
+    assert set(result['variants']) == {'tight_puts', 'iv_only_calls'}
+    # Same frame: a stricter threshold can only remove entries
+    assert result['variants']['tight_puts']['total_trades'] <= result['advanced_puts']['total_trades']
+    # Basic puts has no filters, so it sees at least as many entries as advanced puts
+    assert result['basic_puts']['total_trades'] >= result['advanced_puts']['total_trades']
+    
+    for name, run in result['variants'].items():
+        print(f"{name}: {run['total_trades']} trades, win rate {run['win_rate']}%")
+
+
+def test_invalid_variants():
+    bt = StrategyBacktester()
+    for variants in ([{'name': 'basic_puts'}], [{'direction': 'straddle'}], [{'params': {'num_trades': 0}}],
+                     ['tight_puts'], [{'params': [1.2]}]):
+        try:
+            bt.compare_strategies(variants=variants)
+        except ValueError as e:
+            print(f"✓ Rejected: {e}")
+        else:
+            raise AssertionError(f"Expected ValueError for {variants}")
+
+
+if __name__ == '__main__':
+    test_compare_with_variants()
+    test_invalid_variants()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,55 @@
+"""Test bar-path exit simulation"""
+import numpy as np
+
+from exit_engine import simulate_exits, EXIT_TARGET, EXIT_STOP, EXIT_TIME
+
+
+def test_first_passage():
+    close = np.array([10.0, 10.5, 11.0, 12.5, 9.0, 4.0, 10.0])
+    high = close * 1.01
+    low = close * 0.99
+    entries = np.array([0, 3, 5, 6])
+    
+    exits = simulate_exits(entries, high, low, close, profit_target=0.20, stop_loss=-0.50, max_hold=3)
+    
+    # Entry 0 (10.0): high of bar 3 is 12.625 -> target on bar 3
+    assert exits['exit_reason'][0] == EXIT_TARGET and exits['exit_index'][0] == 3
+    assert exits['percent_return'][0] == 0.20
+    # Entry 3 (12.5): low of bar 5 is 3.96 -> stop on bar 5
+    assert exits['exit_reason'][1] == EXIT_STOP and exits['exit_index'][1] == 5
+    assert exits['percent_return'][1] == -0.50
+    # Entry 5 (4.0): bar 6 is +150% -> target
+    assert exits['exit_reason'][2] == EXIT_TARGET
+    # Entry 6 is the last bar: nothing to scan, flat time exit
+    assert exits['exit_reason'][3] == EXIT_TIME and exits['percent_return'][3] == 0
+    print("✓ First passage exits resolved")
+
+
+def test_time_exit_and_same_bar():
+    close = np.array([10.0, 10.1, 10.2, 10.3])
+    high = np.array([10.0, 13.0, 10.2, 10.3])
+    low = np.array([10.0, 4.0, 10.2, 10.3])
+    
+    exits = simulate_exits(np.array([0, 1]), high, low, close, 0.20, -0.50, max_hold=2)
+    # Both levels touched in bar 1: stop assumed first
+    assert exits['exit_reason'][0] == EXIT_STOP
+    # Entry 1 never reaches either level: exits at close of bar 3
+    assert exits['exit_reason'][1] == EXIT_TIME and exits['exit_index'][1] == 3
+    assert abs(exits['percent_return'][1] - (10.3 / 10.1 - 1)) < 1e-12
+    print("✓ Same-bar and time exits resolved")
+
+
+def test_many_entries():
+    rng = np.random.default_rng(1)
+    close = 5 * np.exp(np.cumsum(rng.normal(0, 0.02, 300000)))
+    entries = np.sort(rng.choice(len(close), 100000, replace=False))
+    exits = simulate_exits(entries, close * 1.01, close * 0.99, close, 0.2, -0.5, max_hold=60)
+    assert (exits['hold_minutes'] >= 0).all() and (exits['hold_minutes'] <= 60).all()
+    print(f"✓ 100k entries: {np.bincount(exits['exit_reason'], minlength=3)} target/stop/time")
+
+
+if __name__ == '__main__':
+    test_first_passage()
+    test_time_exit_and_same_bar()
+    test_many_entries()
+    print("\n✓ All tests completed successfully!")
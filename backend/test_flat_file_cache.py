@@ -0,0 +1,153 @@
+"""Test the columnar flat-file cache and its use by the replay loader"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from flat_file_cache import CACHE_COLUMNS, FlatFileCache, contract_columns
+from test_replay_backtest import OfflineReplayLoader
+
+
+def test_contract_columns():
+    rows = {
+        'ticker': np.array(['O:SPY251219P00590000', 'O:SPY260116C00612500', 'O:A251219C00100000']),
+        'window_start': np.array([30, 10, 20], dtype=np.int64),
+        'volume': np.array([1.0, 2.0, 3.0]),
+        **{field: np.array([1.0, 2.0, 3.0]) for field in ('open', 'high', 'low', 'close')}
+    }
+    columns = contract_columns(rows)
+    assert columns['window_start'].tolist() == [10, 20, 30]  # sorted
+    assert columns['strike'].tolist() == [612.5, 100.0, 590.0]
+    assert columns['type'].tolist() == [b'C', b'C', b'P']
+    assert columns['expiry'].astype(str).tolist() == ['2026-01-16', '2025-12-19', '2025-12-19']
+    assert columns['volume'].tolist() == [2.0, 3.0, 1.0]
+    assert columns['contracts'][columns['contract']].tolist() == \
+        ['O:SPY260116C00612500', 'O:A251219C00100000', 'O:SPY251219P00590000']
+    assert {c: columns[c].dtype for c in CACHE_COLUMNS} == CACHE_COLUMNS
+    
+    try:
+        contract_columns({**rows, 'ticker': np.array(['O:SPY2512X9P00590000'] * 3)})
+    except ValueError as e:
+        print(f"✓ Rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError for a malformed ticker")
+
+
+def test_loader_reuses_cached_day():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = OfflineReplayLoader(FlatFileCache(tmp))
+        first = loader.download_minute_data('2025-12-19', 'SPY')
+        assert loader.downloads == 1
+        assert np.all(np.diff(first['window_start']) >= 0)
+        
+        # A fresh loader (e.g. after a restart) maps the converted day instead of downloading
+        restarted = OfflineReplayLoader(FlatFileCache(tmp))
+        cached = restarted.download_minute_data('2025-12-19', 'SPY')
+        assert restarted.downloads == 0
+        assert isinstance(cached['volume'], np.memmap)
+        for column in CACHE_COLUMNS:
+            np.testing.assert_array_equal(cached[column], first[column])
+        
+        entry = restarted.cache.entry('2025-12-19', 'SPY')
+        assert entry['rows'] == len(first['window_start']) == 810
+        assert entry['strikes'] == 1 and entry['expiries'] == 1 and entry['contracts'] == 2
+        assert cached['contracts'].tolist() == ['O:SPY251227C00590000', 'O:SPY251227P00590000']
+        assert entry['source'].endswith('2025-12-19.csv.gz')
+        assert os.path.exists(os.path.join(tmp, 'manifest.json'))
+        
+        frame = restarted.load_minute_frame('2025-12-19', 'SPY')
+        assert frame['put_volume'].sum() > 0 and frame['call_volume'].sum() > 0
+        
+        snapshots = restarted.create_snapshots('2025-12-19', 'SPY')
+        assert snapshots[-1]['strikes'] == [{'strike': 590.0,
+                                             'call_volume': snapshots[-1]['calls']['total'],
+                                             'put_volume': snapshots[-1]['puts']['total']}]
+        
+        assert restarted.cache.remove('2025-12-19', 'SPY')
+        assert FlatFileCache(tmp).get('2025-12-19', 'SPY') is None
+        print(f"✓ Cached day reused: {entry['rows']} rows, {entry['bytes']:,} bytes")
+
+
+def test_one_pass_multi_underlying():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = OfflineReplayLoader(FlatFileCache(tmp))
+        days = loader.download_underlyings('2025-12-19', ['SPY', 'QQQ', 'TSLA'])
+        assert loader.downloads == 1, "the day file should be parsed once for every underlying"
+        assert set(days) == {'SPY', 'QQQ', 'TSLA'}
+        for symbol, columns in days.items():
+            assert len(columns['window_start']) == 810
+            assert set(columns['contracts'].tolist()) == {f'O:{symbol}251227C00590000', f'O:{symbol}251227P00590000'}
+            assert loader.cache.entry('2025-12-19', symbol)['rows'] == 810
+        
+        # Each bucket is cached, so single-symbol loads (and another pass) skip the file
+        cached = loader.download_minute_data('2025-12-19', 'QQQ')
+        assert isinstance(cached['volume'], np.memmap)
+        np.testing.assert_array_equal(cached['volume'], days['QQQ']['volume'])
+        assert loader.download_underlyings('2025-12-19', ['SPY', 'QQQ', 'TSLA'])['TSLA'] is not None
+        assert loader.downloads == 1
+        
+        # Only uncached underlyings are extracted
+        loader.download_underlyings('2025-12-19', ['SPY', 'AAPL'])
+        assert loader.downloads == 2 and loader.cache.entry('2025-12-19', 'AAPL')['rows'] == 810
+        print(f"✓ One pass extracted {len(days)} underlyings into the cache")
+
+
+def _cache_day(root, date, symbol):
+    """Pool worker: cache a small synthetic day"""
+    rows = {
+        'ticker': np.array([f'O:{symbol}251219P00590000', f'O:{symbol}251219C00600000'] * 50),
+        'window_start': np.arange(100, dtype=np.int64),
+        **{field: np.ones(100) for field in ('volume', 'open', 'high', 'low', 'close')}
+    }
+    return FlatFileCache(root).put(date, symbol, contract_columns(rows))['rows']
+
+
+def test_concurrent_writers():
+    with tempfile.TemporaryDirectory() as tmp:
+        days = [(f'2025-12-{day}', symbol) for day in (15, 16, 17) for symbol in ('SPY', 'QQQ')]
+        # Every day written twice by separate processes: both renames race for the same directory
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            rows = list(pool.map(_cache_day, [tmp] * 12, *zip(*(days * 2))))
+        assert rows == [100] * 12
+
+        cache = FlatFileCache(tmp)
+        assert sorted(cache._read_manifest()) == sorted(f'{date}/{symbol}' for date, symbol in days)
+        assert [(e['date'], e['symbol']) for e in cache.entries()] == sorted(days)
+        assert all(cache.get(date, symbol)['volume'].sum() == 100 for date, symbol in days)
+        leftovers = [name for _, dirs, _ in os.walk(tmp) for name in dirs if name.endswith(('.tmp', '.stale'))]
+        assert leftovers == []
+
+        # Another writer publishes the day between this writer's check and its rename
+        target = os.path.join(tmp, cache.entry('2025-12-16', 'SPY')['path'])
+        cache.remove('2025-12-16', 'SPY')
+        real_rename = os.rename
+
+        def racing_rename(src, dst):
+            if dst == target and not os.path.exists(target):
+                real_rename(src, dst)  # the other writer's copy lands first
+                raise OSError(39, 'Directory not empty', dst)
+            real_rename(src, dst)
+
+        os.rename = racing_rename
+        try:
+            assert _cache_day(tmp, '2025-12-16', 'SPY') == 100
+        finally:
+            os.rename = real_rename
+        assert FlatFileCache(tmp).get('2025-12-16', 'SPY')['volume'].sum() == 100
+
+        # A damaged day is replaced, not kept
+        path = os.path.join(tmp, cache.entry('2025-12-15', 'SPY')['path'])
+        os.remove(os.path.join(path, 'close.npy'))
+        assert cache.get('2025-12-15', 'SPY') is None
+        _cache_day(tmp, '2025-12-15', 'SPY')
+        assert cache.get('2025-12-15', 'SPY')['close'].sum() == 100
+        print(f"✓ {len(rows)} concurrent writes indexed {len(days)} days")
+
+
+if __name__ == '__main__':
+    test_contract_columns()
+    test_loader_reuses_cached_day()
+    test_one_pass_multi_underlying()
+    test_concurrent_writers()
+    print("\n✓ All tests completed successfully!")
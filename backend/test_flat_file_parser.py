@@ -0,0 +1,82 @@
+"""Test streaming OPRA minute aggregate parsing"""
+import gzip
+import io
+import os
+import tempfile
+
+import numpy as np
+
+from flat_file_parser import MinuteAggParser, parse_minute_aggs
+
+
+HEADER = 'ticker,volume,open,close,high,low,window_start,transactions'
+ROWS = [
+    'O:SPY251219C00600000,120,1.5,1.6,1.7,1.4,1766068200000000000,12',
+    'O:SPYG251219C00080000,999,1,1,1,1,1766068200000000000,1',   # different root
+    'O:SPY251219P00590000,80,2.25,2.1,2.3,2.0,1766068260000000000,8',
+    'O:QQQ251219P00500000,50,3,3,3,3,1766068260000000000,5',
+    'O:SPYD251219P00040000,7,1,1,1,1,1766068260000000000,1',     # different root
+    'O:SPY251226C00610000,,0.9,,0.95,0.85,1766068320000000000,',  # empty volume/close
+]
+CSV = ('\n'.join([HEADER] + ROWS) + '\n').encode()
+
+
+def test_exact_root_and_types():
+    data = parse_minute_aggs(io.BytesIO(CSV), 'SPY')
+    assert data['ticker'].tolist() == ['O:SPY251219C00600000', 'O:SPY251219P00590000', 'O:SPY251226C00610000']
+    assert data['window_start'].dtype == np.int64
+    assert data['window_start'][1] == 1766068260000000000
+    assert data['volume'].tolist() == [120.0, 80.0, 0.0]
+    assert data['open'].tolist() == [1.5, 2.25, 0.9]
+    assert np.isnan(data['close'][2])
+    assert set(data) == {'ticker', 'window_start', 'volume', 'open', 'high', 'low', 'close'}
+    print(f"✓ Parsed {len(data['ticker'])} SPY rows (SPYG/SPYD excluded)")
+
+
+def test_chunk_boundaries():
+    expected = parse_minute_aggs(io.BytesIO(CSV), 'SPY')
+    for chunk_size in (1, 7, 64):
+        parser = MinuteAggParser('SPY')
+        for start in range(0, len(CSV) - 1, chunk_size):  # drop the final newline too
+            parser.feed(CSV[start:min(start + chunk_size, len(CSV) - 1)])
+        data = parser.result()
+        for column, values in expected.items():
+            np.testing.assert_array_equal(data[column], values)
+        assert parser.rows_matched == 3 and parser.bytes_read == len(CSV) - 1
+    print("✓ Identical results for any chunking")
+
+
+def test_projection_and_column_order():
+    # Ticker not first; only the requested columns come back
+    reordered = b'window_start,volume,ticker\n1,10,O:QQQ251219C00500000\n2,20,O:SPY251219C00600000\n'
+    data = parse_minute_aggs(io.BytesIO(reordered), 'spy', columns=('ticker', 'volume'))
+    assert list(data) == ['ticker', 'volume']
+    assert data['ticker'].tolist() == ['O:SPY251219C00600000'] and data['volume'].tolist() == [20.0]
+    
+    empty = parse_minute_aggs(io.BytesIO(CSV), 'IWM')
+    assert len(empty['ticker']) == 0 and empty['window_start'].dtype == np.int64
+    
+    try:
+        parse_minute_aggs(io.BytesIO(b'ticker,volume\n'), 'SPY')
+    except ValueError as e:
+        print(f"✓ Rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError for missing columns")
+
+
+def test_gzip_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '2025-12-18.csv.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(CSV)
+        data = parse_minute_aggs(path, 'QQQ')
+    assert data['ticker'].tolist() == ['O:QQQ251219P00500000']
+    print("✓ Gzip file parsed")
+
+
+if __name__ == '__main__':
+    test_exact_root_and_types()
+    test_chunk_boundaries()
+    test_projection_and_column_order()
+    test_gzip_path()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,445 @@
+"""Test the flat-file download manager against a local S3-compatible server"""
+import gzip
+import hashlib
+import itertools
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+import numpy as np
+from botocore.config import Config
+
+from config import Config as AppConfig
+from flat_file_parser import GzipChunkParser, parse_minute_aggs
+from flat_file_store import FlatFileIntegrityError, FlatFileStore
+import historical_replay
+from flat_file_cache import FlatFileCache
+from historical_replay import HistoricalReplayLoader
+
+
+class LocalS3Server:
+    """
+    Minimal S3 stand-in over HTTP: path-style HEAD and (ranged) GET of
+    in-memory objects, with single-part MD5 ETags. `delay` slows every GET,
+    `bandwidth` caps each connection's bytes per second, `corrupt` keys
+    are served with altered bytes and `truncate` keys drop the connection
+    halfway through every response.
+    """
+
+    def __init__(self, delay: float = 0.0, bandwidth: float = None):
+        self.objects = {}
+        self.delay = delay
+        self.bandwidth = bandwidth
+        self.corrupt = set()
+        self.truncate = set()
+        self.gets = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def put(self, bucket: str, key: str, body: bytes):
+        self.objects[f"/{bucket}/{key}"] = body
+
+    def client(self):
+        return boto3.client('s3', endpoint_url=self.url, region_name='us-east-1',
+                            aws_access_key_id='test', aws_secret_access_key='test',
+                            config=Config(signature_version='s3v4', s3={'addressing_style': 'path'},
+                                          max_pool_connections=32))
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _object(self):
+                body = server.objects.get(self.path.split('?')[0])
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                return body
+
+            def do_HEAD(self):
+                body = self._object()
+                if body is None:
+                    return
+                self.send_response(200)
+                self.send_header('ETag', f'"{hashlib.md5(body).hexdigest()}"')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Last-Modified', 'Thu, 18 Dec 2025 00:00:00 GMT')
+                self.end_headers()
+
+            def do_GET(self):
+                body = self._object()
+                if body is None:
+                    return
+                time.sleep(server.delay)
+                data, status = body, 200
+                match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+                if match:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else len(body) - 1
+                    data, status = body[start:end + 1], 206
+                if self.path.split('?')[0] in server.corrupt:
+                    data = bytes([data[0] ^ 0xFF]) + data[1:]
+                with server._lock:
+                    server.gets += 1
+                    server.bytes_served += len(data)
+                self.send_response(status)
+                self.send_header('ETag', f'"{hashlib.md5(body).hexdigest()}"')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 206:
+                    self.send_header('Content-Range', f'bytes {start}-{start + len(data) - 1}/{len(body)}')
+                self.end_headers()
+                if self.path.split('?')[0] in server.truncate:
+                    data = data[:len(data) // 2]
+                    self.close_connection = True
+                step = int(server.bandwidth / 20) if server.bandwidth else len(data) or 1
+                for start in range(0, len(data), step):
+                    self.wfile.write(data[start:start + step])
+                    if server.bandwidth:
+                        time.sleep(step / server.bandwidth)
+
+        return Handler
+
+
+def test_download_and_reuse():
+    server = LocalS3Server()
+    body = os.urandom(300_000)
+    server.put('flatfiles', 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz', body)
+    key = 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz'
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=10**7)
+            path = store.fetch(key)
+            assert open(path, 'rb').read() == body
+            assert path == os.path.join(tmp, 'us_options_opra', 'minute_aggs_v1', '2025', '12', '2025-12-18.csv.gz')
+
+            # A second store on the same directory (e.g. another worker) reuses the validated copy
+            again = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=10**7)
+            assert again.fetch(key) == path
+            assert again.stats['hits'] == 1 and again.stats['downloads'] == 0
+
+            # A changed object is downloaded again
+            server.put('flatfiles', key, body[::-1])
+            assert open(again.fetch(key), 'rb').read() == body[::-1]
+            assert again.stats['downloads'] == 1
+            assert not [n for n in os.listdir(os.path.dirname(path)) if n.endswith('.tmp')]
+            print(f"✓ Downloaded, reused and refreshed: {store.stats} / {again.stats}")
+    finally:
+        server.close()
+
+
+def test_concurrent_requests_share_download():
+    server = LocalS3Server(delay=0.3)
+    server.put('flatfiles', 'day.csv.gz', os.urandom(100_000))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=10**7)
+            paths = []
+            threads = [threading.Thread(target=lambda: paths.append(store.fetch('day.csv.gz'))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(set(paths)) == 1 and len(paths) == 5
+            assert server.gets == 1, server.gets
+            assert store.stats['downloads'] == 1 and store.stats['deduplicated'] == 4
+            print(f"✓ 5 concurrent fetches, {server.gets} GET")
+    finally:
+        server.close()
+
+
+def test_checksum_mismatch():
+    server = LocalS3Server()
+    server.put('flatfiles', 'bad.csv.gz', os.urandom(50_000))
+    server.corrupt.add('/flatfiles/bad.csv.gz')
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=10**7, retries=1)
+            try:
+                store.fetch('bad.csv.gz')
+            except FlatFileIntegrityError as e:
+                print(f"✓ Rejected: {e}")
+            else:
+                raise AssertionError("Expected FlatFileIntegrityError")
+            assert server.gets == 2  # one retry
+            assert os.listdir(tmp) == []
+    finally:
+        server.close()
+
+
+def test_ranged_download():
+    server = LocalS3Server()
+    body = os.urandom(1_000_000)
+    server.put('flatfiles', 'day.csv.gz', body)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=10**7,
+                                  part_size=100_000, max_workers=4)
+            received = []
+            path = store.fetch('day.csv.gz', consumer_factory=lambda: received.append)
+            assert server.gets == 10, server.gets
+            assert open(path, 'rb').read() == body
+            assert b''.join(received) == body, "consumer must see the parts in order"
+            print(f"✓ {len(body)} bytes in {server.gets} ranged GETs")
+    finally:
+        server.close()
+
+
+def test_parse_while_downloading():
+    """Rows are parsed from the first parts before the last part has arrived"""
+    rows = ['ticker,volume,open,close,high,low,window_start,transactions']
+    for i in range(60_000):
+        root = 'SPY' if i % 3 else 'SPYG'
+        rows.append(f'O:{root}251219{"CP"[i % 2]}{580000 + i % 40 * 1000:08d},{i % 90},1,1,1,1,{i * 10**9},1')
+    # Two gzip members, as concatenated files are valid gzip
+    half = len(rows) // 2
+    body = (gzip.compress('\n'.join(rows[:half]).encode() + b'\n') +
+            gzip.compress('\n'.join(rows[half:]).encode()))
+    server = LocalS3Server(bandwidth=2_000_000)
+    server.put('flatfiles', 'day.csv.gz', body)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=10**7,
+                                  part_size=64 * 1024, max_workers=4)
+            progress = []
+            parsers = []
+
+            def start():
+                parsers.append(GzipChunkParser('SPY', progress_callback=progress.append))
+                return parsers[-1].feed
+
+            path = store.fetch('day.csv.gz', consumer_factory=start)
+            streamed = parsers[-1].result()
+            expected = parse_minute_aggs(path, 'SPY')
+            assert len(streamed['ticker']) == 40_000
+            for column in expected:
+                assert np.array_equal(streamed[column], expected[column]), column
+            early = [p for p in progress if p['rows'] > 0 and p['compressed_bytes'] < len(body)]
+            assert early, "expected parsed rows before the download completed"
+            print(f"✓ First rows after {early[0]['compressed_bytes']} of {len(body)} bytes; "
+                  f"{len(streamed['ticker'])} rows match the file parse")
+    finally:
+        server.close()
+
+
+def test_lru_eviction():
+    server = LocalS3Server()
+    for name in ('a', 'b', 'c'):
+        server.put('flatfiles', f'{name}.csv.gz', os.urandom(40_000))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FlatFileStore(server.client(), 'flatfiles', tmp, max_bytes=100_000)
+            store.fetch('a.csv.gz')
+            store.fetch('b.csv.gz')
+            os.utime(store.local_path('a.csv.gz'), (time.time() + 5, time.time() + 5))  # a used last
+            store.fetch('c.csv.gz')
+            remaining = sorted(n for n in os.listdir(tmp) if n.endswith('.csv.gz'))
+            assert remaining == ['a.csv.gz', 'c.csv.gz'], remaining
+            assert store.stats['evictions'] == 1
+            assert not os.path.exists(store.local_path('b.csv.gz') + '.meta.json')
+            print(f"✓ Evicted least recently used: {remaining}")
+    finally:
+        server.close()
+
+
+def _minute_aggs_day(strikes=1, roots=('SPY',)):
+    """Gzipped minute_aggs file for 2025-12-18 with call and put bars every minute"""
+    open_ns = 1766068200 * 10**9  # 2025-12-18 09:30 ET
+    rows = ['ticker,volume,open,close,high,low,window_start,transactions']
+    for root in sorted(roots):  # Flat files are sorted by ticker
+        for minute in range(390):
+            for strike in range(strikes):
+                for side in 'CP':
+                    rows.append(f'O:{root}251219{side}{600000 + strike * 1000:08d},{10 + (minute + strike) % 7},'
+                                f'1,1,1,1,{open_ns + minute * 60 * 10**9},1')
+    return gzip.compress('\n'.join(rows).encode())
+
+
+@contextmanager
+def growing_rss(step_mb):
+    """current_rss reporting `step_mb` more on every call, so load growth crosses the ceiling deterministically"""
+    original = historical_replay.current_rss
+    base = original()
+    calls = itertools.count()
+    historical_replay.current_rss = lambda: base + next(calls) * step_mb * 2**20
+    try:
+        yield
+    finally:
+        historical_replay.current_rss = original
+
+
+@contextmanager
+def replay_loader(server, **config):
+    """HistoricalReplayLoader pointed at the stand-in through MASSIVE_S3_ENDPOINT, with Config overrides"""
+    config = {'FLAT_FILE_CACHE_DIR': '', **config}
+    saved = {name: getattr(AppConfig, name) for name in ('MASSIVE_S3_ENDPOINT', 'FLAT_FILE_DIR', *config)}
+    saved_env = {name: os.environ.get(name) for name in ('MASSIVE_S3_ACCESS_KEY', 'MASSIVE_S3_SECRET_KEY')}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            AppConfig.MASSIVE_S3_ENDPOINT = server.url
+            AppConfig.FLAT_FILE_DIR = tmp
+            for name, value in config.items():
+                setattr(AppConfig, name, value)
+            os.environ.update(MASSIVE_S3_ACCESS_KEY='test', MASSIVE_S3_SECRET_KEY='test')
+            yield HistoricalReplayLoader()
+    finally:
+        for name, value in saved.items():
+            setattr(AppConfig, name, value)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_replay_loader_endpoint():
+    server = LocalS3Server()
+    server.put('flatfiles', 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz', _minute_aggs_day())
+    try:
+        with replay_loader(server) as loader:
+            frame = loader.load_minute_frame('2025-12-18', 'SPY')
+            assert frame is not None and frame['call_volume'].sum() == frame['put_volume'].sum() > 0
+            assert loader.flat_files.stats['downloads'] == 1
+            print(f"✓ Replay loader fetched through {server.url}")
+    finally:
+        server.close()
+
+
+def test_rss_ceiling():
+    """Past the RSS ceiling a load keeps only strike aggregates; snapshots are unchanged"""
+    server = LocalS3Server()
+    server.put('flatfiles', 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz', _minute_aggs_day(strikes=5))
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with replay_loader(server, REPLAY_MAX_RSS_MB=0) as loader:
+                expected = loader.create_snapshots('2025-12-18', 'SPY', num_snapshots=10)
+                assert loader.load_metrics[-1]['rows_kept'] is True
+            
+            with replay_loader(server, REPLAY_MAX_RSS_MB=1, FLAT_FILE_CACHE_DIR=cache_dir) as loader, growing_rss(2):
+                snapshots = loader.create_snapshots('2025-12-18', 'SPY', num_snapshots=10)
+                assert [s['strikes'] for s in snapshots] == [s['strikes'] for s in expected]
+                metrics = loader.load_metrics[-1]
+                assert metrics['rows_kept'] is False and metrics['rows'] == 390 * 5 * 2
+                assert metrics['peak_rss_mb'] - metrics['start_rss_mb'] > 1
+                assert loader.cache.entry('2025-12-18', 'SPY') is None, "dropped rows must not be cached"
+                
+                # Row consumers (backtests) fail cleanly instead of growing past the ceiling
+                loader._minute_frames.clear()
+                assert loader.download_minute_data('2025-12-18', 'SPY') is None
+                print(f"✓ Aggregates only past the ceiling: {metrics['rows']} rows, "
+                      f"peak {metrics['peak_rss_mb']:.0f} MB RSS")
+            
+            # The ceiling applies to the load's own growth, not the process baseline
+            with replay_loader(server, REPLAY_MAX_RSS_MB=1) as loader, growing_rss(0):
+                assert loader.download_minute_data('2025-12-18', 'SPY') is not None
+                assert loader.load_metrics[-1]['start_rss_mb'] > 1
+    finally:
+        server.close()
+
+
+def test_prefetch_under_rss_ceiling():
+    """A multi-underlying prefetch spills per-symbol blocks, so it caches every symbol under the ceiling"""
+    server = LocalS3Server()
+    roots = ('QQQ', 'SPY', 'TSLA')
+    server.put('flatfiles', 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz',
+               _minute_aggs_day(strikes=3, roots=roots))
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with replay_loader(server, REPLAY_MAX_RSS_MB=1, FLAT_FILE_CACHE_DIR=cache_dir) as loader, growing_rss(2):
+                days = loader.download_underlyings('2025-12-18', list(roots) + ['AAPL'])
+                assert days['AAPL'] is None
+                for root in roots:
+                    assert isinstance(days[root]['volume'], np.memmap)
+                    assert loader.cache.entry('2025-12-18', root)['rows'] == 390 * 3 * 2
+                    assert set(days[root]['contracts'].tolist()) == {
+                        f'O:{root}251219{side}{600000 + strike * 1000:08d}' for side in 'CP' for strike in range(3)
+                    }
+                assert loader.load_metrics[-1]['rows_kept'] is False
+                assert [name for name in os.listdir(cache_dir) if name.startswith('.spool-')] == []
+            assert FlatFileCache(cache_dir).get('2025-12-18', 'TSLA') is not None
+            print(f"✓ Prefetched {', '.join(roots)} past the RSS ceiling")
+    finally:
+        server.close()
+
+
+def test_partial_snapshots_while_downloading():
+    """Snapshots of the rows parsed so far reach the caller before the last part has arrived"""
+    server = LocalS3Server(bandwidth=200_000)
+    body = _minute_aggs_day(strikes=20)
+    server.put('flatfiles', 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz', body)
+    try:
+        with replay_loader(server, FLAT_FILE_PART_SIZE=8192, FLAT_FILE_DOWNLOAD_WORKERS=2) as loader:
+            partials = []
+            snapshots = loader.create_snapshots('2025-12-18', 'SPY', num_snapshots=4,
+                                                partial_callback=partials.append)
+            assert partials, "expected snapshots before the download completed"
+            first = partials[0]
+            assert first['compressed_bytes'] < len(body) and 0 < first['rows'] < 390 * 20 * 2
+            for early, final in zip(first['snapshots'], snapshots):
+                assert early['snapshot_time'] == final['snapshot_time']
+                assert early['calls']['total'] <= final['calls']['total']
+            assert first['snapshots'][-1]['calls']['total'] < snapshots[-1]['calls']['total']
+            
+            loader._strike_flows.clear()
+            assert loader.create_snapshots('2025-12-18', 'SPY', num_snapshots=4) == snapshots
+            print(f"✓ First snapshots after {first['compressed_bytes']:,} of {len(body):,} bytes "
+                  f"({first['rows']} rows), {len(partials)} partial updates")
+    finally:
+        server.close()
+
+
+def test_failed_download_not_served():
+    """A download that fails part way never yields (or caches) the blocks folded before the failure"""
+    server = LocalS3Server()
+    key = 'us_options_opra/minute_aggs_v1/2025/12/2025-12-18.csv.gz'
+    server.put('flatfiles', key, _minute_aggs_day(strikes=5))
+    try:
+        with replay_loader(server, FLAT_FILE_PART_SIZE=4096) as loader:
+            for failure in (server.truncate, server.corrupt):
+                failure.add(f'/flatfiles/{key}')
+                assert loader.load_strike_flow('2025-12-18', 'SPY') is None
+                assert loader._strike_flows == {}
+                assert loader.load_metrics[-1]['error']
+                failure.clear()
+            
+            # Once the object downloads cleanly the whole day is served
+            flow = loader.load_strike_flow('2025-12-18', 'SPY')
+            assert flow['call_volume'].sum() + flow['put_volume'].sum() == \
+                sum(10 + (minute + strike) % 7 for minute in range(390) for strike in range(5)) * 2
+            print("✓ Truncated and corrupt downloads fall back instead of serving partial flow")
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    test_download_and_reuse()
+    test_concurrent_requests_share_download()
+    test_checksum_mismatch()
+    test_ranged_download()
+    test_parse_while_downloading()
+    test_lru_eviction()
+    test_replay_loader_endpoint()
+    test_rss_ceiling()
+    test_prefetch_under_rss_ceiling()
+    test_partial_snapshots_while_downloading()
+    test_failed_download_not_served()
+    print("\n✓ All tests completed successfully!")
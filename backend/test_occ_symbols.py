@@ -0,0 +1,44 @@
+"""Test vectorized OCC ticker parsing and interning"""
+import numpy as np
+
+from occ_symbols import intern_tickers, parse_occ_tickers
+
+
+def test_parse_mixed_roots():
+    tickers = np.array(['O:SPY251219P00590000', 'O:AAPL260116C00245500', 'O:A251219C00100000',
+                        'SPYG251219P00080000', 'O:PYPL270115P01000000'])
+    parsed = parse_occ_tickers(tickers)
+    assert parsed['root'].tolist() == ['SPY', 'AAPL', 'A', 'SPYG', 'PYPL']
+    assert parsed['expiry'].astype(str).tolist() == ['2025-12-19', '2026-01-16', '2025-12-19', '2025-12-19',
+                                                     '2027-01-15']
+    assert parsed['type'].tolist() == [b'P', b'C', b'C', b'P', b'P']
+    assert parsed['strike'].tolist() == [590.0, 245.5, 100.0, 80.0, 1000.0]
+    print(f"✓ Parsed roots containing P/C: {parsed['root'].tolist()}")
+    
+    for bad in ('O:SPY2512X9P00590000', 'O:SPY251219X00590000', 'O:251219P00590000', 'P00590000'):
+        try:
+            parse_occ_tickers(np.array([bad]))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for {bad}")
+
+
+def test_intern():
+    tickers = np.array(['O:SPY251219P00590000', 'O:SPY251219C00600000', 'O:SPY251219P00590000', 'O:QQQ251219C00500000'])
+    ids, contracts = intern_tickers(tickers)
+    assert ids.dtype == np.int32
+    assert contracts['ticker'][ids].tolist() == tickers.tolist()
+    assert len(contracts['ticker']) == 3 and ids[0] == ids[2]
+    assert contracts['root'][ids].tolist() == ['SPY', 'SPY', 'SPY', 'QQQ']
+    assert contracts['strike'][ids].tolist() == [590.0, 600.0, 590.0, 500.0]
+    
+    ids, contracts = intern_tickers(np.array([], dtype=str))
+    assert len(ids) == 0 and len(contracts['strike']) == 0
+    print(f"✓ Interned {len(tickers)} tickers to 3 contract ids")
+
+
+if __name__ == '__main__':
+    test_parse_mixed_roots()
+    test_intern()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,99 @@
+"""Test portfolio-level backtests across several symbols with shared capital"""
+import numpy as np
+
+from strategy_backtester import StrategyBacktester
+from trade_log import trade_log_store
+
+
+def test_portfolio_backtest():
+    bt = StrategyBacktester()
+    symbols = ['SPY', 'QQQ', 'AAPL']
+    result = bt.run_portfolio_backtest({'num_trades': 300}, date='2025-12-18', symbols=symbols)
+    
+    assert result['symbols'] == symbols
+    assert sum(s['trades'] for s in result['by_symbol']) == result['total_trades']
+    assert abs(sum(s['total_profit'] for s in result['by_symbol']) - result['total_profit']) < 0.05
+    assert result['equity_curve'][-1]['capital'] == result['final_capital']
+    
+    run = trade_log_store.get(result['run_id'])
+    assert run['symbols'] == symbols
+    assert {t['symbol'] for t in result['trades']} <= set(symbols)
+    print(f"Portfolio: {result['total_trades']} trades, win rate {result['win_rate']}%, "
+          f"profit ${result['total_profit']}")
+    
+    # Each symbol gets its own flow for the same day
+    spy = bt.run_backtest({'num_trades': 300}, date='2025-12-18', symbol='SPY')
+    qqq = bt.run_backtest({'num_trades': 300}, date='2025-12-18', symbol='QQQ')
+    assert (spy['total_trades'], spy['total_profit']) != (qqq['total_trades'], qqq['total_profit'])
+
+
+def test_shared_capital_limit():
+    bt = StrategyBacktester()
+    # $10,000 / $2,500 per position allows at most four open positions
+    result = bt.run_portfolio_backtest({'num_trades': 5000, 'position_size': 2500, 'max_hold_minutes': 120},
+                                       symbols=['SPY', 'QQQ', 'AAPL', 'TSLA'])
+    assert result['peak_open_positions'] <= 4
+    assert result['signals_skipped_for_capital'] > 0
+    assert result['trades_attempted'] >= result['total_trades'] + result['signals_skipped_for_capital']
+    print(f"✓ Peak open positions {result['peak_open_positions']}, "
+          f"{result['signals_skipped_for_capital']} signals skipped")
+
+
+def test_trade_cap_counts_taken_trades():
+    bt = StrategyBacktester()
+    params = {'num_trades': 50, 'position_size': 500, 'put_call_threshold': 0.8, 'use_volume_spike': False,
+              'use_iv_filter': False, 'use_multi_timeframe': False}
+    # Twenty slots: signals skipped while they are full must not use up the trade budget
+    result = bt.run_portfolio_backtest({**params, 'initial_capital': 10000}, date='2025-12-15')
+    assert result['signals_skipped_for_capital'] > 0
+    assert result['total_trades'] == 50
+    # Two slots never reach the cap, so every symbol-minute was looked at
+    small = bt.run_portfolio_backtest({**params, 'initial_capital': 1000}, date='2025-12-15')
+    assert small['total_trades'] < 50 and small['trades_attempted'] == 390 * len(small['symbols'])
+    
+    for r in (result, small):
+        assert r['trades_attempted'] >= r['total_trades'] + r['signals_skipped_for_capital']
+        assert r['trades_filtered'] == r['trades_attempted'] - r['total_trades']
+    print(f"✓ {result['total_trades']} trades taken past {result['signals_skipped_for_capital']} skipped signals")
+
+
+def test_capital_limited_entries():
+    bt = StrategyBacktester()
+    rng = np.random.default_rng(3)
+    entry_minute, _ = np.nonzero(rng.random((390, 6)) < 0.4)  # Minute-major, as run_portfolio_backtest orders them
+    exit_minute = np.minimum(entry_minute + rng.integers(0, 45, len(entry_minute)), 389)
+    taken = bt._capital_limited_entries(entry_minute, exit_minute, {'initial_capital': 10000, 'position_size': 2000})
+    
+    # Reference: an entry is taken when fewer than five earlier taken positions are still open
+    expected = []
+    for entry in entry_minute.tolist():
+        still_open = sum(1 for exit, was_taken in zip(exit_minute.tolist(), expected) if was_taken and exit > entry)
+        expected.append(still_open < 5)
+    assert taken.tolist() == expected
+    assert 0 < taken.sum() < len(taken)
+    
+    # With a limit the walk stops at the 30th taken entry
+    limited = bt._capital_limited_entries(entry_minute, exit_minute, {'initial_capital': 10000, 'position_size': 2000},
+                                          limit=30)
+    last = int(np.flatnonzero(taken)[29])
+    assert limited.sum() == 30 and limited[:last + 1].tolist() == expected[:last + 1]
+    print(f"✓ {taken.sum()} of {len(taken)} entries fit in five slots")
+
+
+def test_invalid_symbols():
+    bt = StrategyBacktester()
+    try:
+        bt.run_portfolio_backtest(symbols=['SPY', 'SPY'])
+    except ValueError as e:
+        print(f"✓ Rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError for duplicate symbols")
+
+
+if __name__ == '__main__':
+    test_portfolio_backtest()
+    test_shared_capital_limit()
+    test_trade_cap_counts_taken_trades()
+    test_capital_limited_entries()
+    test_invalid_symbols()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,141 @@
+"""Test backtesting on replay minute aggregates (offline, with stubbed minute bars)"""
+import io
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import historical_replay
+from flat_file_parser import parse_minute_aggs
+from historical_replay import HistoricalReplayLoader, MARKET_TZ, MINUTE_FRAME_CACHE_SIZE
+from strategy_backtester import StrategyBacktester
+
+
+class OfflineReplayLoader(HistoricalReplayLoader):
+    """Replay loader serving generated OPRA-style minute bars instead of S3"""
+    
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache
+        self.downloads = 0
+    
+    def _fetch_minute_aggs(self, date, symbol, **kwargs):
+        self.downloads += 1
+        rng = np.random.default_rng(7)
+        session_open = datetime.strptime(date, '%Y-%m-%d').replace(hour=9, minute=30, tzinfo=MARKET_TZ)
+        open_ns = int(session_open.timestamp() * 1e9)
+        lines = ['ticker,volume,open,close,high,low,window_start,transactions']
+        for minute in range(-5, 400):  # Includes pre/post-market bars
+            for contract_type in ('C', 'P'):
+                for root in ([symbol] if isinstance(symbol, str) else symbol):
+                    price = 5 + rng.normal(0, 0.5)
+                    volume = int(rng.integers(50, 500))
+                    window_start = open_ns + minute * 60 * 10**9
+                    lines.append(f'O:{root}251227{contract_type}00590000,{volume},{price},{price},'
+                                 f'{price * 1.05},{price * 0.95},{window_start},{volume // 10}')
+                    # Another root sharing the prefix must not leak into the symbol's rows
+                    lines.append(f'O:{root}G251227{contract_type}00090000,{volume},1,1,1,1,{window_start},1')
+        return parse_minute_aggs(io.BytesIO('\n'.join(lines).encode()), symbol)
+
+
+def test_replay_backtest():
+    loader = OfflineReplayLoader()
+    historical_replay._replay_loader = loader
+    bt = StrategyBacktester()
+    
+    frame = loader.load_minute_frame('2025-12-19', 'SPY')
+    assert len(frame['minute']) == 390
+    assert frame['put_volume'].sum() > 0 and frame['call_volume'].sum() > 0
+    
+    params = {'data_source': 'replay', 'put_call_threshold': 1.0, 'volume_spike_threshold': 1.0}
+    result = bt.run_backtest(params, date='2025-12-19')
+    compare = bt.compare_strategies(params, date='2025-12-19')
+    
+    assert loader.downloads == 1, "minute frame should be loaded once and cached"
+    assert result['data_source'] == 'replay'
+    assert result['iv_filter_applied'] is False
+    assert result['trades_attempted'] <= 390
+    print(f"✓ Replay backtest: {result['total_trades']} trades, "
+          f"compare best: {compare['comparison']['best_strategy']}")
+
+
+class MissingPriceReplayLoader(OfflineReplayLoader):
+    """Adds the day's most traded contracts, reported without any OHLC"""
+    
+    def _fetch_minute_aggs(self, date, symbol, **kwargs):
+        self.downloads += 1
+        session_open = datetime.strptime(date, '%Y-%m-%d').replace(hour=9, minute=30, tzinfo=MARKET_TZ)
+        open_ns = int(session_open.timestamp() * 1e9)
+        lines = ['ticker,volume,open,close,high,low,window_start,transactions']
+        for minute in range(390):
+            window_start = open_ns + minute * 60 * 10**9
+            for contract_type in ('C', 'P'):
+                lines.append(f'O:{symbol}251227{contract_type}00590000,10000,,,,,{window_start},100')
+                if minute % 3 == 0:  # Priced contract trading every third minute
+                    price = 5 + minute / 100
+                    lines.append(f'O:{symbol}251227{contract_type}00600000,100,{price},{price},'
+                                 f'{price + 0.1},{price - 0.1},{window_start},10')
+        return parse_minute_aggs(io.BytesIO('\n'.join(lines).encode()), symbol)
+
+
+def test_replay_missing_ohlc():
+    loader = MissingPriceReplayLoader()
+    historical_replay._replay_loader = loader
+    
+    frame = loader.load_minute_frame('2025-12-19', 'SPY')
+    for side in ('put_bars', 'call_bars'):
+        bars = frame[side]
+        assert all(np.isfinite(bars[field]).all() for field in ('open', 'high', 'low', 'close')), side
+        # The priced contract's close, carried over the minutes it did not trade
+        assert bars['close'][4] == bars['close'][3] == 5.03
+        assert (bars['high'] >= bars['low']).all()
+    
+    result = StrategyBacktester().run_backtest({'data_source': 'replay', 'put_call_threshold': 0.5,
+                                                'volume_spike_threshold': 0.5}, date='2025-12-19')
+    assert result['total_trades'] > 0
+    assert np.isfinite([t['percent_return'] for t in result['trades']]).all()
+    assert np.isfinite(result['final_capital'])
+    print(f"✓ Unpriced top contract skipped: {result['total_trades']} trades with finite returns")
+
+
+def test_concurrent_minute_frames():
+    loader = OfflineReplayLoader()
+    dates = [(datetime(2025, 11, 3) + timedelta(days=i)).strftime('%Y-%m-%d')
+             for i in range(MINUTE_FRAME_CACHE_SIZE + 8)]
+    errors = []
+    
+    def load(offset):
+        try:
+            for i in range(len(dates)):
+                frame = loader.load_minute_frame(dates[(i + offset) % len(dates)], 'SPY')
+                assert len(frame['minute']) == 390
+        except Exception as e:
+            errors.append(e)
+    
+    # Request threads hitting, filling and evicting the frame cache at once
+    threads = [threading.Thread(target=load, args=(offset,)) for offset in range(0, 24, 6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [], errors
+    assert len(loader._minute_frames) == MINUTE_FRAME_CACHE_SIZE
+    print(f"✓ {len(threads)} threads shared the frame cache ({loader.downloads} loads for {len(dates)} days)")
+
+
+def test_replay_requires_date():
+    bt = StrategyBacktester()
+    try:
+        bt.run_backtest({'data_source': 'replay'})
+    except ValueError as e:
+        print(f"✓ Rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError without a date")
+
+
+if __name__ == '__main__':
+    test_replay_backtest()
+    test_replay_missing_ohlc()
+    test_concurrent_minute_frames()
+    test_replay_requires_date()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,181 @@
+"""Test time-scaled replay sessions against static replay snapshots (offline, with a manual clock)"""
+import threading
+
+from historical_replay import MINUTES_PER_SESSION
+from replay_sessions import ReplaySessionManager
+from test_replay_snapshots import MultiStrikeLoader
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _updates(manager):
+    return [payload for event, payload, _ in manager.drain_events() if event == 'replay_update']
+
+
+def test_stream_matches_snapshots():
+    loader = MultiStrikeLoader()
+    clock = ManualClock()
+    manager = ReplaySessionManager(loader_factory=lambda: loader, clock=clock)
+    expected = loader.create_snapshots('2025-12-19', 'SPY', num_snapshots=MINUTES_PER_SESSION)
+
+    session = manager.create('2025-12-19', 'SPY', rate=500)
+    manager.tick()
+    first = _updates(manager)
+    assert [u['minute'] for u in first] == [0]
+    assert first[0]['snapshot']['strikes'] == expected[0]['strikes']
+
+    # At 500x a replayed minute lasts 0.12s
+    for _ in range(10):
+        clock.now += 0.12
+        manager.tick()
+    updates = _updates(manager)
+    assert [u['minute'] for u in updates] == list(range(1, 11))
+    for update in updates:
+        snapshot = expected[update['minute']]
+        assert update['snapshot']['strikes'] == snapshot['strikes']
+        assert update['snapshot']['snapshot_time'] == snapshot['snapshot_time']
+
+    # Nothing new without time passing
+    manager.tick()
+    assert _updates(manager) == []
+    print(f"✓ Streamed {len(updates) + 1} minutes of session {session['session_id'][:8]} at 500x")
+
+
+def test_pause_seek_and_rate():
+    loader = MultiStrikeLoader()
+    clock = ManualClock()
+    manager = ReplaySessionManager(loader_factory=lambda: loader, clock=clock, idle_seconds=0)  # No viewers here
+    session_id = manager.create('2025-12-19', 'SPY', rate=60)['session_id']  # a minute per second
+
+    clock.now += 5.5
+    assert manager.get_status(session_id)['minute'] == 5
+    manager.control(session_id, 'pause')
+    clock.now += 100
+    assert manager.get_status(session_id)['minute'] == 5
+
+    status = manager.control(session_id, 'seek', time='12:00')
+    assert status['minute'] == 149  # bars through 12:00 ET are covered from the 150th minute on
+    manager.tick()
+    assert _updates(manager)[-1]['snapshot']['snapshot_time'] == '12:00:00'
+    assert manager.control(session_id, 'seek', minute=200)['minute'] == 200
+
+    manager.control(session_id, 'rate', rate=120)
+    manager.control(session_id, 'play')
+    clock.now += 1.0
+    assert manager.get_status(session_id)['minute'] == 202
+
+    # Playing past the close stops on the last minute
+    clock.now += 1000
+    manager.tick()
+    events = manager.drain_events()
+    assert events[-1][0] == 'replay_finished'
+    assert events[-2][1]['minute'] == MINUTES_PER_SESSION - 1
+    assert manager.get_status(session_id)['playing'] is False
+
+    for bad in ({'action': 'rate', 'rate': 501}, {'action': 'seek', 'minute': 390}, {'action': 'rewind'},
+                {'action': 'seek', 'time': '25:00'}):
+        try:
+            manager.control(session_id, bad.pop('action'), **bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected ValueError for {bad}")
+    assert manager.control('missing', 'play') is None
+    print("✓ Pause, seek (minute and time), rate change and finish")
+
+
+def test_sessions_share_day():
+    loader = MultiStrikeLoader()
+    manager = ReplaySessionManager(loader_factory=lambda: loader, day_cache_size=0)
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(manager.create('2025-12-19', 'SPY')))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sessions) == 8
+    assert loader.downloads == 1
+    assert len({id(s.day) for s in manager.sessions.values()}) == 1
+
+    # The day is released once its last session closes
+    for session in sessions:
+        assert manager.close(session['session_id'])
+    assert manager._days == {} and manager.sessions == {}
+    print("✓ 8 concurrent sessions shared one loaded day")
+
+
+def test_idle_sessions_closed():
+    loader = MultiStrikeLoader()
+    clock = ManualClock()
+    manager = ReplaySessionManager(loader_factory=lambda: loader, clock=clock, idle_seconds=300, day_cache_size=0)
+    abandoned = manager.create('2025-12-19', 'SPY')['session_id']
+    watched = manager.create('2025-12-19', 'SPY')['session_id']
+    controlled = manager.create('2025-12-19', 'SPY')['session_id']
+    assert manager.join(watched, 'sid-1')['viewers'] == 1
+
+    clock.now += 200
+    manager.control(controlled, 'pause')
+    clock.now += 150
+    manager.tick()
+    closed = [payload for event, payload, _ in manager.drain_events() if event == 'replay_closed']
+    assert closed == [{'session_id': abandoned, 'reason': 'idle'}]
+    assert set(manager.sessions) == {watched, controlled}
+
+    # A client that disconnects without leaving starts the timeout
+    manager.disconnect('sid-1')
+    assert manager.get_status(watched)['viewers'] == 0
+    clock.now += 299
+    manager.tick()
+    assert set(manager.sessions) == {watched}  # `controlled` was last used 449s ago
+    clock.now += 1
+    manager.tick()
+    assert manager.sessions == {} and manager._days == {}
+    assert manager.join(watched, 'sid-1') is None
+    print("✓ Idle sessions closed, watched and controlled ones kept")
+
+
+def test_session_limit_and_invalid_params():
+    loader = MultiStrikeLoader()
+    manager = ReplaySessionManager(loader_factory=lambda: loader, max_sessions=3)
+    created, rejected = [], []
+
+    def create():
+        try:
+            created.append(manager.create('2025-12-19', 'SPY'))
+        except ValueError as e:
+            rejected.append(e)
+
+    # Every request passes the first check while the day is still loading
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 3 and len(rejected) == 5
+    assert len(manager.sessions) == 3
+
+    manager.close(created[0]['session_id'])
+    for bad in ({'rate': None}, {'rate': 'fast'}, {'minute': None}, {'minute': 390}):
+        try:
+            manager.create('2025-12-19', 'SPY', **bad)
+        except (TypeError, ValueError):
+            continue
+        raise AssertionError(f"Expected an error for {bad}")
+    assert len(manager.sessions) == 2
+    print(f"✓ Session limit held under concurrent creates: {rejected[0]}")
+
+
+if __name__ == '__main__':
+    test_stream_matches_snapshots()
+    test_pause_seek_and_rate()
+    test_sessions_share_day()
+    test_idle_sessions_closed()
+    test_session_limit_and_invalid_params()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,70 @@
+"""Test cumulative replay snapshots against a per-snapshot rescan"""
+from collections import defaultdict
+
+import numpy as np
+
+from historical_replay import MINUTES_PER_SESSION
+from test_replay_backtest import OfflineReplayLoader
+
+
+class MultiStrikeLoader(OfflineReplayLoader):
+    """Offline bars spread over several strikes, unsorted and with pre-market rows"""
+    
+    def _fetch_minute_aggs(self, date, symbol, **kwargs):
+        rows = super()._fetch_minute_aggs(date, symbol, **kwargs)
+        rng = np.random.default_rng(11)
+        count = len(rows['ticker'])
+        strikes = rng.choice([580000, 585000, 590000, 595000, 600000], count)
+        rows['ticker'] = np.array([f"{t[:-8]}{s:08d}" for t, s in zip(rows['ticker'].tolist(), strikes)])
+        order = rng.permutation(count)
+        return {column: values[order] for column, values in rows.items()}
+
+
+def _rescan(minute_data, target_ns):
+    """Reference: aggregate every row up to the snapshot time"""
+    strikes = defaultdict(lambda: [0, 0])
+    for window_start, strike, contract_type, volume in zip(minute_data['window_start'], minute_data['strike'],
+                                                           minute_data['type'], minute_data['volume']):
+        if window_start <= target_ns:
+            strikes[float(strike)][contract_type == b'P'] += int(volume)
+    return [{'strike': k, 'call_volume': v[0], 'put_volume': v[1]} for k, v in sorted(strikes.items())]
+
+
+def test_matches_rescan():
+    loader = MultiStrikeLoader()
+    minute_data = loader.download_minute_data('2025-12-19', 'SPY')
+    
+    for num_snapshots in (1, 4, 7):
+        snapshots = loader.create_snapshots('2025-12-19', 'SPY', num_snapshots=num_snapshots)
+        assert len(snapshots) == num_snapshots
+        for snapshot, snap_time in zip(snapshots, loader.snapshot_times('2025-12-19', num_snapshots)):
+            expected = _rescan(minute_data, int(snap_time.timestamp() * 1e9))
+            assert snapshot['strikes'] == expected
+            assert snapshot['calls']['total'] == sum(s['call_volume'] for s in expected)
+            assert snapshot['puts']['total'] == sum(s['put_volume'] for s in expected)
+    
+    assert [s['snapshot_time'] for s in loader.create_snapshots('2025-12-19', 'SPY')] == \
+        ['09:45:00', '11:30:00', '14:00:00', '15:45:00']
+    print(f"✓ Cumulative snapshots match a full rescan, last: {snapshots[-1]['put_call_ratio']:.3f} P/C")
+
+
+def test_every_minute():
+    loader = MultiStrikeLoader()
+    snapshots = loader.create_snapshots('2025-12-19', 'SPY', num_snapshots=MINUTES_PER_SESSION)
+    assert len(snapshots) == MINUTES_PER_SESSION
+    assert snapshots[0]['snapshot_time'] == '09:31:00' and snapshots[-1]['snapshot_time'] == '16:00:00'
+    totals = [s['calls']['total'] + s['puts']['total'] for s in snapshots]
+    assert all(a <= b for a, b in zip(totals, totals[1:]))
+    
+    try:
+        loader.create_snapshots('2025-12-19', 'SPY', num_snapshots=0)
+    except ValueError as e:
+        print(f"✓ Rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError for num_snapshots=0")
+
+
+if __name__ == '__main__':
+    test_matches_rescan()
+    test_every_minute()
+    print("\n✓ All tests completed successfully!")
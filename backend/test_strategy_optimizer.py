@@ -0,0 +1,73 @@
+"""Test the successive-halving strategy parameter optimizer"""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from strategy_optimizer import StrategyOptimizer, pareto_front
+
+
+def test_pareto_front():
+    returns = np.array([5.0, 3.0, 8.0, 4.0, 8.0])
+    drawdowns = np.array([2.0, 1.0, 6.0, 3.0, 7.0])
+    # (4.0, 3.0) is dominated by (5.0, 2.0); (8.0, 7.0) by (8.0, 6.0)
+    assert sorted(pareto_front(returns, drawdowns).tolist()) == [0, 1, 2]
+
+
+def test_successive_halving():
+    optimizer = StrategyOptimizer()
+    progress = []
+    result = optimizer.optimize({'num_trades': 200}, end_date='2025-12-18', num_configs=12, eta=3,
+                                min_days=1, max_days=6, seed=7, progress_callback=progress.append)
+    
+    assert result['budgets'] == [1, 3, 6]
+    assert result['end_date'] == '2025-12-18'
+    
+    # Each rung evaluates no more configurations than the previous one
+    per_rung = [sum(1 for e in result['evaluations'] if e['rung'] == r) for r in range(3)]
+    assert per_rung[0] == 12 and per_rung[0] >= per_rung[1] >= per_rung[2] >= 1
+    assert len(progress) == result['total_evaluations']
+    
+    final = [e for e in result['evaluations'] if e['rung'] == 2]
+    assert result['best']['return_percent'] == max(e['return_percent'] for e in final)
+    for point in result['pareto_front']:
+        assert not any(e['return_percent'] > point['return_percent'] and e['max_drawdown'] < point['max_drawdown']
+                       for e in final)
+    print(f"Best of {result['configs_evaluated']}: {result['best']['params']} -> "
+          f"{result['best']['return_percent']}% (max DD {result['best']['max_drawdown']}%)")
+    
+    # Same seed, same search, even in a fresh process that regenerates every day
+    script = (
+        "import json\n"
+        "from strategy_optimizer import StrategyOptimizer\n"
+        "r = StrategyOptimizer().optimize({'num_trades': 200}, end_date='2025-12-18', num_configs=12, eta=3,\n"
+        "                                 min_days=1, max_days=6, seed=7)\n"
+        "print(json.dumps([r['best']['params'], r['best']['return_percent']]))"
+    )
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=os.path.dirname(__file__) or '.', text=True)
+    params, return_percent = json.loads(output.strip().splitlines()[-1])
+    assert params == result['best']['params'] and return_percent == result['best']['return_percent']
+
+
+def test_invalid_settings():
+    optimizer = StrategyOptimizer()
+    for settings in ({'eta': 1}, {'min_days': 5, 'max_days': 2}, {'objective': 'luck'},
+                     {'search_space': {'num_trades': [1, 2]}},
+                     # Shapes a JSON body can send instead of lists
+                     {'search_space': {'stop_loss': -0.5}}, {'search_space': {'use_multi_timeframe': True}},
+                     {'search_space': {'profit_target': ['low', 'high']}}, {'search_space': [['stop_loss']]}):
+        try:
+            optimizer.optimize(end_date='2025-12-18', **settings)
+        except ValueError as e:
+            print(f"✓ Rejected: {e}")
+        else:
+            raise AssertionError(f"Expected ValueError for {settings}")
+
+
+if __name__ == '__main__':
+    test_pareto_front()
+    test_successive_halving()
+    test_invalid_settings()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,72 @@
+"""Test folding minute bars into per-minute strike flow in chunks"""
+import numpy as np
+
+from strike_flow import NS_PER_MINUTE, StrikeFlowAggregator, cumulative_flow
+
+
+OPEN_NS = 1766154600 * 10**9  # 2025-12-19 09:30 ET
+
+
+def _rows(count, seed=3):
+    rng = np.random.default_rng(seed)
+    minute = rng.integers(-20, 420, count)
+    return {
+        'window_start': OPEN_NS + minute * NS_PER_MINUTE,
+        'strike': rng.choice([580.0, 585.0, 590.0, 592.5, 600.0], count),
+        'is_put': rng.random(count) < 0.45,
+        'volume': rng.integers(0, 300, count).astype(float)
+    }
+
+
+def test_chunking_does_not_change_flow():
+    rows = _rows(50_000)
+    whole = StrikeFlowAggregator(OPEN_NS, 390)
+    whole.add(rows['window_start'], rows['strike'], rows['is_put'], rows['volume'])
+    chunked = StrikeFlowAggregator(OPEN_NS, 390)
+    for start in range(0, 50_000, 777):
+        chunk = slice(start, start + 777)
+        chunked.add(rows['window_start'][chunk], rows['strike'][chunk], rows['is_put'][chunk], rows['volume'][chunk])
+
+    expected, result = whole.result(), chunked.result()
+    assert result['strikes'].tolist() == [580.0, 585.0, 590.0, 592.5, 600.0]
+    for field in expected:
+        np.testing.assert_array_equal(result[field], expected[field])
+    print(f"✓ {chunked.rows} rows folded in chunks match a single pass")
+
+
+def test_cumulative_matches_rescan():
+    rows = _rows(20_000, seed=9)
+    aggregator = StrikeFlowAggregator(OPEN_NS, 390)
+    aggregator.add(rows['window_start'], rows['strike'], rows['is_put'], rows['volume'])
+    flow = cumulative_flow(aggregator.result(), [1, 15, 390])
+
+    for index, minute_end in enumerate([1, 15, 390]):
+        # Every bar that started at or before the minute end, pre-market included
+        included = rows['window_start'] <= OPEN_NS + minute_end * NS_PER_MINUTE
+        for column, strike in enumerate(flow['strikes']):
+            at_strike = included & (rows['strike'] == strike)
+            assert flow['put_volume'][index, column] == rows['volume'][at_strike & rows['is_put']].sum()
+            assert flow['call_volume'][index, column] == rows['volume'][at_strike & ~rows['is_put']].sum()
+            assert flow['seen'][index, column] == at_strike.any()
+    print("✓ Cumulative flow matches a rescan at 09:31, 09:45 and 16:00")
+
+
+def test_add_tickers():
+    aggregator = StrikeFlowAggregator(OPEN_NS, 390)
+    aggregator.add_tickers({
+        'ticker': np.array(['O:SPY251219C00590000', 'O:SPY251219P00590000', 'O:SPY260116P00595000']),
+        'window_start': np.array([OPEN_NS, OPEN_NS + NS_PER_MINUTE, OPEN_NS + 500 * NS_PER_MINUTE]),
+        'volume': np.array([10.0, 20.0, 30.0])
+    })
+    flow = aggregator.result()
+    assert flow['strikes'].tolist() == [590.0]  # the after-close bar is dropped
+    assert flow['call_volume'][0].tolist() == [10.0] and flow['put_volume'][1].tolist() == [20.0]
+    assert aggregator.rows == 2
+    print("✓ Tickers folded by parsed strike and type")
+
+
+if __name__ == '__main__':
+    test_chunking_does_not_change_flow()
+    test_cumulative_matches_rescan()
+    test_add_tickers()
+    print("\n✓ All tests completed successfully!")
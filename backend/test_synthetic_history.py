@@ -0,0 +1,55 @@
+"""Test the bulk synthetic history builder and memory-mapped reader"""
+import tempfile
+
+import numpy as np
+
+from historical_scenario_generator import historical_generator
+from synthetic_history import SyntheticHistory, build_history, day_scenario, regime_chain, trading_days
+
+
+def test_regime_chain():
+    days = trading_days('2020-01-01', '2024-12-31')
+    regimes = regime_chain(days, seed=3)
+    assert np.array_equal(regimes, regime_chain(days, seed=3))
+    assert not np.array_equal(regimes, regime_chain(days, seed=4))
+    # Regimes persist: far fewer switches than independent daily draws would give
+    assert (np.diff(regimes) != 0).mean() < 0.4
+    assert len(np.unique(regimes)) == 5
+
+
+def test_build_and_read():
+    with tempfile.TemporaryDirectory() as out_dir:
+        progress = []
+        manifest = build_history(out_dir, '2025-11-20', '2025-12-10', ['SPY', 'QQQ'], seed=5,
+                                 max_workers=2, progress_callback=progress.append)
+        assert manifest['trading_days'] == 15
+        assert len(manifest['partitions']) == 4  # 2 symbols x (Nov, Dec)
+        assert len(progress) == 4
+        
+        history = SyntheticHistory(out_dir)
+        assert history.months('QQQ') == ['2025-11', '2025-12']
+        partition = history.open_partition('SPY', '2025-12')
+        assert isinstance(partition['put_call_ratio'], np.memmap)
+        assert partition['put_call_ratio'].shape == (8, 390)
+        
+        # A stored day matches regenerating it from its scenario
+        day = history.day('QQQ', '2025-12-03')
+        regime = history.open_partition('QQQ', '2025-12')['regime'][2]
+        expected = historical_generator.generate_columns('2025-12-03', 'QQQ', day_scenario('2025-12-03', regime, 5))
+        assert np.array_equal(day['put_call_ratio'], expected['put_call_ratio'])
+        assert str(day['timestamp'][-1]) == '2025-12-03T15:59:00'
+        assert history.day('SPY', '2025-12-06') is None  # Saturday
+        
+        try:
+            build_history(out_dir, '2025-11-20', '2025-12-10', ['SPY'])
+        except ValueError as e:
+            print(f"✓ Rejected: {e}")
+        else:
+            raise AssertionError("Expected ValueError for an existing history")
+        print(f"✓ Built {len(manifest['partitions'])} partitions in {manifest['build_seconds']}s")
+
+
+if __name__ == '__main__':
+    test_regime_chain()
+    test_build_and_read()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,94 @@
+"""Test rolling multi-timeframe put/call ratios and the alignment filter"""
+import numpy as np
+
+from historical_scenario_generator import historical_generator
+from strategy_backtester import MULTI_TIMEFRAME_WINDOWS, StrategyBacktester
+from trade_log import trade_log_store
+
+
+def naive_rolling_ratio(put_volume, call_volume, window):
+    """Trailing-window ratio summed minute by minute (partial windows at the start)"""
+    ratios = []
+    for minute in range(len(put_volume)):
+        start = max(0, minute - window + 1)
+        ratios.append(sum(put_volume[start:minute + 1]) / max(sum(call_volume[start:minute + 1]), 1))
+    return np.array(ratios)
+
+
+def test_rolling_ratio_by_hand():
+    bt = StrategyBacktester()
+    put_volume = np.array([4, 0, 2, 6, 0, 3, 1], dtype=float)
+    call_volume = np.array([2, 2, 0, 1, 0, 2, 5], dtype=float)
+
+    # Minutes 0-1 only have a partial 3-minute window
+    assert np.allclose(bt._rolling_ratio(put_volume, call_volume, 3),
+                       [4 / 2, 4 / 4, 6 / 4, 8 / 3, 8 / 1, 9 / 3, 4 / 7])
+    # No calls in the window divides by one
+    assert bt._rolling_ratio(put_volume, call_volume, 1)[2] == 2.0
+    assert bt._rolling_ratio(put_volume, call_volume, 1)[4] == 0.0
+
+    # Puts 3x calls for 20 minutes, then even: windows fall back to 1.0 at different speeds
+    # (the 30-minute window is still warming up at minute 22: 23 minutes, 20 of them put-heavy)
+    put_volume = np.where(np.arange(60) < 20, 300.0, 100.0)
+    call_volume = np.full(60, 100.0)
+    for window, minute, expected in ((5, 22, 1 + 0.4 * 2), (10, 22, 1 + 0.2 * 7), (30, 22, 6300 / 2300),
+                                     (30, 4, 3.0), (5, 24, 1.0), (30, 49, 1.0)):
+        assert np.isclose(bt._rolling_ratio(put_volume, call_volume, window)[minute], expected), (window, minute)
+    print("✓ Rolling ratios match hand-computed 3/5/10/30-minute windows")
+
+
+def test_timeframe_alignment_by_hand():
+    bt = StrategyBacktester()
+    # Puts 3x calls for 20 minutes, then calls 3x puts
+    put_volume = np.where(np.arange(60) < 20, 300.0, 100.0)
+    call_volume = np.where(np.arange(60) < 20, 100.0, 300.0)
+    frame = {'put_call_ratio': put_volume / call_volume}
+    for window in MULTI_TIMEFRAME_WINDOWS:
+        frame[f'tf{window}min'] = bt._rolling_ratio(put_volume, call_volume, window)
+    params = {'put_call_threshold': 1.2}
+
+    # Puts: every window above 1.2. The 5-minute window is the first to drop, at minute 22:
+    # 300*2 + 100*3 puts vs 100*2 + 300*3 calls = 0.82
+    puts = bt._timeframe_alignment(frame, params, 'puts')
+    assert np.flatnonzero(puts).tolist() == list(range(22))
+    # Calls: every window below 0.8, which the 30-minute window reaches last, at minute 38:
+    # 300*11 + 100*19 puts vs 100*11 + 300*19 calls = 0.76 (minute 37: 5400 vs 6600 = 0.82)
+    calls = bt._timeframe_alignment(frame, params, 'calls')
+    assert np.isclose(frame['tf30min'][38], 5200 / 6800) and np.isclose(frame['tf30min'][37], 5400 / 6600)
+    assert np.flatnonzero(calls).tolist() == list(range(38, 60))
+    print("✓ Puts aligned through minute 21, calls from minute 38")
+
+
+def test_alignment_labels_on_scenario_day():
+    bt = StrategyBacktester()
+    date = '2025-12-18'
+    params = {**bt.default_params, 'data_source': 'scenario', 'use_multi_timeframe': False,
+              'num_trades': 1000}
+    frame = bt._build_market_frame(params, date=date)
+    day = historical_generator.generate_intraday_frame(date, 'SPY')
+    put_volume, call_volume = day['put_volume'].astype(float), day['call_volume'].astype(float)
+
+    expected = np.ones(len(put_volume), dtype=bool)
+    for window in MULTI_TIMEFRAME_WINDOWS:
+        rolling = naive_rolling_ratio(put_volume, call_volume, window)
+        assert np.allclose(frame[f'tf{window}min'], rolling)
+        expected &= rolling > params['put_call_threshold']
+
+    # Without the filter every signal trades, labelled with the minute's alignment
+    result = bt.run_backtest(params, date=date)
+    log = trade_log_store.get(result['run_id'])['log']
+    assert (log['timeframe_align'] == expected[log['minute']]).all()
+    labels = [t['timeframe_align'] for t in trade_log_store.page(result['run_id'], 0, len(log))['trades']]
+    assert labels == ['Yes' if aligned else 'No' for aligned in expected[log['minute']]]
+    assert 'Yes' in labels and 'No' in labels
+
+    filtered = bt.run_backtest({**params, 'use_multi_timeframe': True}, date=date)
+    assert filtered['total_trades'] == int(expected[log['minute']].sum())
+    print(f"✓ {labels.count('Yes')} of {len(labels)} scenario trades labelled aligned")
+
+
+if __name__ == '__main__':
+    test_rolling_ratio_by_hand()
+    test_timeframe_alignment_by_hand()
+    test_alignment_labels_on_scenario_day()
+    print("\n✓ All tests completed successfully!")
@@ -0,0 +1,42 @@
+"""Test walk-forward validation with per-(configuration, day) caching"""
+from strategy_optimizer import StrategyOptimizer
+
+
+def test_walk_forward():
+    optimizer = StrategyOptimizer()
+    progress = []
+    result = optimizer.walk_forward({'num_trades': 200}, start_date='2025-10-01', end_date='2025-12-18',
+                                    train_days=10, test_days=5, num_configs=8, seed=11,
+                                    progress_callback=progress.append)
+    
+    windows = result['windows']
+    assert len(windows) >= 2
+    for previous, window in zip(windows, windows[1:]):
+        # Rolling by test_days: each test window starts right after its train window
+        assert window['train_start'] > previous['train_start']
+        assert window['test_start'] > window['train_end']
+    
+    # Overlapping windows share days: without the cache every window would re-run its 10 train days
+    assert result['evaluations'] < result['configs_evaluated'] * len(windows) * 10
+    assert {p['stage'] for p in progress} <= {'train', 'test'}
+    
+    oos = result['out_of_sample']
+    assert oos['total_trades'] == sum(w['test']['total_trades'] for w in windows)
+    print(f"{len(windows)} windows, {result['evaluations']} evaluations, "
+          f"out-of-sample return {oos['return_percent']}%, efficiency {result['walk_forward_efficiency']}")
+
+
+def test_invalid_windows():
+    optimizer = StrategyOptimizer()
+    try:
+        optimizer.walk_forward(start_date='2025-12-01', end_date='2025-12-05', train_days=10, test_days=5)
+    except ValueError as e:
+        print(f"✓ Rejected: {e}")
+    else:
+        raise AssertionError("Expected ValueError for a range shorter than one window")
+
+
+if __name__ == '__main__':
+    test_walk_forward()
+    test_invalid_windows()
+    print("\n✓ All tests completed successfully!")
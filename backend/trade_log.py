@@ -0,0 +1,215 @@
+"""
+Columnar Trade Log Storage
+Keeps every backtest trade in a NumPy structured array, retrievable by run id
+and streamable as NDJSON, CSV or Parquet without building per-row dicts.
+"""
+import io
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from config import Config
+from exit_engine import EXIT_REASONS
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:
+    pa = None
+    pq = None
+
+
+# One row per trade (~60 bytes/row vs ~1 KB for the equivalent dict)
+TRADE_LOG_DTYPE = np.dtype([
+    ('trade_num', np.int32),
+    ('symbol_id', np.int16),
+    ('minute', np.int32),
+    ('put_call_ratio', np.float32),
+    ('volume_spike', np.float32),
+    ('iv_percentile', np.float32),
+    ('timeframe_align', np.bool_),
+    ('volume_conc', np.float32),
+    ('is_win', np.bool_),
+    ('percent_return', np.float32),
+    ('profit', np.float64),
+    ('capital', np.float64),
+    ('drawdown', np.float32),
+    ('win_prob', np.float32),
+    ('exit_reason', np.int8),
+    ('hold_minutes', np.int32),
+])
+
+EXPORT_COLUMNS = ['trade_num', 'symbol', 'direction', 'put_call_ratio', 'volume_spike', 'iv_percentile',
+                  'timeframe_align', 'volume_conc', 'result', 'percent_return', 'profit',
+                  'capital', 'drawdown', 'win_prob', 'exit', 'hold_minutes']
+
+# Exported as quoted strings in NDJSON; every other column is numeric and may be missing
+TEXT_COLUMNS = ('symbol', 'direction', 'timeframe_align', 'result', 'exit')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def build_trade_log(num_trades: int, **columns) -> np.ndarray:
+    """Allocate a trade log and fill it from equally sized column arrays"""
+    log = np.zeros(num_trades, dtype=TRADE_LOG_DTYPE)
+    log['trade_num'] = np.arange(1, num_trades + 1)
+    for name, values in columns.items():
+        log[name] = values
+    return log
+
+
+def _display_columns(log: np.ndarray, direction: str, symbols: List[str]) -> Dict[str, List]:
+    """Columns in client units (percentages, Win/Loss labels), rounded as the API reports them"""
+    size = len(log)
+    iv_percentile = np.round(log['iv_percentile'].astype(float), 1)
+    return {
+        'trade_num': log['trade_num'].tolist(),
+        'symbol': np.array(symbols, dtype=object)[log['symbol_id']].tolist(),
+        'direction': [direction] * size,
+        'put_call_ratio': np.round(log['put_call_ratio'].astype(float), 4).tolist(),
+        'volume_spike': np.round(log['volume_spike'].astype(float), 2).tolist(),
+        # NaN when the data source has no IV (replay minute aggregates)
+        'iv_percentile': [None if np.isnan(v) else v for v in iv_percentile.tolist()]
+        if np.isnan(iv_percentile).any() else iv_percentile.tolist(),
+        'timeframe_align': np.where(log['timeframe_align'], 'Yes', 'No').tolist(),
+        'volume_conc': np.round(log['volume_conc'].astype(float) * 100, 1).tolist(),
+        'result': np.where(log['is_win'], 'Win', 'Loss').tolist(),
+        'percent_return': np.round(log['percent_return'].astype(float) * 100, 2).tolist(),
+        'profit': np.round(log['profit'], 2).tolist(),
+        'capital': np.round(log['capital'], 2).tolist(),
+        'drawdown': np.round(log['drawdown'].astype(float), 2).tolist(),
+        'win_prob': np.round(log['win_prob'].astype(float) * 100, 1).tolist(),
+        'exit': np.array(list(EXIT_REASONS.values()))[log['exit_reason']].tolist(),
+        'hold_minutes': log['hold_minutes'].tolist(),
+    }
+
+
+def _fill_missing(columns: Dict[str, List], token) -> Dict[str, List]:
+    """Replace None/NaN in numeric columns with `token` (null in NDJSON, an empty CSV field)"""
+    for name, values in columns.items():
+        if name not in TEXT_COLUMNS and any(v is None or v != v for v in values):
+            columns[name] = [token if v is None or v != v else v for v in values]
+    return columns
+
+
+def trade_records(log: np.ndarray, direction: str, symbols: List[str]) -> List[Dict]:
+    """Materialize a (small) slice of a trade log as API trade dicts"""
+    columns = _display_columns(log, direction, symbols)
+    return [dict(zip(EXPORT_COLUMNS, row)) for row in zip(*(columns[c] for c in EXPORT_COLUMNS))]
+
+
+class TradeLogStore:
+    """Bounded LRU of trade logs keyed by run id"""
+
+    def __init__(self, max_runs: int = None, max_bytes: int = None):
+        self.max_runs = max_runs or Config.TRADE_LOG_MAX_RUNS
+        self.max_bytes = max_bytes or Config.TRADE_LOG_MAX_BYTES
+        self._runs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, log: np.ndarray, direction: str, run_id: str = None, symbols: List[str] = None, **meta) -> str:
+        """Store a trade log and return its run id; symbol_id indexes into `symbols`"""
+        run_id = run_id or uuid.uuid4().hex
+        with self._lock:
+            if run_id in self._runs:
+                self._bytes -= self._runs.pop(run_id)['log'].nbytes
+            self._runs[run_id] = {'log': log, 'direction': direction, 'symbols': symbols or ['SPY'], **meta}
+            self._bytes += log.nbytes
+
+            while len(self._runs) > 1 and (len(self._runs) > self.max_runs or self._bytes > self.max_bytes):
+                _, evicted = self._runs.popitem(last=False)
+                self._bytes -= evicted['log'].nbytes
+        return run_id
+
+    def get(self, run_id: str) -> Optional[Dict]:
+        """Stored run ({'log', 'direction', 'symbols', ...meta}) or None"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                self._runs.move_to_end(run_id)
+            return run
+
+    def pop(self, run_id: str) -> Optional[Dict]:
+        """Remove and return a stored run"""
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is not None:
+                self._bytes -= run['log'].nbytes
+            return run
+
+    def page(self, run_id: str, offset: int = 0, limit: int = 100) -> Optional[Dict]:
+        """One page of trades as API dicts"""
+        run = self.get(run_id)
+        if run is None:
+            return None
+
+        log = run['log']
+        offset = max(0, offset)
+        limit = max(1, min(limit, Config.TRADE_LOG_MAX_PAGE_SIZE))
+        return {
+            'run_id': run_id,
+            'direction': run['direction'],
+            'total': len(log),
+            'offset': offset,
+            'limit': limit,
+            'trades': trade_records(log[offset:offset + limit], run['direction'], run['symbols'])
+        }
+
+    def export(self, run_id: str, fmt: str = 'ndjson', chunk_size: int = 10000) -> Optional[Iterator]:
+        """Stream a stored trade log in the requested format, chunk by chunk"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format '{fmt}'. Expected one of: {', '.join(EXPORT_FORMATS)}")
+        if fmt == 'parquet' and pa is None:
+            raise ValueError("Parquet export requires pyarrow")
+
+        run = self.get(run_id)
+        if run is None:
+            return None
+
+        writers = {'ndjson': self._iter_ndjson, 'csv': self._iter_csv, 'parquet': self._iter_parquet}
+        return writers[fmt](run['log'], run['direction'], run['symbols'], chunk_size)
+
+    def _iter_ndjson(self, log: np.ndarray, direction: str, symbols: List[str], chunk_size: int) -> Iterator[str]:
+        template = '{{' + ','.join(
+            f'"{c}":"{{}}"' if c in TEXT_COLUMNS else f'"{c}":{{}}' for c in EXPORT_COLUMNS
+        ) + '}}\n'
+        for start in range(0, len(log), chunk_size):
+            columns = _fill_missing(_display_columns(log[start:start + chunk_size], direction, symbols), 'null')
+            yield ''.join(template.format(*row) for row in zip(*(columns[c] for c in EXPORT_COLUMNS)))
+
+    def _iter_csv(self, log: np.ndarray, direction: str, symbols: List[str], chunk_size: int) -> Iterator[str]:
+        yield ','.join(EXPORT_COLUMNS) + '\n'
+        line = ','.join(['{}'] * len(EXPORT_COLUMNS)) + '\n'
+        for start in range(0, len(log), chunk_size):
+            columns = _fill_missing(_display_columns(log[start:start + chunk_size], direction, symbols), '')
+            yield ''.join(line.format(*row) for row in zip(*(columns[c] for c in EXPORT_COLUMNS)))
+
+    def _iter_parquet(self, log: np.ndarray, direction: str, symbols: List[str], chunk_size: int) -> Iterator[bytes]:
+        buffer = io.BytesIO()
+        writer = None
+        # Always write at least one batch so an empty log is still a valid file
+        for start in range(0, max(len(log), 1), chunk_size):
+            columns = _display_columns(log[start:start + chunk_size], direction, symbols)
+            batch = pa.record_batch([pa.array(columns[c]) for c in EXPORT_COLUMNS], names=EXPORT_COLUMNS)
+            if writer is None:
+                writer = pq.ParquetWriter(buffer, batch.schema)
+            writer.write_batch(batch)
+            # Hand off each row group as soon as it is written
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if writer is not None:
+            writer.close()
+            yield buffer.getvalue()
+
+
+# Global instance
+trade_log_store = TradeLogStore()